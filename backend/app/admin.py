@@ -1,13 +1,17 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from . import models, dependencies, db_operations
 from .db_session import get_db
-from . import db_models
+from . import db_models, statistics_rollup
+from .http_cache import cached_json_response
+
+# Таблицы, от которых зависит сводная статистика
+STATISTICS_TABLES = ("user", "organization", "status_organization", "event", "news", "knowledge_base_data")
 
 router = APIRouter(
     prefix="/admin",
@@ -36,6 +40,22 @@ class StatisticsResponse(BaseModel):
     )
 
 
+class TimeseriesPoint(BaseModel):
+    """Значение метрики за период."""
+
+    date: str = Field(..., description="Начало периода (YYYY-MM-DD)")
+    count: int = Field(..., description="Значение метрики за период")
+
+
+class TimeseriesResponse(BaseModel):
+    """Временной ряд метрики статистики."""
+
+    metric: str
+    granularity: str
+    city_id: Optional[int] = None
+    date_from: str
+    date_to: str
+    points: List[TimeseriesPoint]
 
 
 @router.get("/users/with-roles", response_model=List[models.UserWithRole])
@@ -105,49 +125,62 @@ def update_user_role(
     summary="Получить статистику по базе данных",
 )
 def get_statistics(
+    request: Request,
     db: Session = Depends(get_db),
     current_admin: dict = Depends(dependencies.get_current_admin),
 ):
     """Получить статистику по базе данных (доступно только администраторам)."""
-    # Подсчет общего количества пользователей
-    total_users = db.query(db_models.User).filter(
-        db_models.User.date_delete.is_(None)
-    ).count()
-
-    # Подсчет общего количества НКО
-    total_nko = db.query(db_models.Organization).filter(
-        db_models.Organization.date_delete.is_(None)
-    ).count()
-
-    # Подсчет НКО со статусом "Одобрена"
-    status_approved = db_operations.get_status_organization_by_name(db, "Одобрена")
-    total_pending_nko = 0
-    if status_approved:
-        total_pending_nko = db.query(db_models.Organization).filter(
-            db_models.Organization.date_delete.is_(None),
-            db_models.Organization.status_organization_id == status_approved.id
-        ).count()
-
-    # Подсчет общего количества мероприятий
-    total_events = db.query(db_models.Event).filter(
-        db_models.Event.date_delete.is_(None)
-    ).count()
-
-    # Подсчет общего количества новостей
-    total_news = db.query(db_models.News).filter(
-        db_models.News.date_delete.is_(None)
-    ).count()
-
-    # Подсчет общего количества материалов базы знаний
-    total_knowledge_base_data = db.query(db_models.KnowledgeBaseData).filter(
-        db_models.KnowledgeBaseData.date_delete.is_(None)
-    ).count()
-
-    return StatisticsResponse(
-        total_users=total_users,
-        total_nko=total_nko,
-        total_pending_nko=total_pending_nko,
-        total_events=total_events,
-        total_news=total_news,
-        total_knowledge_base_data=total_knowledge_base_data,
-    )
\ No newline at end of file
+    # Сводка пересчитывается одним запросом только после изменения данных
+    def build():
+        status_approved = db_operations.get_status_organization_by_name(db, "Одобрена")
+        return db_operations.get_statistics_counts(
+            db, approved_status_id=status_approved.id if status_approved else None
+        )
+
+    return cached_json_response(request, STATISTICS_TABLES, build)
+
+
+@router.get(
+    "/statistics/timeseries",
+    response_model=TimeseriesResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Получить временной ряд метрики статистики",
+)
+def get_statistics_timeseries(
+    metric: str = Query(..., description="Метрика: " + ", ".join(statistics_rollup.METRICS)),
+    date_from: Optional[date] = Query(None, alias="from", description="Начало периода (по умолчанию 30 дней назад)"),
+    date_to: Optional[date] = Query(None, alias="to", description="Конец периода включительно (по умолчанию сегодня)"),
+    granularity: str = Query("day", description="Шаг: day, week или month"),
+    city_id: Optional[int] = Query(None, description="Фильтр по городу"),
+    db: Session = Depends(get_db),
+    current_admin: dict = Depends(dependencies.get_current_admin),
+):
+    """Получить значения метрики по дням, неделям или месяцам из таблицы агрегатов."""
+    if metric not in statistics_rollup.METRICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестная метрика. Допустимые значения: {', '.join(statistics_rollup.METRICS)}",
+        )
+    if granularity not in statistics_rollup.GRANULARITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестный шаг. Допустимые значения: {', '.join(statistics_rollup.GRANULARITIES)}",
+        )
+
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Начало периода позже его конца",
+        )
+
+    daily = db_operations.get_statistics_daily(db, metric, date_from, date_to, city_id=city_id)
+    return {
+        "metric": metric,
+        "granularity": granularity,
+        "city_id": city_id,
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "points": statistics_rollup.build_timeseries(daily, date_from, date_to, granularity),
+    }
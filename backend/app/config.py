@@ -21,6 +21,10 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 2880 # 2 дня 
 
+    # Адреса обратных прокси (IP или подсети через запятую, например "10.0.0.0/8").
+    # С них IP клиента для лимитов берётся из X-Forwarded-For
+    TRUSTED_PROXIES: str = ""
+
     # Настройки OpenAI (обязательно задаются через .env)
     # Примеры переменных окружения:
     # OPENAI_API_KEY=...
@@ -31,6 +35,46 @@ class Settings(BaseSettings):
     OPENAI_MODEL: Optional[str] = None
     OPENAI_TEMPERATURE: float = 0.4
     OPENAI_BASE_URL: Optional[str] = None
+    # Пул HTTP-соединений к LLM (общий для всех запросов генерации)
+    OPENAI_MAX_CONNECTIONS: int = 200
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    OPENAI_TIMEOUT_SECONDS: float = 120.0
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    OPENAI_MAX_RETRIES: int = 2
+    OPENAI_STREAM_USAGE: bool = True  # запрашивать usage в потоковых ответах (stream_options)
+    # Допуск к генерации: общая параллельность, очередь и лимит на клиента
+    GENERATION_MAX_CONCURRENCY: int = 16
+    GENERATION_MAX_QUEUE: int = 64
+    GENERATION_QUEUE_TIMEOUT_SECONDS: float = 30.0
+    GENERATION_RATE_PER_MINUTE: float = 10.0  # 0 — без лимита на клиента
+    GENERATION_BURST: int = 5
+    GENERATION_BATCH_MAX_ITEMS: int = 10  # заголовков в /generation/news/batch
+    GENERATION_DAILY_TOKEN_BUDGET: int = 0  # токенов на клиента в сутки (UTC), 0 — без лимита
+    # Кеш ответов генерации новостей и правок
+    GENERATION_CACHE_MAX_ENTRIES: int = 512
+    GENERATION_CACHE_TTL_SECONDS: float = 86400.0
+    GENERATION_CACHE_PERSIST: bool = False  # True — хранить кеш в таблице generation_cache
+    GENERATION_CACHE_CLEANUP_INTERVAL_SECONDS: float = 3600.0
+    # Семантический кеш частых вопросов к ИИ-помощнику
+    FAQ_CACHE_MAX_ENTRIES: int = 1000
+    FAQ_CACHE_SIMILARITY_THRESHOLD: float = 0.9
+    FAQ_CACHE_TTL_SECONDS: float = 86400.0
+    # Справочный контекст ИИ-помощника: сколько фрагментов и токенов добавлять в промпт
+    RAG_TOP_K: int = 5
+    RAG_CONTEXT_TOKENS: int = 1200
+    # Окно диалога: бюджет последних реплик и краткого содержания ранних (в токенах)
+    DIALOGUE_HISTORY_TOKENS: int = 1000
+    DIALOGUE_SUMMARY_TOKENS: int = 300
+    DIALOGUE_SUMMARY_MAX_ENTRIES: int = 5000
+    DIALOGUE_SUMMARY_TTL_SECONDS: float = 86400.0
+    DIALOGUE_SUMMARY_MAX_UPDATES: int = 4  # одновременных фоновых суммаризаций
+    # Сессии ИИ-помощника (/generation/sessions)
+    GENERATION_SESSIONS_MAX: int = 10000
+    GENERATION_SESSIONS_PER_CLIENT: int = 20  # в памяти; новая сессия вытесняет самую давнюю сессию клиента
+    GENERATION_SESSION_TTL_SECONDS: float = 86400.0
+    GENERATION_SESSION_MAX_TURNS: int = 200
+    GENERATION_SESSIONS_PERSIST: bool = False  # True — хранить сессии в таблице generation_session
     
     # Настройки MinIO (обязательно задаются через .env)
     # Примеры переменных окружения:
@@ -45,6 +89,27 @@ class Settings(BaseSettings):
     MINIO_BUCKET_NAME: str = "gooddeeds-files"
     MINIO_SECURE: bool = False
 
+    # Сжатие ответов и кеш публичных списков
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # байт; ответы меньше порога не сжимаются
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    RESPONSE_CACHE_TTL_SECONDS: float = 30.0
+    RESPONSE_CACHE_MAX_ENTRIES: int = 256
+
+    # Реестр справочников: период принудительной перезагрузки (изменения из других процессов)
+    REFERENCE_DATA_TTL_SECONDS: float = 300.0
+    REFERENCE_DATA_MISS_RELOAD_SECONDS: float = 5.0  # не чаще — перечитывание справочника при промахе
+
+    # Сверка денормализованных счётчиков (избранное, участники, члены НКО); 0 — отключить
+    COUNTERS_RECONCILE_INTERVAL_SECONDS: float = 3600.0
+    # Период сброса накопленных просмотров базы знаний в БД
+    KB_VIEWS_FLUSH_INTERVAL_SECONDS: float = 10.0
+    # Период записи накопленных приращений дневной статистики в БД
+    STATISTICS_ROLLUP_FLUSH_INTERVAL_SECONDS: float = 10.0
+    # Рейтинг популярности: период пересчёта и период полураспада активности
+    POPULARITY_REFRESH_INTERVAL_SECONDS: float = 900.0
+    POPULARITY_HALF_LIFE_DAYS: float = 7.0
+
     # URL подключения к БД
     @property
     def DATABASE_URL(self) -> str:
@@ -0,0 +1,151 @@
+"""
+Денормализованные счётчики для карточек контента.
+
+Карточкам мероприятий, новостей, материалов базы знаний и организаций
+нужны количества участников, добавлений в избранное и членов организации.
+Вместо COUNT на каждую карточку счётчики хранятся в колонках самих
+сущностей и меняются в той же транзакции, что и исходные записи:
+
+* избранное и члены организации — обработчиком after_flush сессии
+  (добавление, мягкое удаление и восстановление записей избранного,
+  создание и изменение пользователей);
+* участники мероприятия — `Event.quantity_registered`, которое ведут
+  функции записи на мероприятие в `db_operations` (с учётом листа ожидания).
+
+Изменение счётчика обновляет и `date_update` сущности, чтобы ETag списков
+отражал новые значения. `reconcile` пересчитывает все счётчики по исходным
+таблицам и запускается периодически на случай расхождений.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Tuple
+
+from sqlalchemy import case, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from . import data_versions, db_models
+from .db_operations import PARTICIPANT_STATUS_WAITLIST, holds_seat_condition
+from .reference_data import registry as reference_registry
+
+# Модель избранного -> (сущность, внешний ключ на неё)
+_FAVORITE_TARGETS = {
+    db_models.SelectedEvent: (db_models.Event, "event_id"),
+    db_models.SelectedNews: (db_models.News, "news_id"),
+    db_models.SelectedKnowledgeBaseData: (db_models.KnowledgeBaseData, "knowledge_base_data_id"),
+    db_models.SelectedOrganization: (db_models.Organization, "organization_id"),
+}
+
+CounterKey = Tuple[type, str, int]
+
+
+def _old_value(state, name: str):
+    """Значение атрибута до изменений в текущем flush."""
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.object, name)
+
+
+def _favorite_delta(obj, is_new: bool) -> int:
+    """Изменение числа активных записей избранного: +1, -1 или 0."""
+    alive = obj.date_delete is None
+    if is_new:
+        return 1 if alive else 0
+    was_alive = _old_value(inspect(obj), "date_delete") is None
+    return int(alive) - int(was_alive)
+
+
+def _member_deltas(user, is_new: bool, deltas: Counter) -> None:
+    """Изменения числа членов организаций при создании или изменении пользователя."""
+    if user.date_delete is None and user.organization_id is not None:
+        deltas[(db_models.Organization, "members_count", user.organization_id)] += 1
+    if is_new:
+        return
+    state = inspect(user)
+    old_org = _old_value(state, "organization_id")
+    if _old_value(state, "date_delete") is None and old_org is not None:
+        deltas[(db_models.Organization, "members_count", old_org)] -= 1
+
+
+def apply_deltas(connection, deltas: Dict[CounterKey, int]) -> None:
+    """Применяет приращения к колонкам-счётчикам, не опуская их ниже нуля."""
+    now = datetime.utcnow()
+    for (model, column_name, item_id), delta in deltas.items():
+        if not delta:
+            continue
+        column = model.__table__.c[column_name]
+        connection.execute(
+            update(model.__table__)
+            .where(model.__table__.c.id == item_id)
+            .values({
+                column_name: case((column + delta > 0, column + delta), else_=0),
+                "date_update": now,
+            })
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_counter_deltas(session: Session, flush_context) -> None:
+    """Обновляет счётчики по записям избранного и пользователям из этого flush."""
+    deltas: Counter = Counter()
+    for objects, is_new in ((session.new, True), (session.dirty, False)):
+        for obj in objects:
+            target = _FAVORITE_TARGETS.get(type(obj))
+            if target is not None:
+                model, fk_name = target
+                item_id = getattr(obj, fk_name)
+                if item_id is not None:
+                    deltas[(model, "favorites_count", item_id)] += _favorite_delta(obj, is_new)
+            elif isinstance(obj, db_models.User):
+                _member_deltas(obj, is_new, deltas)
+
+    deltas = Counter({key: delta for key, delta in deltas.items() if delta})
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+        data_versions.mark_changed(session, *{model.__tablename__ for model, _, _ in deltas})
+
+
+# ==================== СВЕРКА ====================
+
+def _count_subquery(model, fk_column, target, *criteria):
+    return (
+        select(func.count(model.id))
+        .where(fk_column == target.id, model.date_delete.is_(None), *criteria)
+        .scalar_subquery()
+    )
+
+
+def reconcile(db: Session) -> None:
+    """Пересчитывает все счётчики по исходным таблицам."""
+    statements = [
+        (model, "favorites_count", _count_subquery(selected, getattr(selected, fk_name), model))
+        for selected, (model, fk_name) in _FAVORITE_TARGETS.items()
+    ]
+    statements.append((
+        db_models.Organization,
+        "members_count",
+        _count_subquery(db_models.User, db_models.User.organization_id, db_models.Organization),
+    ))
+
+    waitlist = reference_registry.get_by_name(db, db_models.StatusParticipantEvent, PARTICIPANT_STATUS_WAITLIST)
+    seat_criteria = [holds_seat_condition(waitlist.id)] if waitlist is not None else []
+    statements.append((
+        db_models.Event,
+        "quantity_registered",
+        _count_subquery(db_models.ParticipantEvent, db_models.ParticipantEvent.event_id, db_models.Event, *seat_criteria),
+    ))
+
+    changed = set()
+    for model, column_name, actual in statements:
+        # Обновляем только расходящиеся строки, чтобы не трогать date_update остальных
+        result = db.execute(
+            update(model)
+            .where(getattr(model, column_name) != actual)
+            .values({column_name: actual, "date_update": datetime.utcnow()})
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            changed.add(model.__tablename__)
+    db.commit()
+    if changed:
+        data_versions.bump(*changed)
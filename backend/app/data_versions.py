@@ -0,0 +1,72 @@
+"""
+Отслеживание изменений таблиц для инвалидации in-memory кешей.
+
+После каждого успешного commit сессии SQLAlchemy номера версий
+затронутых таблиц увеличиваются. Кеши сравнивают сохранённые версии
+с текущими и перестраивают данные только при реальных изменениях.
+"""
+import threading
+from collections import defaultdict
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_CHANGED_TABLES_KEY = "changed_tables"
+
+_versions: Dict[str, int] = defaultdict(int)
+_lock = threading.Lock()
+_listeners: List[Callable[[Set[str]], None]] = []
+
+
+def get_versions(tables: Iterable[str]) -> Tuple[int, ...]:
+    """Возвращает текущие версии указанных таблиц."""
+    with _lock:
+        return tuple(_versions[name] for name in tables)
+
+
+def bump(*tables: str) -> None:
+    """Отмечает таблицы как изменённые (например, после raw SQL вне ORM)."""
+    changed = set(tables)
+    if not changed:
+        return
+    with _lock:
+        for name in changed:
+            _versions[name] += 1
+    for listener in list(_listeners):
+        listener(changed)
+
+
+def mark_changed(session: Session, *tables: str) -> None:
+    """Регистрирует изменение таблиц в рамках текущей транзакции сессии."""
+    session.info.setdefault(_CHANGED_TABLES_KEY, set()).update(tables)
+
+
+def add_listener(callback: Callable[[Set[str]], None]) -> None:
+    """Подписывает callback на изменения таблиц (вызывается после commit)."""
+    _listeners.append(callback)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_tables(session: Session, flush_context) -> None:
+    """Запоминает таблицы объектов, записанных во время flush."""
+    changed = session.info.setdefault(_CHANGED_TABLES_KEY, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table_name = getattr(obj, "__tablename__", None)
+        if table_name:
+            changed.add(table_name)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changed_tables(session: Session) -> None:
+    """Увеличивает версии таблиц, изменённых в закоммиченной транзакции."""
+    changed = session.info.pop(_CHANGED_TABLES_KEY, None)
+    if changed:
+        bump(*changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_tables(session: Session) -> None:
+    """Отбрасывает накопленные изменения откатанной транзакции."""
+    session.info.pop(_CHANGED_TABLES_KEY, None)
@@ -0,0 +1,13 @@
+"""
+Общие преобразования дат.
+"""
+from datetime import date, datetime
+
+
+def to_date(value) -> date:
+    """Приводит результат func.date() к date (SQLite возвращает строку)."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
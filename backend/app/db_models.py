@@ -2,7 +2,7 @@
 SQLAlchemy модели для базы данных.
 Содержит определения всех таблиц согласно схеме БД energy_goodness_db.
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, ForeignKey, Float, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -196,6 +196,7 @@ class KnowledgeBaseData(Base):
     material_url = Column(String(500), nullable=True)
     category_knowledge_base_data_id = Column(Integer, ForeignKey("category_knowledge_base_data.id"), nullable=False)
     type_material_category_knowledge_base_data_id = Column(Integer, ForeignKey("type_material_category_knowledge_base_data.id"), nullable=False)
+    favorites_count = Column(Integer, nullable=False, default=0, server_default="0")  # Добавлений в избранное
     date_create = Column(DateTime, default=datetime.utcnow)
     date_update = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     date_delete = Column(DateTime, nullable=True)
@@ -234,6 +235,7 @@ class News(Base):
     full_description = Column(Text, nullable=True)
     date_event = Column(DateTime, nullable=True)
     city_id = Column(Integer, ForeignKey("city.id"), nullable=True)
+    favorites_count = Column(Integer, nullable=False, default=0, server_default="0")  # Добавлений в избранное
     date_create = Column(DateTime, default=datetime.utcnow)
     date_update = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     date_delete = Column(DateTime, nullable=True)
@@ -268,6 +270,8 @@ class Organization(Base):
     city_id = Column(Integer, ForeignKey("city.id"), nullable=True)
     status_organization_id = Column(Integer, ForeignKey("status_organization.id"), nullable=True)
     reason_rejection = Column(Text, nullable=True)
+    members_count = Column(Integer, nullable=False, default=0, server_default="0")  # Пользователей, привязанных к организации
+    favorites_count = Column(Integer, nullable=False, default=0, server_default="0")  # Добавлений в избранное
     date_create = Column(DateTime, default=datetime.utcnow)
     date_update = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     date_delete = Column(DateTime, nullable=True)
@@ -374,7 +378,9 @@ class Event(Base):
     full_description = Column(Text, nullable=True)
     address = Column(String(255), nullable=True)
     type_event_id = Column(Integer, ForeignKey("type_event.id"), nullable=True)
-    quantity_participant = Column(Integer, nullable=True)
+    quantity_participant = Column(Integer, nullable=True)  # Лимит мест (0 или NULL — без ограничений)
+    quantity_registered = Column(Integer, nullable=False, default=0, server_default="0")  # Занятые места
+    favorites_count = Column(Integer, nullable=False, default=0, server_default="0")  # Добавлений в избранное
     category_event_id = Column(Integer, ForeignKey("category_event.id"), nullable=True)
     status_event_id = Column(Integer, ForeignKey("status_event.id"), nullable=False)
     reason_rejection = Column(Text, nullable=True)
@@ -457,6 +463,17 @@ class HashtagsNews(Base):
 # 26. Участник мероприятия
 class ParticipantEvent(Base):
     __tablename__ = "participant_event"
+    __table_args__ = (
+        # Одна активная запись пользователя на мероприятие
+        Index(
+            "uq_participant_event_user_id_event_id_active",
+            "user_id",
+            "event_id",
+            unique=True,
+            postgresql_where=text("date_delete IS NULL"),
+            sqlite_where=text("date_delete IS NULL"),
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("event.id"), nullable=True)
@@ -496,6 +513,9 @@ class PhotoEvent(Base):
 # 28. Избранные мероприятия
 class SelectedEvent(Base):
     __tablename__ = "selected_event"
+    __table_args__ = (
+        Index("ix_selected_event_user_id_event_id", "user_id", "event_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
@@ -511,6 +531,9 @@ class SelectedEvent(Base):
 # 29. Избранная база знаний
 class SelectedKnowledgeBaseData(Base):
     __tablename__ = "selected_knowledge_base_data"
+    __table_args__ = (
+        Index("ix_selected_knowledge_base_data_user_id_kb_id", "user_id", "knowledge_base_data_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
@@ -527,6 +550,9 @@ class SelectedKnowledgeBaseData(Base):
 # 30. Избранные новости
 class SelectedNews(Base):
     __tablename__ = "selected_news"
+    __table_args__ = (
+        Index("ix_selected_news_user_id_news_id", "user_id", "news_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     news_id = Column(Integer, ForeignKey("news.id"), nullable=False)
@@ -542,6 +568,9 @@ class SelectedNews(Base):
 # 31. Избранные организации
 class SelectedOrganization(Base):
     __tablename__ = "selected_organization"
+    __table_args__ = (
+        Index("ix_selected_organization_user_id_organization_id", "user_id", "organization_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("user.id"), nullable=False)
@@ -552,3 +581,70 @@ class SelectedOrganization(Base):
     # Relationships
     user = relationship("User", back_populates="selected_organizations")
     organization = relationship("Organization", back_populates="selected_organizations")
+
+
+# 32. Ежедневная статистика (агрегаты по метрикам и городам)
+class StatisticsDaily(Base):
+    __tablename__ = "statistics_daily"
+    __table_args__ = (
+        Index("ix_statistics_daily_metric_day", "metric", "day"),
+        Index(
+            "uq_statistics_daily_metric_city_id_day",
+            "metric",
+            "city_id",
+            "day",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    metric = Column(String(50), nullable=False)
+    city_id = Column(Integer, ForeignKey("city.id"), nullable=True)
+    day = Column(Date, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    date_create = Column(DateTime, default=datetime.utcnow)
+    date_update = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# 33. Рейтинг популярности (пересчитывается фоновой задачей)
+class PopularityRank(Base):
+    __tablename__ = "popularity_rank"
+    __table_args__ = (
+        Index("uq_popularity_rank_entity_entity_id", "entity", "entity_id", unique=True),
+        Index("ix_popularity_rank_entity_score", "entity", "score"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String(32), nullable=False)  # event / news / knowledge_base / organization
+    entity_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False, default=0)
+    date_create = Column(DateTime, default=datetime.utcnow)
+    date_update = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# 34. Кеш ответов генерации (персистентный слой кеша LLM)
+class GenerationCache(Base):
+    __tablename__ = "generation_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(64), nullable=False, unique=True, index=True)  # sha256 нормализованного запроса
+    model = Column(String(255), nullable=True)
+    content = Column(Text, nullable=False)
+    date_expire = Column(DateTime, nullable=False)
+    date_create = Column(DateTime, default=datetime.utcnow)
+    date_update = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# 35. Сессии ИИ-помощника (персистентный слой хранилища разговоров)
+class GenerationSession(Base):
+    __tablename__ = "generation_session"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(64), nullable=False, unique=True, index=True)  # идентификатор сессии для клиента
+    owner = Column(String(320), nullable=False)  # клиент: user:<email> или ip:<адрес>
+    turns = Column(Text, nullable=False, default="[]")  # JSON-список реплик [роль, текст]
+    window_start = Column(Integer, nullable=False, default=0)  # первая реплика, отправляемая модели целиком
+    date_expire = Column(DateTime, nullable=False)
+    date_create = Column(DateTime, default=datetime.utcnow)
+    date_update = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
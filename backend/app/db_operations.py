@@ -2,16 +2,49 @@
 CRUD операции для работы с базой данных.
 Содержит функции для создания, чтения, обновления и удаления данных.
 """
-from sqlalchemy.orm import Session
-from typing import Optional, List, Dict, Any
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
+from typing import Optional, List, Dict, Any, Iterable, Tuple
 from datetime import datetime
 
-from . import db_models
+from . import data_versions, db_models
+from .reference_data import registry as reference_registry
+from . import popularity
 
 
 DEFAULT_USER_PHOTO = "files/user_photo/user4.jpg"
 DEFAULT_EVENT_STATUS = "На модерации"
 EVENT_STATUS_PRESETS = ("Одобрено", "Отклонено", DEFAULT_EVENT_STATUS)
+PARTICIPANT_STATUS_REGISTERED = "Зарегистрирован"
+PARTICIPANT_STATUS_WAITLIST = "Лист ожидания"
+PARTICIPANT_STATUS_PRESETS = (PARTICIPANT_STATUS_REGISTERED, PARTICIPANT_STATUS_WAITLIST)
+
+# Связанные данные, которые читают *_to_dict: загружаются вместе с сущностью,
+# а не отдельным запросом на каждую запись.
+NEWS_LOAD_OPTIONS = (
+    joinedload(db_models.News.city),
+    joinedload(db_models.News.category_news),
+    selectinload(db_models.News.photo_news),
+    selectinload(db_models.News.file_news),
+    selectinload(db_models.News.hashtags_news),
+)
+EVENT_LOAD_OPTIONS = (
+    joinedload(db_models.Event.organization).joinedload(db_models.Organization.city),
+    joinedload(db_models.Event.category_event),
+    joinedload(db_models.Event.status_event),
+    selectinload(db_models.Event.photo_events),
+)
+ORGANIZATION_LOAD_OPTIONS = (
+    joinedload(db_models.Organization.city),
+    joinedload(db_models.Organization.category),
+    joinedload(db_models.Organization.status_organization),
+)
+KNOWLEDGE_BASE_LOAD_OPTIONS = (
+    joinedload(db_models.KnowledgeBaseData.category_knowledge_base_data),
+    joinedload(db_models.KnowledgeBaseData.type_material_category_knowledge_base_data),
+    selectinload(db_models.KnowledgeBaseData.material_knowledge_base_data),
+)
 
 # ==================== ПОЛЬЗОВАТЕЛИ (User) ====================
 
@@ -99,20 +132,14 @@ def count_users_by_organization_id(db: Session, organization_id: int) -> int:
 
 # ==================== РОЛИ (Role) ====================
 
-def get_role_by_name(db: Session, role_name: str) -> Optional[db_models.Role]:
-    """Получить роль по названию."""
-    return db.query(db_models.Role).filter(
-        db_models.Role.name == role_name,
-        db_models.Role.date_delete.is_(None)
-    ).first()
+def get_role_by_name(db: Session, role_name: str):
+    """Получить роль по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.Role, role_name)
 
 
-def get_role_by_id(db: Session, role_id: int) -> Optional[db_models.Role]:
-    """Получить роль по ID."""
-    return db.query(db_models.Role).filter(
-        db_models.Role.id == role_id,
-        db_models.Role.date_delete.is_(None)
-    ).first()
+def get_role_by_id(db: Session, role_id: int):
+    """Получить роль по ID из реестра справочников."""
+    return reference_registry.get_by_id(db, db_models.Role, role_id)
 
 
 def create_role(db: Session, name: str) -> db_models.Role:
@@ -138,20 +165,14 @@ def get_or_create_role(db: Session, role_name: str) -> db_models.Role:
 
 # ==================== ГОРОДА (City) ====================
 
-def get_city_by_name(db: Session, city_name: str) -> Optional[db_models.City]:
-    """Получить город по названию."""
-    return db.query(db_models.City).filter(
-        db_models.City.name == city_name,
-        db_models.City.date_delete.is_(None)
-    ).first()
+def get_city_by_name(db: Session, city_name: str):
+    """Получить город по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.City, city_name)
 
 
-def get_city_by_id(db: Session, city_id: int) -> Optional[db_models.City]:
-    """Получить город по ID."""
-    return db.query(db_models.City).filter(
-        db_models.City.id == city_id,
-        db_models.City.date_delete.is_(None)
-    ).first()
+def get_city_by_id(db: Session, city_id: int):
+    """Получить город по ID из реестра справочников."""
+    return reference_registry.get_by_id(db, db_models.City, city_id)
 
 
 def create_city(db: Session, name: str, lat: Optional[float] = None, long: Optional[float] = None) -> db_models.City:
@@ -296,6 +317,8 @@ def organization_to_dict(org: db_models.Organization) -> Dict[str, Any]:
         "cover_image": org.cover_image,
         "volunteer_role": org.volunteer_role,
         "reason_rejection": org.reason_rejection,
+        "members_count": org.members_count or 0,
+        "favorites_count": org.favorites_count or 0,
     }
 
 
@@ -309,6 +332,25 @@ def get_all_organizations(db: Session, status_id: Optional[int] = None) -> List[
     return query.all()
 
 
+def get_organizations_by_name(db: Session, status_id: Optional[int] = None,
+                              limit: Optional[int] = None) -> List[db_models.Organization]:
+    """
+    Получить организации, отсортированные по названию, одним запросом
+    вместе с городом, категорией и статусом.
+    """
+    query = db.query(db_models.Organization).options(
+        *ORGANIZATION_LOAD_OPTIONS
+    ).filter(
+        db_models.Organization.date_delete.is_(None)
+    )
+    if status_id is not None:
+        query = query.filter(db_models.Organization.status_organization_id == status_id)
+    query = query.order_by(db_models.Organization.name, db_models.Organization.id)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
 def get_approved_nkos(db: Session) -> List[Dict[str, Any]]:
     """Получить список одобренных НКО (с использованием БД)."""
     # Пока возвращаем все организации
@@ -317,12 +359,9 @@ def get_approved_nkos(db: Session) -> List[Dict[str, Any]]:
 
 # ==================== КАТЕГОРИИ (Category) ====================
 
-def get_category_by_name(db: Session, name: str) -> Optional[db_models.Category]:
-    """Получить категорию по названию."""
-    return db.query(db_models.Category).filter(
-        db_models.Category.name == name,
-        db_models.Category.date_delete.is_(None)
-    ).first()
+def get_category_by_name(db: Session, name: str):
+    """Получить категорию по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.Category, name)
 
 
 def create_category(db: Session, name: str) -> db_models.Category:
@@ -348,12 +387,9 @@ def get_or_create_category(db: Session, name: str) -> db_models.Category:
 
 # ==================== СТАТУС ОРГАНИЗАЦИИ (StatusOrganization) ====================
 
-def get_status_organization_by_name(db: Session, name: str) -> Optional[db_models.StatusOrganization]:
-    """Получить статус организации по названию."""
-    return db.query(db_models.StatusOrganization).filter(
-        db_models.StatusOrganization.name == name,
-        db_models.StatusOrganization.date_delete.is_(None)
-    ).first()
+def get_status_organization_by_name(db: Session, name: str):
+    """Получить статус организации по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.StatusOrganization, name)
 
 
 def create_status_organization(db: Session, name: str) -> db_models.StatusOrganization:
@@ -379,12 +415,9 @@ def get_or_create_status_organization(db: Session, name: str) -> db_models.Statu
 
 # ==================== СТАТУСЫ СОБЫТИЙ (StatusEvent) ====================
 
-def get_status_event_by_name(db: Session, name: str) -> Optional[db_models.StatusEvent]:
-    """Получить статус события по названию."""
-    return db.query(db_models.StatusEvent).filter(
-        db_models.StatusEvent.name == name,
-        db_models.StatusEvent.date_delete.is_(None)
-    ).first()
+def get_status_event_by_name(db: Session, name: str):
+    """Получить статус события по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.StatusEvent, name)
 
 
 def create_status_event(db: Session, name: str) -> db_models.StatusEvent:
@@ -500,6 +533,24 @@ def get_all_events(db: Session) -> List[db_models.Event]:
     ).all()
 
 
+def get_events_by_date(db: Session, limit: Optional[int] = None) -> List[db_models.Event]:
+    """
+    Получить мероприятия по дате проведения (мероприятия без даты первыми)
+    вместе с организацией, городом, категорией, статусом и фото.
+    """
+    query = db.query(db_models.Event).options(
+        *EVENT_LOAD_OPTIONS
+    ).filter(
+        db_models.Event.date_delete.is_(None)
+    ).order_by(
+        db_models.Event.date_time_event.asc().nulls_first(),
+        db_models.Event.id,
+    )
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
 def get_events_by_organization(db: Session, org_id: int) -> List[db_models.Event]:
     """Получить все мероприятия организации."""
     return db.query(db_models.Event).filter(
@@ -584,6 +635,8 @@ def event_to_dict(event: db_models.Event) -> Dict[str, Any]:
         "phone": phone,
         "email": email,
         "maxParticipants": event.quantity_participant or 0,
+        "participantsCount": event.quantity_registered or 0,
+        "favoritesCount": event.favorites_count or 0,
         "registrationRequired": event.date_before_register is not None,
         "isFree": True,  # По умолчанию true, т.к. в БД нет поля
         "images": images,
@@ -591,12 +644,9 @@ def event_to_dict(event: db_models.Event) -> Dict[str, Any]:
 
 # ==================== КАТЕГОРИИ МЕРОПРИЯТИЙ (CategoryEvent) ====================
 
-def get_category_event_by_name(db: Session, name: str) -> Optional[db_models.CategoryEvent]:
-    """Получить категорию мероприятия по названию."""
-    return db.query(db_models.CategoryEvent).filter(
-        db_models.CategoryEvent.name == name,
-        db_models.CategoryEvent.date_delete.is_(None)
-    ).first()
+def get_category_event_by_name(db: Session, name: str):
+    """Получить категорию мероприятия по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.CategoryEvent, name)
 
 
 def create_category_event(db: Session, name: str) -> db_models.CategoryEvent:
@@ -622,12 +672,9 @@ def get_or_create_category_event(db: Session, name: str) -> db_models.CategoryEv
 
 # ==================== ТИПЫ МЕРОПРИЯТИЙ (TypeEvent) ====================
 
-def get_type_event_by_name(db: Session, name: str) -> Optional[db_models.TypeEvent]:
-    """Получить тип мероприятия по названию."""
-    return db.query(db_models.TypeEvent).filter(
-        db_models.TypeEvent.name == name,
-        db_models.TypeEvent.date_delete.is_(None)
-    ).first()
+def get_type_event_by_name(db: Session, name: str):
+    """Получить тип мероприятия по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.TypeEvent, name)
 
 
 def create_type_event(db: Session, name: str) -> db_models.TypeEvent:
@@ -660,6 +707,24 @@ def get_all_news(db: Session) -> List[db_models.News]:
     ).all()
 
 
+def get_latest_news(db: Session, limit: Optional[int] = None) -> List[db_models.News]:
+    """
+    Получить новости, начиная с самых новых, вместе с городом, категорией,
+    фото, файлами и хэштегами (без отдельного запроса на каждую новость).
+    """
+    query = db.query(db_models.News).options(
+        *NEWS_LOAD_OPTIONS
+    ).filter(
+        db_models.News.date_delete.is_(None)
+    ).order_by(
+        db_models.News.date_event.desc().nulls_last(),
+        db_models.News.id,
+    )
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
 def get_news_by_id(db: Session, news_id: int) -> Optional[db_models.News]:
     """Получить новость по ID."""
     return db.query(db_models.News).filter(
@@ -804,16 +869,14 @@ def news_to_dict(news: db_models.News) -> Dict[str, Any]:
         "city": news.city.name if news.city else "Не указан",
         "category": news.category_news.name if news.category_news else "",
         "tags": tags,
+        "favoritesCount": news.favorites_count or 0,
     }
 
 # ==================== КАТЕГОРИИ НОВОСТЕЙ (CategoryNews) ====================
 
-def get_category_news_by_name(db: Session, name: str) -> Optional[db_models.CategoryNews]:
-    """Получить категорию новостей по названию."""
-    return db.query(db_models.CategoryNews).filter(
-        db_models.CategoryNews.name == name,
-        db_models.CategoryNews.date_delete.is_(None)
-    ).first()
+def get_category_news_by_name(db: Session, name: str):
+    """Получить категорию новостей по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.CategoryNews, name)
 
 
 def create_category_news(db: Session, name: str) -> db_models.CategoryNews:
@@ -837,6 +900,34 @@ def get_or_create_category_news(db: Session, name: str) -> db_models.CategoryNew
     return category
 
 
+# ==================== СТАТУСЫ УЧАСТНИКОВ (StatusParticipantEvent) ====================
+
+def get_status_participant_event_by_name(db: Session, name: str):
+    """Получить статус участника мероприятия по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.StatusParticipantEvent, name)
+
+
+def create_status_participant_event(db: Session, name: str) -> db_models.StatusParticipantEvent:
+    """Создать новый статус участника мероприятия."""
+    db_status = db_models.StatusParticipantEvent(
+        name=name,
+        date_create=datetime.utcnow(),
+        date_update=datetime.utcnow()
+    )
+    db.add(db_status)
+    db.commit()
+    db.refresh(db_status)
+    return db_status
+
+
+def get_or_create_status_participant_event(db: Session, name: str) -> db_models.StatusParticipantEvent:
+    """Получить статус участника мероприятия или создать, если не существует."""
+    status = get_status_participant_event_by_name(db, name)
+    if not status:
+        status = create_status_participant_event(db, name)
+    return status
+
+
 # ==================== УЧАСТНИКИ МЕРОПРИЯТИЙ (ParticipantEvent) ====================
 
 def create_participant_event(db: Session, event_id: Optional[int] = None,
@@ -844,7 +935,7 @@ def create_participant_event(db: Session, event_id: Optional[int] = None,
                             organization_id: Optional[int] = None,
                             status_participant_event_id: Optional[int] = None,
                             representative_organization: Optional[int] = None) -> db_models.ParticipantEvent:
-    """Создать запись об участии в мероприятии."""
+    """Создать запись об участии в мероприятии (без проверки лимита мест)."""
     db_participant = db_models.ParticipantEvent(
         event_id=event_id,
         user_id=user_id,
@@ -856,11 +947,28 @@ def create_participant_event(db: Session, event_id: Optional[int] = None,
         date_update=datetime.utcnow()
     )
     db.add(db_participant)
+    waitlist = get_status_participant_event_by_name(db, PARTICIPANT_STATUS_WAITLIST)
+    if event_id is not None and (waitlist is None or status_participant_event_id != waitlist.id):
+        _change_seat_count(db, event_id, 1)
     db.commit()
     db.refresh(db_participant)
     return db_participant
 
 
+def _change_seat_count(db: Session, event_id: int, delta: int) -> None:
+    """Изменяет счётчик занятых мест мероприятия в текущей транзакции."""
+    event = db_models.Event
+    query = update(event).where(event.id == event_id)
+    if delta < 0:
+        query = query.where(event.quantity_registered >= -delta)
+    db.execute(
+        query
+        .values(quantity_registered=event.quantity_registered + delta, date_update=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    data_versions.mark_changed(db, event.__tablename__)
+
+
 def get_participant_events_by_user(db: Session, user_id: int) -> List[db_models.ParticipantEvent]:
     """Получить все участия пользователя в мероприятиях."""
     return db.query(db_models.ParticipantEvent).filter(
@@ -878,24 +986,154 @@ def get_participant_event_by_user_and_event(db: Session, user_id: int, event_id:
     ).first()
 
 def get_user_registered_events(db: Session, user_id: int) -> List[db_models.Event]:
-    """Получить все мероприятия, на которые зарегистрирован пользователь."""
-    participant_events = get_participant_events_by_user(db, user_id)
-    events = []
-    for participant in participant_events:
-        if participant.event_id:
-            event = get_event_by_id(db, participant.event_id)
-            if event:
-                events.append(event)
-    return events
+    """Получить все мероприятия, на которые записан пользователь (включая лист ожидания)."""
+    return db.query(db_models.Event).join(
+        db_models.ParticipantEvent,
+        db_models.ParticipantEvent.event_id == db_models.Event.id,
+    ).options(
+        *EVENT_LOAD_OPTIONS
+    ).filter(
+        db_models.ParticipantEvent.user_id == user_id,
+        db_models.ParticipantEvent.date_delete.is_(None),
+        db_models.Event.date_delete.is_(None),
+    ).order_by(db_models.ParticipantEvent.id).all()
+
+
+def is_unique_violation(exc: IntegrityError) -> bool:
+    """Вызвана ли ошибка нарушением уникального индекса (а не внешнего ключа и т.п.)."""
+    # PostgreSQL: SQLSTATE 23505 (unique_violation)
+    if getattr(exc.orig, "pgcode", None) == "23505":
+        return True
+    return "UNIQUE constraint failed" in str(exc.orig)
+
+
+def _take_seat(db: Session, event_id: int) -> bool:
+    """Занимает место на мероприятии, если оно есть (условный UPDATE счётчика)."""
+    event = db_models.Event
+    return db.execute(
+        update(event)
+        .where(
+            event.id == event_id,
+            event.date_delete.is_(None),
+            or_(
+                event.quantity_participant.is_(None),
+                event.quantity_participant <= 0,
+                event.quantity_registered < event.quantity_participant,
+            ),
+        )
+        .values(quantity_registered=event.quantity_registered + 1, date_update=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def register_participant_event(
+    db: Session,
+    event_id: int,
+    user_id: int,
+) -> Optional[db_models.ParticipantEvent]:
+    """
+    Записать пользователя на мероприятие с учётом лимита мест.
+
+    Место занимается одним условным UPDATE счётчика `quantity_registered`
+    (строка мероприятия блокируется только до конца транзакции); если мест
+    нет, запись попадает в лист ожидания. Повторную запись отсекает
+    уникальный индекс — в этом случае возвращается None. None возвращается
+    и для мероприятия, удалённого до записи.
+    """
+    # Статусы получаем до начала транзакции: создание статуса делает commit
+    registered = get_or_create_status_participant_event(db, PARTICIPANT_STATUS_REGISTERED)
+    waitlist = get_or_create_status_participant_event(db, PARTICIPANT_STATUS_WAITLIST)
+
+    event = db_models.Event
+    seat_taken = _take_seat(db, event_id)
+    if not seat_taken:
+        # UPDATE без совпадений строку не блокирует. Блокируем её до commit:
+        # иначе параллельная отмена не увидит нашу незакоммиченную запись
+        # в листе ожидания и освободит место, которое никому не достанется
+        alive = db.query(event.id).filter(
+            event.id == event_id,
+            event.date_delete.is_(None),
+        ).with_for_update().first()
+        if alive is None:
+            db.rollback()
+            return None
+        # Пока ждали блокировку, отмена могла освободить место
+        seat_taken = _take_seat(db, event_id)
+
+    db_participant = db_models.ParticipantEvent(
+        event_id=event_id,
+        user_id=user_id,
+        status_participant_event_id=(registered if seat_taken else waitlist).id,
+        date_submission=datetime.utcnow(),
+        date_decision=datetime.utcnow() if seat_taken else None,
+        date_create=datetime.utcnow(),
+        date_update=datetime.utcnow()
+    )
+    db.add(db_participant)
+    data_versions.mark_changed(db, event.__tablename__)
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        # Откатываем и занятое место; повторной записью считается только
+        # нарушение уникального индекса, остальные ошибки пробрасываем
+        db.rollback()
+        if not is_unique_violation(exc):
+            raise
+        return None
+    db.refresh(db_participant)
+    return db_participant
+
+
+def is_waitlisted(db: Session, participant: db_models.ParticipantEvent) -> bool:
+    """Находится ли запись об участии в листе ожидания."""
+    waitlist = get_status_participant_event_by_name(db, PARTICIPANT_STATUS_WAITLIST)
+    return waitlist is not None and participant.status_participant_event_id == waitlist.id
 
 
 def delete_participant_event(db: Session, user_id: int, event_id: int) -> bool:
-    """Удалить регистрацию пользователя на мероприятие (мягкое удаление)."""
+    """
+    Удалить регистрацию пользователя на мероприятие (мягкое удаление).
+    Освободившееся место получает первый участник из листа ожидания.
+    """
+    registered = get_or_create_status_participant_event(db, PARTICIPANT_STATUS_REGISTERED)
+    waitlist = get_or_create_status_participant_event(db, PARTICIPANT_STATUS_WAITLIST)
+
+    # Блокируем строку мероприятия: записи и отмены одного мероприятия идут по очереди
+    event = db.query(
+        db_models.Event.quantity_participant,
+        db_models.Event.quantity_registered,
+    ).filter(
+        db_models.Event.id == event_id
+    ).with_for_update().first()
+
     participant = get_participant_event_by_user_and_event(db, user_id, event_id)
     if not participant:
+        db.rollback()
         return False
-    
+
     participant.date_delete = datetime.utcnow()
+
+    if participant.status_participant_event_id != waitlist.id and event is not None:
+        limit = event.quantity_participant
+        seat_free = not limit or limit <= 0 or event.quantity_registered - 1 < limit
+        next_in_line = None
+        if seat_free:
+            next_in_line = db.query(db_models.ParticipantEvent).filter(
+                db_models.ParticipantEvent.event_id == event_id,
+                db_models.ParticipantEvent.status_participant_event_id == waitlist.id,
+                db_models.ParticipantEvent.date_delete.is_(None),
+            ).order_by(
+                db_models.ParticipantEvent.date_submission,
+                db_models.ParticipantEvent.id,
+            ).first()
+
+        if next_in_line is not None:
+            # Место переходит к следующему в очереди, счётчик не меняется
+            next_in_line.status_participant_event_id = registered.id
+            next_in_line.date_decision = datetime.utcnow()
+        else:
+            _change_seat_count(db, event_id, -1)
+
     db.commit()
     return True
 
@@ -1062,39 +1300,46 @@ def remove_selected_knowledge_base(db: Session, user_id: int, kb_id: int) -> boo
     return False
 
 
-def get_selected_events_by_user(db: Session, user_id: int) -> List[db_models.Event]:
+def get_selected_events_by_user(db: Session, user_id: int, limit: Optional[int] = None) -> List[db_models.Event]:
     """Получить все избранные мероприятия пользователя."""
-    selected = db.query(db_models.SelectedEvent).filter(
+    return db.query(db_models.Event).join(
+        db_models.SelectedEvent,
+        db_models.SelectedEvent.event_id == db_models.Event.id,
+    ).options(
+        *EVENT_LOAD_OPTIONS
+    ).filter(
         db_models.SelectedEvent.user_id == user_id,
-        db_models.SelectedEvent.date_delete.is_(None)
-    ).all()
-    
-    return [get_event_by_id(db, s.event_id) for s in selected if get_event_by_id(db, s.event_id)]
+        db_models.SelectedEvent.date_delete.is_(None),
+        db_models.Event.date_delete.is_(None),
+    ).order_by(db_models.SelectedEvent.id).limit(limit).all()
 
 
-def get_selected_news_by_user(db: Session, user_id: int) -> List[db_models.News]:
+def get_selected_news_by_user(db: Session, user_id: int, limit: Optional[int] = None) -> List[db_models.News]:
     """Получить все избранные новости пользователя."""
-    selected = db.query(db_models.SelectedNews).filter(
+    return db.query(db_models.News).join(
+        db_models.SelectedNews,
+        db_models.SelectedNews.news_id == db_models.News.id,
+    ).options(
+        *NEWS_LOAD_OPTIONS
+    ).filter(
         db_models.SelectedNews.user_id == user_id,
-        db_models.SelectedNews.date_delete.is_(None)
-    ).all()
-    
-    return [get_news_by_id(db, s.news_id) for s in selected if get_news_by_id(db, s.news_id)]
+        db_models.SelectedNews.date_delete.is_(None),
+        db_models.News.date_delete.is_(None),
+    ).order_by(db_models.SelectedNews.id).limit(limit).all()
 
 
-def get_selected_knowledge_base_by_user(db: Session, user_id: int) -> List[db_models.KnowledgeBaseData]:
+def get_selected_knowledge_base_by_user(db: Session, user_id: int, limit: Optional[int] = None) -> List[db_models.KnowledgeBaseData]:
     """Получить все избранные материалы базы знаний пользователя."""
-    selected = db.query(db_models.SelectedKnowledgeBaseData).filter(
+    return db.query(db_models.KnowledgeBaseData).join(
+        db_models.SelectedKnowledgeBaseData,
+        db_models.SelectedKnowledgeBaseData.knowledge_base_data_id == db_models.KnowledgeBaseData.id,
+    ).options(
+        *KNOWLEDGE_BASE_LOAD_OPTIONS
+    ).filter(
         db_models.SelectedKnowledgeBaseData.user_id == user_id,
         db_models.SelectedKnowledgeBaseData.date_delete.is_(None),
-    ).all()
-
-    result: List[db_models.KnowledgeBaseData] = []
-    for s in selected:
-        kb = get_knowledge_base_data_by_id(db, s.knowledge_base_data_id)
-        if kb:
-            result.append(kb)
-    return result
+        db_models.KnowledgeBaseData.date_delete.is_(None),
+    ).order_by(db_models.SelectedKnowledgeBaseData.id).limit(limit).all()
 
 
 def add_selected_organization(db: Session, user_id: int, organization_id: int) -> db_models.SelectedOrganization:
@@ -1149,14 +1394,90 @@ def remove_selected_organization(db: Session, user_id: int, organization_id: int
     return False
 
 
-def get_selected_organizations_by_user(db: Session, user_id: int) -> List[db_models.Organization]:
+def get_selected_organizations_by_user(db: Session, user_id: int, limit: Optional[int] = None) -> List[db_models.Organization]:
     """Получить все избранные организации пользователя."""
-    selected = db.query(db_models.SelectedOrganization).filter(
+    return db.query(db_models.Organization).join(
+        db_models.SelectedOrganization,
+        db_models.SelectedOrganization.organization_id == db_models.Organization.id,
+    ).options(
+        *ORGANIZATION_LOAD_OPTIONS
+    ).filter(
         db_models.SelectedOrganization.user_id == user_id,
-        db_models.SelectedOrganization.date_delete.is_(None)
-    ).all()
-    
-    return [get_organization_by_id(db, s.organization_id) for s in selected if get_organization_by_id(db, s.organization_id)]
+        db_models.SelectedOrganization.date_delete.is_(None),
+        db_models.Organization.date_delete.is_(None),
+    ).order_by(db_models.SelectedOrganization.id).limit(limit).all()
+
+
+def _filter_linked_ids(db: Session, target_column, user_id: int, ids: Iterable[int], *conditions) -> List[int]:
+    """
+    Возвращает те из `ids`, для которых у пользователя есть активная запись
+    в связующей таблице (одним IN-запросом по индексу (user_id, target_id)).
+    `conditions` — дополнительные условия на запись.
+    """
+    ids = set(ids)
+    if not ids:
+        return []
+    link_model = target_column.class_
+    rows = db.query(target_column).filter(
+        link_model.user_id == user_id,
+        target_column.in_(ids),
+        link_model.date_delete.is_(None),
+        *conditions,
+    ).distinct().all()
+    return sorted(row[0] for row in rows)
+
+
+def get_favorite_flags(
+    db: Session,
+    user_id: int,
+    event_ids: Iterable[int] = (),
+    news_ids: Iterable[int] = (),
+    kb_ids: Iterable[int] = (),
+    organization_ids: Iterable[int] = (),
+) -> Dict[str, List[int]]:
+    """Какие из переданных сущностей находятся в избранном пользователя."""
+    return {
+        "events": _filter_linked_ids(db, db_models.SelectedEvent.event_id, user_id, event_ids),
+        "news": _filter_linked_ids(db, db_models.SelectedNews.news_id, user_id, news_ids),
+        "kb": _filter_linked_ids(
+            db, db_models.SelectedKnowledgeBaseData.knowledge_base_data_id, user_id, kb_ids
+        ),
+        "nkos": _filter_linked_ids(
+            db, db_models.SelectedOrganization.organization_id, user_id, organization_ids
+        ),
+    }
+
+
+def holds_seat_condition(waitlist_id: int):
+    """
+    Условие «запись занимает место» (не в листе ожидания). Записи, созданные
+    до появления статусов, имеют статус NULL и тоже занимают место.
+    """
+    participant = db_models.ParticipantEvent
+    return or_(
+        participant.status_participant_event_id.is_(None),
+        participant.status_participant_event_id != waitlist_id,
+    )
+
+
+def get_registered_event_ids(db: Session, user_id: int, event_ids: Iterable[int]) -> List[int]:
+    """На какие из переданных мероприятий записан пользователь (не считая листа ожидания)."""
+    waitlist = get_status_participant_event_by_name(db, PARTICIPANT_STATUS_WAITLIST)
+    participant = db_models.ParticipantEvent
+    conditions = [holds_seat_condition(waitlist.id)] if waitlist is not None else []
+    return _filter_linked_ids(db, participant.event_id, user_id, event_ids, *conditions)
+
+
+def get_waitlisted_event_ids(db: Session, user_id: int, event_ids: Iterable[int]) -> List[int]:
+    """В листе ожидания каких из переданных мероприятий находится пользователь."""
+    waitlist = get_status_participant_event_by_name(db, PARTICIPANT_STATUS_WAITLIST)
+    if waitlist is None:
+        return []
+    participant = db_models.ParticipantEvent
+    return _filter_linked_ids(
+        db, participant.event_id, user_id, event_ids,
+        participant.status_participant_event_id == waitlist.id,
+    )
 
 
 # ==================== БАЗА ЗНАНИЙ (KnowledgeBaseData) ====================
@@ -1226,6 +1547,7 @@ def knowledge_base_data_to_dict(kb: db_models.KnowledgeBaseData) -> Dict[str, An
         "category": kb.category_knowledge_base_data.name if kb.category_knowledge_base_data else "",
         "type": kb.type_material_category_knowledge_base_data.name if kb.type_material_category_knowledge_base_data else "",
         "views": kb.quantity_views or 0,
+        "favoritesCount": kb.favorites_count or 0,
         "publishDate": kb.date_create.isoformat() if kb.date_create else "",
         "videoUrl": kb.video_url if kb.video_url else None,
         "externalLink": kb.material_url if kb.material_url else None,
@@ -1235,12 +1557,9 @@ def knowledge_base_data_to_dict(kb: db_models.KnowledgeBaseData) -> Dict[str, An
 
 # ==================== КАТЕГОРИИ БАЗЫ ЗНАНИЙ (CategoryKnowledgeBaseData) ====================
 
-def get_category_knowledge_base_by_name(db: Session, name: str) -> Optional[db_models.CategoryKnowledgeBaseData]:
-    """Получить категорию базы знаний по названию."""
-    return db.query(db_models.CategoryKnowledgeBaseData).filter(
-        db_models.CategoryKnowledgeBaseData.name == name,
-        db_models.CategoryKnowledgeBaseData.date_delete.is_(None)
-    ).first()
+def get_category_knowledge_base_by_name(db: Session, name: str):
+    """Получить категорию базы знаний по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.CategoryKnowledgeBaseData, name)
 
 
 def create_category_knowledge_base(db: Session, name: str) -> db_models.CategoryKnowledgeBaseData:
@@ -1266,12 +1585,9 @@ def get_or_create_category_knowledge_base(db: Session, name: str) -> db_models.C
 
 # ==================== ТИПЫ МАТЕРИАЛОВ БАЗЫ ЗНАНИЙ (TypeMaterialCategoryKnowledgeBaseData) ====================
 
-def get_type_material_by_name(db: Session, name: str) -> Optional[db_models.TypeMaterialCategoryKnowledgeBaseData]:
-    """Получить тип материала базы знаний по названию."""
-    return db.query(db_models.TypeMaterialCategoryKnowledgeBaseData).filter(
-        db_models.TypeMaterialCategoryKnowledgeBaseData.name == name,
-        db_models.TypeMaterialCategoryKnowledgeBaseData.date_delete.is_(None)
-    ).first()
+def get_type_material_by_name(db: Session, name: str):
+    """Получить тип материала базы знаний по названию из реестра справочников."""
+    return reference_registry.get_by_name(db, db_models.TypeMaterialCategoryKnowledgeBaseData, name)
 
 
 def create_type_material(db: Session, name: str) -> db_models.TypeMaterialCategoryKnowledgeBaseData:
@@ -1349,6 +1665,419 @@ def update_knowledge_base_data(db: Session, kb_id: int, **kwargs) -> Optional[db
     return kb
 
 
+# ==================== СТАТИСТИКА ====================
+
+def _count_alive(model, *criteria):
+    """Скалярный подзапрос: количество неудалённых записей модели."""
+    return select(func.count(model.id)).where(
+        model.date_delete.is_(None), *criteria
+    ).scalar_subquery()
+
+
+def get_statistics_counts(db: Session, approved_status_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Получить общие счётчики для админской статистики одним запросом.
+    Если статус «Одобрена» не передан, количество одобренных НКО равно 0.
+    """
+    approved_nko = (
+        _count_alive(
+            db_models.Organization,
+            db_models.Organization.status_organization_id == approved_status_id,
+        )
+        if approved_status_id is not None
+        else None
+    )
+    row = db.execute(select(
+        _count_alive(db_models.User).label("total_users"),
+        _count_alive(db_models.Organization).label("total_nko"),
+        _count_alive(db_models.Event).label("total_events"),
+        _count_alive(db_models.News).label("total_news"),
+        _count_alive(db_models.KnowledgeBaseData).label("total_knowledge_base_data"),
+        *([approved_nko.label("total_pending_nko")] if approved_nko is not None else []),
+    )).mappings().one()
+
+    return {
+        "total_users": row["total_users"],
+        "total_nko": row["total_nko"],
+        "total_pending_nko": row.get("total_pending_nko", 0),
+        "total_events": row["total_events"],
+        "total_news": row["total_news"],
+        "total_knowledge_base_data": row["total_knowledge_base_data"],
+    }
+
+
+def get_statistics_daily(
+    db: Session,
+    metric: str,
+    date_from,
+    date_to,
+    city_id: Optional[int] = None,
+) -> List[Tuple[Any, int]]:
+    """Получить дневные значения метрики за период (по всем городам или по одному)."""
+    Daily = db_models.StatisticsDaily
+    query = db.query(Daily.day, func.sum(Daily.count)).filter(
+        Daily.metric == metric,
+        Daily.day >= date_from,
+        Daily.day <= date_to,
+    )
+    if city_id is not None:
+        query = query.filter(Daily.city_id == city_id)
+    return query.group_by(Daily.day).order_by(Daily.day).all()
+
+
+# ==================== ИСПОЛЬЗУЕМЫЕ КАТЕГОРИИ ====================
+
+def _get_used_categories(db: Session, category_model, content_model,
+                         foreign_key) -> List[Tuple[str, int]]:
+    """
+    Возвращает пары (название категории, количество записей) для категорий,
+    к которым привязана хотя бы одна неудалённая запись. Одноимённые
+    категории объединяются.
+    """
+    rows = db.query(
+        category_model.name,
+        func.count(content_model.id),
+    ).join(
+        content_model, foreign_key == category_model.id
+    ).filter(
+        content_model.date_delete.is_(None),
+        category_model.name.isnot(None),
+        category_model.name != "",
+    ).group_by(
+        category_model.name
+    ).order_by(
+        category_model.name
+    ).all()
+    return [(name, count) for name, count in rows]
+
+
+def get_used_news_categories(db: Session) -> List[Tuple[str, int]]:
+    """Категории новостей, у которых есть новости, с количеством новостей."""
+    return _get_used_categories(
+        db, db_models.CategoryNews, db_models.News, db_models.News.category_news_id
+    )
+
+
+def get_used_event_categories(db: Session) -> List[Tuple[str, int]]:
+    """Категории мероприятий, у которых есть мероприятия, с количеством мероприятий."""
+    return _get_used_categories(
+        db, db_models.CategoryEvent, db_models.Event, db_models.Event.category_event_id
+    )
+
+
+def get_used_organization_categories(db: Session) -> List[Tuple[str, int]]:
+    """Категории организаций, у которых есть организации, с количеством организаций."""
+    return _get_used_categories(
+        db, db_models.Category, db_models.Organization, db_models.Organization.id_category
+    )
+
+
+# ==================== ВАЛИДАТОРЫ HTTP-КЕША (ETag / Last-Modified) ====================
+
+def get_content_validator(
+    db: Session,
+    model,
+    *criteria,
+    related: Iterable[Tuple[Any, list]] = (),
+) -> Tuple[int, Optional[datetime]]:
+    """
+    Возвращает количество актуальных записей и максимальную date_update
+    по таблице и связанным таблицам одним запросом.
+    `related` — пары (модель, список условий) для зависимых таблиц.
+    """
+    columns = [func.count(model.id), func.max(model.date_update)]
+    for related_model, related_criteria in related:
+        columns.append(
+            select(func.max(related_model.date_update))
+            .where(*related_criteria)
+            .scalar_subquery()
+        )
+
+    row = db.query(*columns).filter(model.date_delete.is_(None), *criteria).one()
+    count = row[0] or 0
+    timestamps = [value for value in row[1:] if value is not None]
+    return count, max(timestamps) if timestamps else None
+
+
+def get_news_validator(db: Session, news_id: Optional[int] = None) -> Tuple[int, Optional[datetime]]:
+    """Валидатор для списка новостей или одной новости."""
+    def child(model):
+        return model, ([model.news_id == news_id] if news_id is not None else [])
+
+    criteria = [db_models.News.id == news_id] if news_id is not None else []
+    return get_content_validator(
+        db,
+        db_models.News,
+        *criteria,
+        related=[
+            child(db_models.PhotoNews),
+            child(db_models.FileNews),
+            child(db_models.HashtagsNews),
+            (db_models.City, []),
+            (db_models.CategoryNews, []),
+        ],
+    )
+
+
+def get_event_validator(db: Session, event_id: Optional[int] = None) -> Tuple[int, Optional[datetime]]:
+    """Валидатор для списка мероприятий или одного мероприятия."""
+    photo_criteria = [db_models.PhotoEvent.event_id == event_id] if event_id is not None else []
+    criteria = [db_models.Event.id == event_id] if event_id is not None else []
+    return get_content_validator(
+        db,
+        db_models.Event,
+        *criteria,
+        related=[
+            (db_models.PhotoEvent, photo_criteria),
+            (db_models.Organization, []),
+            (db_models.City, []),
+            (db_models.CategoryEvent, []),
+            (db_models.StatusEvent, []),
+        ],
+    )
+
+
+def get_organization_validator(
+    db: Session,
+    org_id: Optional[int] = None,
+    status_id: Optional[int] = None,
+) -> Tuple[int, Optional[datetime]]:
+    """Валидатор для списка организаций (опционально по статусу) или одной организации."""
+    criteria = []
+    if org_id is not None:
+        criteria.append(db_models.Organization.id == org_id)
+    if status_id is not None:
+        criteria.append(db_models.Organization.status_organization_id == status_id)
+    return get_content_validator(
+        db,
+        db_models.Organization,
+        *criteria,
+        related=[
+            (db_models.City, []),
+            (db_models.Category, []),
+            (db_models.StatusOrganization, []),
+        ],
+    )
+
+
+def get_knowledge_base_validator(db: Session, kb_id: Optional[int] = None) -> Tuple[int, Optional[datetime]]:
+    """Валидатор для списка материалов базы знаний или одного материала."""
+    material_criteria = (
+        [db_models.MaterialKnowledgeBaseData.knowledge_base_data_id == kb_id] if kb_id is not None else []
+    )
+    criteria = [db_models.KnowledgeBaseData.id == kb_id] if kb_id is not None else []
+    return get_content_validator(
+        db,
+        db_models.KnowledgeBaseData,
+        *criteria,
+        related=[
+            (db_models.MaterialKnowledgeBaseData, material_criteria),
+            (db_models.CategoryKnowledgeBaseData, []),
+            (db_models.TypeMaterialCategoryKnowledgeBaseData, []),
+        ],
+    )
+
+
+def get_city_validator(db: Session) -> Tuple[int, Optional[datetime]]:
+    """Валидатор для списка городов."""
+    return get_content_validator(db, db_models.City)
+
+
+def get_favorites_validator(db: Session, user_id: int) -> Tuple[int, Optional[datetime]]:
+    """
+    Валидатор избранного пользователя: количество активных записей и время
+    последнего изменения (добавление, восстановление, удаление из избранного
+    или правка самой избранной сущности). Всё считается одним запросом.
+    """
+    links = (
+        (db_models.SelectedEvent, db_models.SelectedEvent.event_id, db_models.Event),
+        (db_models.SelectedNews, db_models.SelectedNews.news_id, db_models.News),
+        (
+            db_models.SelectedKnowledgeBaseData,
+            db_models.SelectedKnowledgeBaseData.knowledge_base_data_id,
+            db_models.KnowledgeBaseData,
+        ),
+        (
+            db_models.SelectedOrganization,
+            db_models.SelectedOrganization.organization_id,
+            db_models.Organization,
+        ),
+    )
+    counts = []
+    timestamps = []
+    for link_model, target_column, target_model in links:
+        own = link_model.user_id == user_id
+        active = (own, link_model.date_delete.is_(None))
+        counts.append(select(func.count(link_model.id)).where(*active).scalar_subquery())
+        timestamps.append(select(func.max(link_model.date_create)).where(own).scalar_subquery())
+        timestamps.append(select(func.max(link_model.date_delete)).where(own).scalar_subquery())
+        timestamps.append(
+            select(func.max(target_model.date_update))
+            .join(link_model, target_column == target_model.id)
+            .where(*active)
+            .scalar_subquery()
+        )
+
+    row = db.execute(select(*counts, *timestamps)).one()
+    count = sum(value or 0 for value in row[:len(counts)])
+    stamps = [value for value in row[len(counts):] if value is not None]
+    return count, max(stamps) if stamps else None
+
+
+def get_popularity_validator(db: Session, entity: str) -> Tuple[int, Optional[datetime]]:
+    """Количество оценок и время последнего пересчёта рейтинга сущности."""
+    rank = db_models.PopularityRank
+    row = db.query(func.count(rank.id), func.max(rank.date_update)).filter(rank.entity == entity).one()
+    return row[0] or 0, row[1]
+
+
+# ==================== РЕЙТИНГ ПОПУЛЯРНОСТИ ====================
+
+def get_popular(db: Session, entity: str, *criteria, options=(), limit: Optional[int] = None) -> list:
+    """
+    Получить актуальные записи сущности по убыванию рейтинга популярности.
+    Записи без оценки идут последними; рейтинг считает фоновая задача.
+
+    Оценённые записи выбираются в порядке индекса (entity, score) таблицы
+    рейтинга, записи без оценки — отдельным запросом, только если
+    оценённых не хватило до `limit`.
+    """
+    model = popularity.ENTITY_MODELS[entity]
+    rank = db_models.PopularityRank
+    ranked_on = and_(rank.entity == entity, rank.entity_id == model.id)
+
+    ranked = db.query(model).join(rank, ranked_on).options(
+        *options
+    ).filter(
+        rank.entity == entity, model.date_delete.is_(None), *criteria
+    ).order_by(
+        rank.score.desc(),
+        rank.entity_id,
+    )
+    if limit:
+        ranked = ranked.limit(limit)
+    items = ranked.all()
+    if limit and len(items) >= limit:
+        return items
+
+    unranked = db.query(model).outerjoin(rank, ranked_on).options(
+        *options
+    ).filter(
+        rank.id.is_(None), model.date_delete.is_(None), *criteria
+    ).order_by(model.id)
+    if limit:
+        unranked = unranked.limit(limit - len(items))
+    return items + unranked.all()
+
+
+# ==================== КЕШ ГЕНЕРАЦИИ (GenerationCache) ====================
+
+def get_generation_cache_entry(db: Session, key: str) -> Optional[db_models.GenerationCache]:
+    """Получить неистёкшую запись кеша генерации по ключу."""
+    return db.query(db_models.GenerationCache).filter(
+        db_models.GenerationCache.key == key,
+        db_models.GenerationCache.date_expire > datetime.utcnow(),
+    ).first()
+
+
+def save_generation_cache_entry(
+    db: Session,
+    key: str,
+    content: str,
+    date_expire: datetime,
+    model: Optional[str] = None,
+) -> db_models.GenerationCache:
+    """Создать или обновить запись кеша генерации."""
+    entry = db.query(db_models.GenerationCache).filter(
+        db_models.GenerationCache.key == key
+    ).first()
+    if entry is None:
+        entry = db_models.GenerationCache(key=key, date_create=datetime.utcnow())
+        db.add(entry)
+    entry.model = model
+    entry.content = content
+    entry.date_expire = date_expire
+    entry.date_update = datetime.utcnow()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Ту же запись параллельно сохранил другой запрос
+        db.rollback()
+        return get_generation_cache_entry(db, key)
+    db.refresh(entry)
+    return entry
+
+
+def delete_expired_generation_cache(db: Session) -> int:
+    """Удалить истёкшие записи кеша генерации."""
+    deleted = db.query(db_models.GenerationCache).filter(
+        db_models.GenerationCache.date_expire <= datetime.utcnow()
+    ).delete()
+    db.commit()
+    return deleted
+
+
+# ==================== СЕССИИ ИИ-ПОМОЩНИКА (GenerationSession) ====================
+
+def get_generation_session(db: Session, key: str) -> Optional[db_models.GenerationSession]:
+    """Получить неистёкшую сессию ИИ-помощника по ключу."""
+    return db.query(db_models.GenerationSession).filter(
+        db_models.GenerationSession.key == key,
+        db_models.GenerationSession.date_expire > datetime.utcnow(),
+    ).first()
+
+
+def save_generation_session(
+    db: Session,
+    key: str,
+    owner: str,
+    turns: str,
+    window_start: int,
+    date_expire: datetime,
+) -> db_models.GenerationSession:
+    """Создать или обновить сессию ИИ-помощника."""
+    for attempt in range(2):
+        entry = db.query(db_models.GenerationSession).filter(
+            db_models.GenerationSession.key == key
+        ).first()
+        if entry is None:
+            entry = db_models.GenerationSession(key=key, owner=owner, date_create=datetime.utcnow())
+            db.add(entry)
+        entry.turns = turns
+        entry.window_start = window_start
+        entry.date_expire = date_expire
+        entry.date_update = datetime.utcnow()
+        try:
+            db.commit()
+        except IntegrityError as exc:
+            db.rollback()
+            if attempt or not is_unique_violation(exc):
+                raise
+            # Ту же сессию параллельно создал другой запрос: повторяем как обновление,
+            # чтобы не потерять новые реплики
+            continue
+        db.refresh(entry)
+        return entry
+
+
+def delete_generation_session(db: Session, key: str) -> bool:
+    """Удалить сессию ИИ-помощника."""
+    deleted = db.query(db_models.GenerationSession).filter(
+        db_models.GenerationSession.key == key
+    ).delete()
+    db.commit()
+    return deleted > 0
+
+
+def delete_expired_generation_sessions(db: Session) -> int:
+    """Удалить истёкшие сессии ИИ-помощника."""
+    deleted = db.query(db_models.GenerationSession).filter(
+        db_models.GenerationSession.date_expire <= datetime.utcnow()
+    ).delete()
+    db.commit()
+    return deleted
+
+
 # ==================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ====================
 
 def init_default_roles(db: Session):
@@ -1389,6 +2118,10 @@ def init_default_statuses(db: Session):
     # Статусы событий
     for status_name in EVENT_STATUS_PRESETS:
         get_or_create_status_event(db, status_name)
+
+    # Статусы участников мероприятий
+    for status_name in PARTICIPANT_STATUS_PRESETS:
+        get_or_create_status_participant_event(db, status_name)
     
     print("✓ Статусы инициализированы")
 
@@ -1481,9 +2214,10 @@ def init_default_cities(db: Session):
         else:
             # Обновляем координаты, если они не заданы
             if not city.lat or not city.long:
-                city.lat = lat
-                city.long = long
-                city.date_update = datetime.utcnow()
+                db_city = db.get(db_models.City, city.id)
+                db_city.lat = lat
+                db_city.long = long
+                db_city.date_update = datetime.utcnow()
                 db.commit()
     
     print("✓ Города инициализированы")
@@ -1,12 +1,15 @@
 """
 Управление сессиями SQLAlchemy и подключением к базе данных.
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
 
 from .config import settings
 from .db_models import Base
+from . import data_versions  # noqa: F401 - регистрирует обработчики событий сессии
+from . import statistics_rollup  # noqa: F401 - регистрирует обработчики событий сессии
+from . import counters  # noqa: F401 - регистрирует обработчики событий сессии
 
 # Создаем движок базы данных
 engine = create_engine(
@@ -19,15 +22,99 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def _add_missing_columns() -> set:
+    """
+    Добавляет в существующие таблицы колонки, появившиеся в моделях.
+    Возвращает множество добавленных колонок вида "таблица.колонка".
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = set()
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                connection.execute(text(ddl))
+                added.add(f"{table.name}.{column.name}")
+    return added
+
+
+def _upgrade_participant_event(added_columns: set) -> None:
+    """Приводит данные записей на мероприятия к новой схеме."""
+    with engine.begin() as connection:
+        indexes = {index["name"] for index in inspect(connection).get_indexes("participant_event")}
+        if "uq_participant_event_user_id_event_id_active" not in indexes:
+            # Перед созданием уникального индекса снимаем дубли активных записей
+            connection.execute(text(
+                "UPDATE participant_event SET date_delete = CURRENT_TIMESTAMP"
+                " WHERE date_delete IS NULL AND id NOT IN ("
+                " SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM participant_event"
+                " WHERE date_delete IS NULL GROUP BY user_id, event_id) AS keep)"
+            ))
+            if "ix_participant_event_user_id_event_id" in indexes:
+                connection.execute(text("DROP INDEX ix_participant_event_user_id_event_id"))
+
+        if "event.quantity_registered" in added_columns:
+            # Начальное значение счётчика — число активных записей
+            connection.execute(text(
+                "UPDATE event SET quantity_registered = ("
+                " SELECT COUNT(*) FROM participant_event"
+                " WHERE participant_event.event_id = event.id"
+                " AND participant_event.date_delete IS NULL)"
+            ))
+
+
 def init_db():
     """
     Инициализация базы данных - создание всех таблиц.
     Вызывается при старте приложения.
     """
     Base.metadata.create_all(bind=engine)
+    # create_all не меняет уже существующие таблицы: колонки и индексы добавляем сами
+    added_columns = _add_missing_columns()
+    _upgrade_participant_event(added_columns)
+    _upgrade_statistics_daily()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
     print("✓ База данных инициализирована")
 
 
+def _upgrade_statistics_daily() -> None:
+    """Сливает дубли строк дневной статистики перед созданием уникального индекса."""
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        if "statistics_daily" not in inspector.get_table_names():
+            return
+        indexes = {index["name"] for index in inspector.get_indexes("statistics_daily")}
+        if "uq_statistics_daily_metric_city_id_day" in indexes:
+            return
+        # Сумма дублей переносится в строку с меньшим id, остальные удаляются
+        connection.execute(text(
+            "UPDATE statistics_daily SET count = ("
+            " SELECT SUM(other.count) FROM statistics_daily other"
+            " WHERE other.metric = statistics_daily.metric AND other.day = statistics_daily.day"
+            " AND (other.city_id = statistics_daily.city_id"
+            " OR (other.city_id IS NULL AND statistics_daily.city_id IS NULL)))"
+            " WHERE id IN (SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM statistics_daily"
+            " GROUP BY metric, city_id, day HAVING COUNT(*) > 1) AS keep)"
+        ))
+        connection.execute(text(
+            "DELETE FROM statistics_daily WHERE id NOT IN ("
+            " SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM statistics_daily"
+            " GROUP BY metric, city_id, day) AS keep)"
+        ))
+
+
 def get_db() -> Generator[Session, None, None]:
     """
     Dependency для получения сессии БД в FastAPI endpoints.
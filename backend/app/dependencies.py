@@ -1,8 +1,13 @@
-from fastapi import Depends, HTTPException, status
+import ipaddress
+from functools import lru_cache
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, Request, status
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
 from . import auth, db_operations, models
+from .config import settings
 from .db_session import get_db
 
 
@@ -41,6 +46,59 @@ def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Dep
     }
 
 
+def get_token_subject(request: Request) -> Optional[str]:
+    """
+    Email из валидного Bearer-токена запроса без обращения к БД.
+    Возвращает None для анонимного запроса или недействительного токена.
+    """
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+@lru_cache(maxsize=1)
+def _trusted_proxies(value: str) -> List[ipaddress._BaseNetwork]:
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_proxies(settings.TRUSTED_PROXIES))
+
+
+def get_client_ip(request: Request) -> str:
+    """
+    IP-адрес клиента. Если запрос пришёл от доверенного прокси
+    (`TRUSTED_PROXIES`), берётся самый правый адрес X-Forwarded-For, не
+    принадлежащий прокси: адреса левее клиент может подставить сам.
+    """
+    host = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(host):
+        return host
+    forwarded = [item.strip() for item in request.headers.get("x-forwarded-for", "").split(",") if item.strip()]
+    for address in reversed(forwarded):
+        if not _is_trusted_proxy(address):
+            return address
+    return forwarded[0] if forwarded else host
+
+
+def get_client_key(request: Request) -> str:
+    """Идентификатор клиента для лимитов: пользователь из токена или IP-адрес."""
+    subject = get_token_subject(request)
+    if subject:
+        return f"user:{subject}"
+    return f"ip:{get_client_ip(request)}"
+
+
 def get_current_admin_or_moderator(current_user: dict = Depends(get_current_user)):
     """Проверяет, что пользователь - администратор или модератор."""
     if current_user.get("role") not in ["admin", "moderator"]:
@@ -1,12 +1,13 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from . import db_operations, dependencies
 from .db_session import get_db
-from .public import EventResponse, NewsResponse, KnowledgeBaseResponse, NkoResponse
+from .http_cache import conditional_json_response, make_validator
+from .public import EventResponse, NewsResponse, KnowledgeBaseResponse, NkoResponse, nko_response_dict
 
 
 class FavoriteActionResponse(BaseModel):
@@ -29,6 +30,57 @@ class FavoriteOrganizationAddResponse(FavoriteActionResponse):
     organization: NkoResponse
 
 
+class FavoriteFlagsResponse(BaseModel):
+    """ID сущностей из запроса, которые находятся в избранном."""
+
+    events: List[int] = []
+    news: List[int] = []
+    kb: List[int] = []
+    nkos: List[int] = []
+
+
+class FavoritesAllResponse(BaseModel):
+    """Все избранные пользователя по типам (полные данные или проекция для карточек)."""
+
+    events: List[dict] = []
+    news: List[dict] = []
+    knowledge_base: List[dict] = []
+    nkos: List[dict] = []
+
+
+# Поля, которые нужны карточкам списка избранного (projection=card)
+CARD_FIELDS = {
+    "events": ("id", "title", "description", "date", "time", "location", "address", "city", "category", "images",
+               "participantsCount", "favoritesCount"),
+    "news": ("id", "title", "shortDescription", "images", "publishDate", "city", "category", "favoritesCount"),
+    "knowledge_base": ("id", "title", "description", "category", "type", "views", "publishDate", "favoritesCount"),
+    "nkos": ("id", "organization_name", "city_name", "category", "description", "logo_url", "moderation_status",
+             "members_count", "favorites_count"),
+}
+
+# Ограничение на количество ID в одном запросе флагов
+MAX_FLAG_IDS = 500
+
+
+def parse_id_list(value: Optional[str], name: str) -> List[int]:
+    """Разбирает список ID вида "1,2,3" из query-параметра."""
+    if not value:
+        return []
+    try:
+        ids = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Параметр {name} должен содержать ID через запятую",
+        )
+    if len(ids) > MAX_FLAG_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Параметр {name} содержит больше {MAX_FLAG_IDS} ID",
+        )
+    return ids
+
+
 router = APIRouter(
     prefix="/favorites",
     tags=["Избранное"],
@@ -36,6 +88,89 @@ router = APIRouter(
 )
 
 
+@router.get(
+    "/flags",
+    response_model=FavoriteFlagsResponse,
+    summary="Проверить, какие сущности находятся в избранном",
+)
+def get_favorite_flags(
+    events: Optional[str] = Query(None, description="ID мероприятий через запятую"),
+    news: Optional[str] = Query(None, description="ID новостей через запятую"),
+    kb: Optional[str] = Query(None, description="ID материалов базы знаний через запятую"),
+    nkos: Optional[str] = Query(None, description="ID организаций через запятую"),
+    current_user: dict = Depends(dependencies.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Для каждого типа возвращает ID из запроса, которые пользователь добавил
+    в избранное. Позволяет отметить карточки списка без загрузки всех избранных.
+    """
+    return db_operations.get_favorite_flags(
+        db,
+        current_user["id"],
+        event_ids=parse_id_list(events, "events"),
+        news_ids=parse_id_list(news, "news"),
+        kb_ids=parse_id_list(kb, "kb"),
+        organization_ids=parse_id_list(nkos, "nkos"),
+    )
+
+
+@router.get(
+    "/all",
+    response_model=FavoritesAllResponse,
+    summary="Получить всё избранное текущего пользователя",
+)
+def get_all_favorites(
+    request: Request,
+    events_limit: Optional[int] = Query(None, ge=0, description="Максимум мероприятий (0 — не загружать)"),
+    news_limit: Optional[int] = Query(None, ge=0, description="Максимум новостей (0 — не загружать)"),
+    kb_limit: Optional[int] = Query(None, ge=0, description="Максимум материалов базы знаний (0 — не загружать)"),
+    nkos_limit: Optional[int] = Query(None, ge=0, description="Максимум организаций (0 — не загружать)"),
+    projection: str = Query("full", pattern="^(full|card)$", description="full — полные данные, card — поля карточек"),
+    current_user: dict = Depends(dependencies.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Возвращает избранные мероприятия, новости, материалы базы знаний и
+    организации одним запросом. Поддерживает If-None-Match: ETag меняется
+    при любом изменении избранного пользователя или избранных сущностей.
+    """
+    user_id = current_user["id"]
+    validator = make_validator(
+        f"favorites:{user_id}:{request.url.query}",
+        *db_operations.get_favorites_validator(db, user_id),
+    )
+
+    def load(limit, fetch, to_dict):
+        if limit == 0:
+            return []
+        return [to_dict(item) for item in fetch(db, user_id, limit=limit)]
+
+    def build():
+        result = {
+            "events": load(events_limit, db_operations.get_selected_events_by_user, db_operations.event_to_dict),
+            "news": load(news_limit, db_operations.get_selected_news_by_user, db_operations.news_to_dict),
+            "knowledge_base": load(
+                kb_limit,
+                db_operations.get_selected_knowledge_base_by_user,
+                db_operations.knowledge_base_data_to_dict,
+            ),
+            "nkos": load(
+                nkos_limit,
+                db_operations.get_selected_organizations_by_user,
+                lambda org: nko_response_dict(db_operations.organization_to_dict(org)),
+            ),
+        }
+        if projection == "card":
+            result = {
+                key: [{field: item.get(field) for field in CARD_FIELDS[key]} for item in items]
+                for key, items in result.items()
+            }
+        return result
+
+    return conditional_json_response(request, validator, build)
+
+
 @router.post(
     "/events/{event_id}",
     response_model=FavoriteAddResponse,
@@ -300,25 +435,7 @@ def add_organization_to_favorites(
         db_operations.add_selected_organization(db, current_user["id"], nko_id)
 
     # Преобразуем организацию в формат NkoResponse
-    org_dict = db_operations.organization_to_dict(organization)
-    nko_data = {
-        "id": org_dict.get("id"),
-        "email": org_dict.get("email", ""),
-        "organization_name": org_dict.get("organization_name", ""),
-        "city_name": org_dict.get("city_name", "Не указан"),
-        "city_lat": org_dict.get("city_lat"),
-        "city_long": org_dict.get("city_long"),
-        "moderation_status": org_dict.get("moderation_status", ""),
-        "category": org_dict.get("category"),
-        "description": org_dict.get("description", ""),
-        "address": org_dict.get("address", ""),
-        "website_url": org_dict.get("website_url", ""),
-        "phone": org_dict.get("phone", ""),
-        "founded_year": org_dict.get("founded_year"),
-        "social_links": org_dict.get("social_links", []),
-        "logo_url": org_dict.get("logo_url"),
-        "rejection_reason": org_dict.get("reason_rejection"),
-    }
+    nko_data = nko_response_dict(db_operations.organization_to_dict(organization))
 
     return FavoriteOrganizationAddResponse(
         message="Организация добавлена в избранное",
@@ -339,30 +456,7 @@ def get_favorite_organizations(
     organizations = db_operations.get_selected_organizations_by_user(db, current_user["id"])
     
     # Преобразуем в формат NkoResponse
-    result = []
-    for org in organizations:
-        org_dict = db_operations.organization_to_dict(org)
-        nko_data = {
-            "id": org_dict.get("id"),
-            "email": org_dict.get("email", ""),
-            "organization_name": org_dict.get("organization_name", ""),
-            "city_name": org_dict.get("city_name", "Не указан"),
-            "city_lat": org_dict.get("city_lat"),
-            "city_long": org_dict.get("city_long"),
-            "moderation_status": org_dict.get("moderation_status", ""),
-            "category": org_dict.get("category"),
-            "description": org_dict.get("description", ""),
-            "address": org_dict.get("address", ""),
-            "website_url": org_dict.get("website_url", ""),
-            "phone": org_dict.get("phone", ""),
-            "founded_year": org_dict.get("founded_year"),
-            "social_links": org_dict.get("social_links", []),
-            "logo_url": org_dict.get("logo_url"),
-            "rejection_reason": org_dict.get("reason_rejection"),
-        }
-        result.append(nko_data)
-    
-    return result
+    return [nko_response_dict(db_operations.organization_to_dict(org)) for org in organizations]
 
 
 @router.delete(
@@ -0,0 +1,216 @@
+"""
+Контроль допуска запросов к генерации.
+
+Запросы к LLM долгие и дорогие, поэтому всплеск обращений к `/generation`
+не должен исчерпывать квоту модели и ресурсы остального API:
+
+* у каждого клиента (пользователь из токена или IP) есть token bucket:
+  `GENERATION_RATE_PER_MINUTE` запросов в минуту с запасом
+  `GENERATION_BURST`; без свободного токена — 429 с Retry-After;
+* одновременно выполняется не больше `GENERATION_MAX_CONCURRENCY`
+  генераций, остальные ждут в очереди длиной не больше
+  `GENERATION_MAX_QUEUE`; переполнение очереди или ожидание дольше
+  `GENERATION_QUEUE_TIMEOUT_SECONDS` — 503 с Retry-After.
+
+Глубина очереди, время ожидания и отказы доступны в `snapshot()`.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from ..config import settings
+
+# Сколько последних ожиданий учитывать в перцентилях
+_WAIT_SAMPLES = 1000
+# Сколько клиентов хранить в таблице token bucket
+_MAX_BUCKETS = 10000
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated_at: float
+
+
+class TokenBuckets:
+    """Token bucket на клиента; давно не появлявшиеся клиенты вытесняются."""
+
+    def __init__(self, rate_per_second: float, capacity: float) -> None:
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """
+        Забирает токен клиента. Возвращает 0, если токен был, иначе — сколько
+        секунд ждать до появления следующего.
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket(tokens=self.capacity, updated_at=now)
+                self._buckets[key] = bucket
+                while len(self._buckets) > _MAX_BUCKETS:
+                    self._buckets.popitem(last=False)
+            else:
+                bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated_at) * self.rate_per_second)
+                bucket.updated_at = now
+                self._buckets.move_to_end(key)
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0.0
+            return (1 - bucket.tokens) / self.rate_per_second
+
+
+def _retry_after(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class AdmissionController:
+    """Глобальное ограничение параллельности с очередью и лимитами на клиента."""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout_seconds: float,
+        rate_per_minute: float,
+        burst: int,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.buckets = TokenBuckets(rate_per_minute / 60.0, burst) if rate_per_minute > 0 else None
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting_seen = 0
+        self.admitted = 0
+        self.rejected_rate_limited = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._wait_times: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self._wait_total = 0.0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Семафор привязан к event loop; при новом loop (перезапуск, тесты) создаём заново
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    async def acquire(self, client_key: str) -> None:
+        """Допускает запрос к генерации или поднимает 429/503."""
+        self.check_rate(client_key)
+        await self.acquire_slot()
+
+    def check_rate(self, client_key: str) -> None:
+        """Расходует токен клиента или поднимает 429."""
+        if self.buckets is not None:
+            wait = self.buckets.take(client_key)
+            if wait > 0:
+                self.rejected_rate_limited += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Слишком много запросов к генерации. Повторите позже.",
+                    headers=_retry_after(wait),
+                )
+
+    async def acquire_slot(self) -> None:
+        """Занимает место в общей очереди генерации или поднимает 503."""
+        semaphore = self._get_semaphore()
+        # Счётчики меняются синхронно, в отличие от состояния семафора
+        if self.active + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected_queue_full += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис генерации перегружен. Повторите позже.",
+                headers=_retry_after(self.queue_timeout_seconds),
+            )
+
+        started = time.monotonic()
+        self.waiting += 1
+        self.max_waiting_seen = max(self.max_waiting_seen, self.waiting)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис генерации перегружен. Повторите позже.",
+                headers=_retry_after(self.queue_timeout_seconds),
+            )
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self._wait_times.append(waited)
+        self._wait_total += waited
+        self.active += 1
+        self.admitted += 1
+
+    async def try_acquire_slot(self) -> bool:
+        """
+        Занимает место, только если оно свободно прямо сейчас (для фоновой
+        работы: она не ждёт в очереди и не вытесняет запросы клиентов).
+        """
+        semaphore = self._get_semaphore()
+        if self.waiting or semaphore.locked():
+            return False
+        # Семафор не занят — acquire не ждёт
+        await semaphore.acquire()
+        self.active += 1
+        return True
+
+    def release(self) -> None:
+        """Освобождает место, занятое `acquire` или `acquire_slot`."""
+        self.active -= 1
+        self._get_semaphore().release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущее состояние и накопленные показатели для мониторинга."""
+        waits = sorted(self._wait_times)
+
+        def percentile(q: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(q * len(waits)))]
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_queue_depth_seen": self.max_waiting_seen,
+            "admitted": self.admitted,
+            "rejected_rate_limited": self.rejected_rate_limited,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_seconds": {
+                "avg": self._wait_total / self.admitted if self.admitted else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": waits[-1] if waits else 0.0,
+            },
+        }
+
+
+admission = AdmissionController(
+    max_concurrency=settings.GENERATION_MAX_CONCURRENCY,
+    max_queue=settings.GENERATION_MAX_QUEUE,
+    queue_timeout_seconds=settings.GENERATION_QUEUE_TIMEOUT_SECONDS,
+    rate_per_minute=settings.GENERATION_RATE_PER_MINUTE,
+    burst=settings.GENERATION_BURST,
+)
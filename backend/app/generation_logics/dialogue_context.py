@@ -0,0 +1,243 @@
+"""
+Окно контекста диалога ИИ-помощника.
+
+Раньше в модель каждый раз уходил весь диалог, и время до первого
+токена и стоимость росли вместе с разговором. Теперь промпт собирается
+в пределах бюджета токенов:
+
+* последние реплики — сколько помещается в `DIALOGUE_HISTORY_TOKENS`
+  (последняя реплика пользователя — всегда, при необходимости обрезанная);
+* более ранние реплики — кратким содержанием не длиннее
+  `DIALOGUE_SUMMARY_TOKENS`.
+
+Краткое содержание «накатывается»: для разговора с `conversation_id`
+хранится сводка первых N реплик, и когда из окна выпадают новые
+реплики, в фоне к ней добавляются только они. Пока сводка обновляется,
+выпавшие реплики представлены выдержками из вопросов пользователя, так
+что запрос не ждёт суммаризации. Без `conversation_id` используются
+только выдержки. Обновление может быть пропущено (сводка вернула None) —
+например, если у клиента исчерпан бюджет или очередь генерации занята.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from ..config import settings
+from .tokens import CHARS_PER_TOKEN, estimate_tokens
+from .turns import ASSISTANT_PREFIX, ROLE_USER, USER_PREFIX, Turn
+
+# Длина выдержки из одного вопроса, в токенах
+_EXCERPT_TOKENS = 60
+
+# Возвращает новую сводку или None, если обновление пришлось пропустить
+Summarizer = Callable[[str, str], Awaitable[Optional[str]]]
+
+
+def format_turns(turns: List[Turn]) -> str:
+    """Реплики в текстовом формате фронтенда."""
+    return "\n".join(
+        f"{USER_PREFIX if role == ROLE_USER else ASSISTANT_PREFIX} {text}" for role, text in turns
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Обрезает текст до оценки в `max_tokens` токенов (с начала или с конца)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(int(max_tokens * CHARS_PER_TOKEN) - 1, 0)
+    return "…" + text[-limit:] if keep_end else text[:limit] + "…"
+
+
+def _fingerprint(turns: List[Turn]) -> str:
+    return hashlib.sha1(format_turns(turns).encode("utf-8")).hexdigest()
+
+
+def split_window(turns: List[Turn], budget: int) -> Tuple[List[Turn], List[Turn]]:
+    """
+    Делит реплики на (ранние, последние): последние — максимальный хвост,
+    укладывающийся в `budget` токенов. Последняя реплика попадает в окно
+    всегда; если она сама больше бюджета, от неё остаётся конец.
+    """
+    if not turns:
+        return [], []
+    role, text = turns[-1]
+    recent = [(role, truncate_to_tokens(text, budget, keep_end=True))]
+    used = estimate_tokens(format_turns(recent))
+    start = len(turns) - 1
+    while start > 0:
+        cost = estimate_tokens(format_turns([turns[start - 1]])) + 1
+        if used + cost > budget:
+            break
+        used += cost
+        start -= 1
+        recent.insert(0, turns[start])
+    return turns[:start], recent
+
+
+def advance_window(turns: List[Turn], start: int, budget: int) -> int:
+    """
+    Начало окна для хранимого разговора. Пока реплики с `start` укладываются
+    в `budget`, окно не сдвигается; при переполнении сдвигается так, чтобы
+    осталось не больше половины бюджета. Начало промпта меняется редко, и
+    кеш промптов на стороне LLM продолжает срабатывать.
+    """
+    if estimate_tokens(format_turns(turns[start:])) <= budget:
+        return start
+    while start < len(turns) - 1 and estimate_tokens(format_turns(turns[start:])) > budget // 2:
+        start += 1
+    return start
+
+
+def extractive_summary(turns: List[Turn], budget: int) -> str:
+    """Выдержки из вопросов пользователя — самые поздние, в пределах бюджета."""
+    lines: List[str] = []
+    used = 0
+    for role, text in reversed(turns):
+        if role != ROLE_USER:
+            continue
+        line = "— " + truncate_to_tokens(" ".join(text.split()), _EXCERPT_TOKENS)
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.insert(0, line)
+        used += cost
+    if not lines:
+        return ""
+    return "Пользователь ранее спрашивал:\n" + "\n".join(lines)
+
+
+@dataclass
+class _Summary:
+    covered: int
+    fingerprint: str
+    text: str
+    updated_at: float
+
+
+@dataclass
+class DialogueWindow:
+    """Реплики для промпта и краткое содержание выпавших из окна."""
+
+    recent: List[Turn]
+    summary: str
+
+
+class DialogueSummaries:
+    """Сводки ранней части разговоров: LRU с TTL и фоновым обновлением."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_updates: int) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_updates = max_updates
+        self._entries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._updating: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.updates = 0
+        self.update_failures = 0
+        self.updates_skipped = 0
+
+    def get(self, key: str) -> Optional[_Summary]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.updated_at + self.ttl_seconds <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _set(self, key: str, entry: _Summary) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def build(self, key: Optional[str], turns: List[Turn], summarize: Summarizer) -> DialogueWindow:
+        """Окно для промпта; при необходимости запускает фоновое обновление сводки."""
+        older, recent = split_window(turns, settings.DIALOGUE_HISTORY_TOKENS)
+        return DialogueWindow(recent, self.summary_for(key, older, summarize))
+
+    def summary_for(self, key: Optional[str], older: List[Turn], summarize: Summarizer) -> str:
+        """Краткое содержание ранних реплик; недостающую часть сводки дополняет в фоне."""
+        budget = settings.DIALOGUE_SUMMARY_TOKENS
+        if not older:
+            return ""
+        if key is None:
+            return extractive_summary(older, budget)
+
+        cached = self.get(key)
+        covered, previous = 0, ""
+        if cached is not None and cached.covered <= len(older) and cached.fingerprint == _fingerprint(older[:cached.covered]):
+            covered, previous = cached.covered, cached.text
+
+        uncovered = older[covered:]
+        if uncovered:
+            self._schedule_update(key, previous, older, covered, summarize)
+
+        parts = [previous] if previous else []
+        previous_tokens = estimate_tokens(previous)
+        excerpt = extractive_summary(uncovered, budget - previous_tokens)
+        if excerpt:
+            parts.append(excerpt)
+        return "\n".join(parts)
+
+    def _schedule_update(self, key: str, previous: str, older: List[Turn], covered: int, summarize: Summarizer) -> None:
+        with self._lock:
+            if key in self._updating:
+                return
+            if len(self._updating) >= self.max_updates:
+                self.updates_skipped += 1
+                return
+            self._updating.add(key)
+        task = asyncio.get_running_loop().create_task(self._update(key, previous, list(older), covered, summarize))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _update(self, key: str, previous: str, older: List[Turn], covered: int, summarize: Summarizer) -> None:
+        try:
+            text = await summarize(previous, format_turns(older[covered:]))
+            if text is None:
+                self.updates_skipped += 1
+                return
+            text = truncate_to_tokens(text.strip(), settings.DIALOGUE_SUMMARY_TOKENS)
+            self._set(key, _Summary(len(older), _fingerprint(older), text, time.monotonic()))
+            self.updates += 1
+        except Exception as e:  # без сводки работают выдержки
+            self.update_failures += 1
+            print(f"⚠ Ошибка обновления сводки диалога: {e}")
+        finally:
+            with self._lock:
+                self._updating.discard(key)
+
+    async def drain(self) -> None:
+        """Дожидается фоновых обновлений (при завершении приложения)."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Показатели для мониторинга."""
+        with self._lock:
+            size = len(self._entries)
+            updating = len(self._updating)
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "updating": updating,
+            "updates": self.updates,
+            "update_failures": self.update_failures,
+            "updates_skipped": self.updates_skipped,
+        }
+
+
+dialogue_summaries = DialogueSummaries(
+    max_entries=settings.DIALOGUE_SUMMARY_MAX_ENTRIES,
+    ttl_seconds=settings.DIALOGUE_SUMMARY_TTL_SECONDS,
+    max_updates=settings.DIALOGUE_SUMMARY_MAX_UPDATES,
+)
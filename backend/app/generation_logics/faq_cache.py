@@ -0,0 +1,189 @@
+"""
+Семантический кеш частых вопросов к ИИ-помощнику.
+
+Многие вопросы почти совпадают («как стать волонтёром», «как стать
+волонтером?»). Вопрос векторизуется хешированием символьных n-грамм,
+векторы прошлых вопросов хранятся в ограниченной матрице вместе с
+ответами; если косинусная близость нового вопроса к одному из них не
+ниже `FAQ_CACHE_SIMILARITY_THRESHOLD`, отдаётся сохранённый ответ без
+обращения к LLM.
+
+Кешируются только самостоятельные вопросы — диалоги из одной реплики
+пользователя: ответ на продолжение разговора зависит от контекста.
+Внешних сервисов не требуется; при наличии NumPy поиск идёт умножением
+матрицы на вектор, без неё — перебором разреженных векторов. Поиск
+занимает процессор, поэтому роутер вызывает его в пуле потоков.
+
+Ответы опираются на контент портала из поискового индекса: когда
+индекс помечает материалы, новости или НКО изменёнными, кеш очищается.
+"""
+import math
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import settings
+from .knowledge_index import knowledge_index
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - защита от отсутствующей зависимости
+    np = None  # type: ignore
+
+# Размерность пространства хешей n-грамм
+VECTOR_DIM = 2048
+NGRAM_SIZES = (2, 3, 4)
+
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+SparseVector = Dict[int, float]
+
+
+def normalize_question(text: str) -> str:
+    """Нижний регистр, «ё» -> «е», без пунктуации и лишних пробелов."""
+    text = text.lower().replace("ё", "е")
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def vectorize(text: str) -> SparseVector:
+    """Нормированный разреженный вектор хешей символьных n-грамм текста."""
+    padded = f" {normalize_question(text)} "
+    vector: SparseVector = {}
+    for size in NGRAM_SIZES:
+        for i in range(len(padded) - size + 1):
+            index = zlib.crc32(padded[i:i + size].encode("utf-8")) % VECTOR_DIM
+            vector[index] = vector.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if not norm:
+        return {}
+    return {index: value / norm for index, value in vector.items()}
+
+
+class FaqCache:
+    """Ограниченное хранилище «вектор вопроса -> ответ» с поиском по косинусной близости."""
+
+    def __init__(self, max_entries: int, threshold: float, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        # Строки заполняются по кругу: новая запись вытесняет самую старую
+        self._matrix = np.zeros((max_entries, VECTOR_DIM), dtype=np.float32) if np is not None else None
+        self._sparse: List[SparseVector] = []
+        self._answers: List[str] = []
+        self._expires: List[float] = []
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _best_match(self, vector: SparseVector, live_only: bool = False) -> Optional[Tuple[int, float]]:
+        """
+        (индекс строки, близость) для самого близкого вопроса.
+        `live_only` — без истёкших записей: они не должны заслонять
+        чуть менее близкий, но действующий ответ.
+        """
+        size = len(self._answers)
+        if not size or not vector:
+            return None
+        now = time.monotonic()
+        if self._matrix is not None:
+            dense = np.zeros(VECTOR_DIM, dtype=np.float32)
+            dense[list(vector.keys())] = list(vector.values())
+            similarities = self._matrix[:size] @ dense
+            if live_only:
+                similarities[np.asarray(self._expires) <= now] = -np.inf
+            row = int(similarities.argmax())
+            if similarities[row] == -np.inf:
+                return None
+            return row, float(similarities[row])
+        candidates = [
+            (sum(value * stored.get(index, 0.0) for index, value in vector.items()), row)
+            for row, stored in enumerate(self._sparse)
+            if not live_only or self._expires[row] > now
+        ]
+        if not candidates:
+            return None
+        best = max(candidates)
+        return best[1], best[0]
+
+    def _write_row(self, row: int, vector: SparseVector, answer: str) -> None:
+        expires = time.monotonic() + self.ttl_seconds
+        if row == len(self._answers):
+            self._sparse.append(vector)
+            self._answers.append(answer)
+            self._expires.append(expires)
+        else:
+            self._sparse[row] = vector
+            self._answers[row] = answer
+            self._expires[row] = expires
+        if self._matrix is not None:
+            self._matrix[row] = 0.0
+            self._matrix[row, list(vector.keys())] = list(vector.values())
+
+    def get(self, question: str) -> Optional[str]:
+        """Сохранённый ответ на близкий вопрос или None."""
+        vector = vectorize(question)
+        with self._lock:
+            match = self._best_match(vector, live_only=True)
+            if match is not None:
+                row, similarity = match
+                if similarity >= self.threshold:
+                    self.hits += 1
+                    return self._answers[row]
+            self.misses += 1
+            return None
+
+    def add(self, question: str, answer: str) -> None:
+        """Сохраняет ответ; близкий вопрос, если есть, заменяется."""
+        vector = vectorize(question)
+        if not vector or self.max_entries <= 0:
+            return
+        with self._lock:
+            match = self._best_match(vector)
+            if match is not None and match[1] >= self.threshold:
+                row = match[0]
+            else:
+                row = self._next
+                self._next = (self._next + 1) % self.max_entries
+            self._write_row(row, vector, answer)
+
+    def invalidate(self, documents: Optional[set] = None) -> None:
+        """Сбрасывает кеш после изменения контента портала."""
+        self.invalidations += 1
+        self.clear()
+
+    def clear(self) -> None:
+        """Очищает кеш."""
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix[:] = 0.0
+            self._sparse.clear()
+            self._answers.clear()
+            self._expires.clear()
+            self._next = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Показатели кеша для мониторинга."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._answers),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "backend": "numpy" if self._matrix is not None else "python",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+faq_cache = FaqCache(
+    max_entries=settings.FAQ_CACHE_MAX_ENTRIES,
+    threshold=settings.FAQ_CACHE_SIMILARITY_THRESHOLD,
+    ttl_seconds=settings.FAQ_CACHE_TTL_SECONDS,
+)
+
+knowledge_index.add_listener(faq_cache.invalidate)
@@ -1,17 +1,34 @@
-from typing import Optional, Iterable, Literal
-from pathlib import Path
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Annotated, Any, List, Optional, AsyncIterator, Awaitable, Callable, Literal
 
-from fastapi import APIRouter, HTTPException
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.types import Receive, Scope, Send
 
 from ..config import settings
+from ..dependencies import get_client_key, get_current_admin
+from ..responses import dumps
+from .admission import admission
+from .dialogue_context import DialogueWindow, advance_window, dialogue_summaries, format_turns
+from .faq_cache import faq_cache
+from .knowledge_index import ENTITY_LABELS, Passage, knowledge_index
+from .llm_metrics import LlmCall, llm_metrics
+from .response_cache import CACHE_BYPASS, generation_cache, make_key
+from .sessions import ConversationSession, generation_sessions
+from .tokens import estimate_tokens
+from .turns import ROLE_ASSISTANT, ROLE_USER, last_user_turn, split_turns, standalone_question
 
 try:
-    from openai import OpenAI
+    import httpx
+    from openai import AsyncOpenAI
 except ImportError:  # pragma: no cover - защита от отсутствующей зависимости
-    OpenAI = None  # type: ignore
+    httpx = None  # type: ignore
+    AsyncOpenAI = None  # type: ignore
 
 
 router = APIRouter(prefix="/generation", tags=["Генерация текстов"])
@@ -23,24 +40,6 @@ SYSTEM_PROMPT = (
 )
 
 
-def _load_portal_instructions() -> str:
-    """
-    Загружает текстовое описание портала из файла instructions.txt,
-    чтобы использовать его как контекст для генерации ответов.
-    """
-    instructions_path = Path(__file__).with_name("instructions.txt")
-    try:
-        return instructions_path.read_text(encoding="utf-8").strip()
-    except FileNotFoundError:
-        # Если файла нет — просто работаем без дополнительного контекста.
-        return ""
-    except OSError:
-        return ""
-
-
-INSTRUCTIONS_TEXT = _load_portal_instructions()
-
-
 class NewsGenerationRequest(BaseModel):
     title: str = Field(
         ...,
@@ -55,15 +54,31 @@ class NewsGenerationResponse(BaseModel):
     content: str
 
 
+class NewsBatchGenerationRequest(BaseModel):
+    titles: List[Annotated[str, Field(min_length=5, max_length=200)]] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.GENERATION_BATCH_MAX_ITEMS,
+        description="Заголовки новостей, по которым нужно подготовить тексты",
+    )
+
+
 class DialogueGenerationRequest(BaseModel):
     dialogue: str = Field(
         ...,
         min_length=10,
-        max_length=4000,
+        max_length=20000,
         description=(
             "Диалог с пользователем (включая реплики ассистента), который нужно продолжить."
         ),
     )
+    conversation_id: Optional[str] = Field(
+        None,
+        max_length=64,
+        description=(
+            "Идентификатор разговора: по нему кешируется краткое содержание ранних реплик"
+        ),
+    )
 
 
 class DialogueGenerationResponse(BaseModel):
@@ -93,11 +108,59 @@ class NewsEditResponse(BaseModel):
     content: str
 
 
-_openai_client: Optional["OpenAI"] = None
+class SessionCreateResponse(BaseModel):
+    session_id: str
+    expires_in: int
+
+
+class SessionTurn(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class SessionResponse(BaseModel):
+    session_id: str
+    turns: List[SessionTurn]
+
+
+class SessionMessageRequest(BaseModel):
+    message: str = Field(
+        ...,
+        min_length=1,
+        max_length=4000,
+        description="Новая реплика пользователя",
+    )
+
+
+class SessionMessageResponse(BaseModel):
+    session_id: str
+    answer: str
+
+
+_openai_client: Optional["AsyncOpenAI"] = None
+
+
+def _build_http_client() -> "httpx.AsyncClient":
+    """
+    Общий пул HTTP-соединений к LLM. Асинхронный клиент не занимает потоки
+    на время генерации, поэтому сотни одновременных запросов к модели не
+    отнимают threadpool у эндпоинтов, работающих с БД.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            settings.OPENAI_TIMEOUT_SECONDS,
+            connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
 
 
-def _get_openai_client() -> "OpenAI":
-    if OpenAI is None:
+def _get_openai_client() -> "AsyncOpenAI":
+    if AsyncOpenAI is None:
         raise HTTPException(
             status_code=500,
             detail="Библиотека для работы с OpenAI не установлена на сервере.",
@@ -113,10 +176,14 @@ def _get_openai_client() -> "OpenAI":
     global _openai_client
     if _openai_client is None:
         try:
-            client_kwargs = {"api_key": api_key}
+            client_kwargs = {
+                "api_key": api_key,
+                "http_client": _build_http_client(),
+                "max_retries": settings.OPENAI_MAX_RETRIES,
+            }
             if settings.OPENAI_BASE_URL:
                 client_kwargs["base_url"] = settings.OPENAI_BASE_URL
-            _openai_client = OpenAI(**client_kwargs)
+            _openai_client = AsyncOpenAI(**client_kwargs)
         except Exception as exc:  # pragma: no cover - сетевые ошибки
             raise HTTPException(
                 status_code=500,
@@ -125,6 +192,14 @@ def _get_openai_client() -> "OpenAI":
     return _openai_client
 
 
+async def close_openai_client() -> None:
+    """Закрывает пул соединений к LLM (при завершении приложения)."""
+    global _openai_client
+    if _openai_client is not None:
+        client, _openai_client = _openai_client, None
+        await client.close()
+
+
 def _build_prompt(title: str) -> str:
     return (
         "Подготовь развернутое содержание новости объёмом 2–3 абзаца (примерно "
@@ -138,35 +213,111 @@ def _build_prompt(title: str) -> str:
     ).format(title=title.strip())
 
 
-def _build_dialogue_prompt(dialogue: str) -> list[dict[str, str]]:
-    user_prompt = (
-        "Ниже приведён диалог пользователя с ассистентом. Ответь на последнюю "
-        "реплику пользователя на русском языке. Дай полезный, фактический и короткий "
-        "ответ (не более 5–7 предложений), укажи конкретные шаги или рекомендации, если это уместно. "
-        "Если данных недостаточно, честно скажи об этом и предложи, что можно уточнить."
+DIALOGUE_INSTRUCTIONS = (
+    "Ответь на последнюю "
+    "реплику пользователя на русском языке. Дай полезный, фактический и короткий "
+    "ответ (не более 5–7 предложений), укажи конкретные шаги или рекомендации, если это уместно. "
+    "Если данных недостаточно, честно скажи об этом и предложи, что можно уточнить."
+)
+
+
+def _format_context(passages: list[Passage]) -> str:
+    """Найденные фрагменты в виде нумерованного списка справок."""
+    return "\n\n".join(
+        f"[{number}] {ENTITY_LABELS[passage.entity]}: {passage.title}\n{passage.text}"
+        for number, passage in enumerate(passages, start=1)
     )
 
-    # Дополнительный контекст о портале, загруженный из instructions.txt
+
+def _build_dialogue_prompt(window: DialogueWindow, passages: list[Passage]) -> list[dict[str, str]]:
+    user_prompt = "Ниже приведён диалог пользователя с ассистентом. " + DIALOGUE_INSTRUCTIONS
+
+    # Справки о портале и его содержимом, найденные по вопросу пользователя
     portal_context = ""
-    if INSTRUCTIONS_TEXT:
+    if passages:
         portal_context = (
-            "Дополнительный контекст о портале «Добрые дела Росатома»:\n"
-            f"{INSTRUCTIONS_TEXT}\n\n"
+            "Справочные материалы портала «Добрые дела Росатома», относящиеся к вопросу:\n"
+            f"{_format_context(passages)}\n\n"
             "Используй эту информацию как справку при ответах пользователю, "
             "но не цитируй её полностью дословно без необходимости."
         )
 
+    # Ранние реплики, не поместившиеся в окно, — кратким содержанием
+    history_summary = ""
+    if window.summary:
+        history_summary = "Краткое содержание начала разговора:\n" + window.summary
+
+    system_content = SYSTEM_PROMPT
+    for section in (portal_context, history_summary):
+        if section:
+            system_content += "\n\n" + section
+
     return [
-        {
-            "role": "system",
-            "content": SYSTEM_PROMPT
-            + ("\n\n" + portal_context if portal_context else ""),
-        },
+        {"role": "system", "content": system_content},
         {"role": "user", "content": user_prompt},
-        {"role": "assistant", "content": dialogue.strip()},
+        {"role": "assistant", "content": format_turns(window.recent)},
     ]
 
 
+async def _summarize_dialogue(previous: str, turns_text: str, client_key: str) -> Optional[str]:
+    """
+    Дополняет краткое содержание разговора новыми репликами. Сводка — фоновая
+    работа по запросу клиента `client_key`: она расходует его дневной бюджет
+    и занимает место в общей очереди генерации. Если бюджет исчерпан или
+    свободных мест нет, сводка пропускается (None) — работают выдержки.
+    """
+    if llm_metrics.budgets.exhausted(client_key):
+        return None
+    prompt = (
+        "Составь краткое содержание разговора пользователя с ИИ-помощником портала "
+        "не длиннее {limit} слов: о чём спрашивал пользователь, что ему ответили, "
+        "какие факты о нём и его задаче важны для продолжения. Верни только текст "
+        "содержания.\n\n"
+    ).format(limit=settings.DIALOGUE_SUMMARY_TOKENS // 2)
+    if previous:
+        prompt += f"Содержание предыдущей части разговора:\n{previous}\n\n"
+    prompt += f"Новые реплики:\n{turns_text}"
+    if not await admission.try_acquire_slot():
+        return None
+    try:
+        return await _chat_completion(
+            [{"role": "user", "content": prompt}],
+            "LLM не смогла составить краткое содержание диалога.",
+            "dialogue_summary",
+            client_key,
+        )
+    finally:
+        admission.release()
+
+
+def _conversation_key(request: Request, conversation_id: Optional[str]) -> Optional[str]:
+    """Ключ сводки разговора; разговоры разных клиентов не пересекаются."""
+    if not conversation_id:
+        return None
+    return f"{get_client_key(request)}:{conversation_id}"
+
+
+async def _dialogue_messages(
+    dialogue: str,
+    client_key: str,
+    conversation_key: Optional[str] = None,
+) -> list[dict[str, str]]:
+    """
+    Промпт диалога в пределах бюджета токенов: последние реплики, краткое
+    содержание ранних и справки, найденные по последней реплике пользователя.
+    """
+    window = dialogue_summaries.build(
+        conversation_key, split_turns(dialogue), partial(_summarize_dialogue, client_key=client_key)
+    )
+    query = last_user_turn(dialogue) or dialogue
+    try:
+        passages = await run_in_threadpool(knowledge_index.retrieve, query)
+    except Exception as e:  # без справок ответ хуже, но генерация работает
+        print(f"⚠ Ошибка поиска по базе знаний: {e}")
+        passages = []
+    return _build_dialogue_prompt(window, passages)
+
+
 def _build_news_edit_prompt(news_text: str, user_request: str, action: str) -> str:
     action_instruction = (
         "сделай текст длиннее, расширь его, добавь больше деталей и контекста"
@@ -186,102 +337,95 @@ def _build_news_edit_prompt(news_text: str, user_request: str, action: str) -> s
     )
 
 
-def _generate_news_body(title: str) -> str:
-    client = _get_openai_client()
-    response = client.chat.completions.create(
-        model=settings.OPENAI_MODEL,
-        temperature=settings.OPENAI_TEMPERATURE,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": _build_prompt(title)},
-        ],
-    )
+def _prompt_tokens(messages: list[dict[str, str]]) -> int:
+    return sum(estimate_tokens(message["content"]) for message in messages)
 
-    try:
-        content = response.choices[0].message.content or ""
-    except (IndexError, AttributeError) as exc:
-        raise HTTPException(
-            status_code=502,
-            detail="LLM вернула неожиданную структуру ответа.",
-        ) from exc
 
-    content = content.strip()
-    if not content:
-        raise HTTPException(
-            status_code=502,
-            detail="LLM не смогла сгенерировать текст новости.",
-        )
-
-    return content
-
-
-def _generate_dialogue_answer(dialogue: str) -> str:
+async def _chat_completion(
+    messages: list[dict[str, str]],
+    empty_detail: str,
+    endpoint: str,
+    client_key: Optional[str] = None,
+) -> str:
+    """
+    Запрос к LLM без стриминга; возвращает текст ответа или 502. Токены и
+    время обращения учитываются в метриках `endpoint` и в дневном расходе
+    клиента `client_key` (None — служебный запрос, в бюджет не входит).
+    """
     client = _get_openai_client()
-    response = client.chat.completions.create(
-        model=settings.OPENAI_MODEL,
-        temperature=settings.OPENAI_TEMPERATURE,
-        messages=_build_dialogue_prompt(dialogue),
-    )
-
+    call = llm_metrics.start(endpoint, client_key, _prompt_tokens(messages))
     try:
-        content = response.choices[0].message.content or ""
-    except (IndexError, AttributeError) as exc:
-        raise HTTPException(
-            status_code=502,
-            detail="LLM вернула неожиданную структуру ответа.",
-        ) from exc
-
-    content = content.strip()
-    if not content:
-        raise HTTPException(
-            status_code=502,
-            detail="LLM не смогла сгенерировать ответ.",
+        response = await client.chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            temperature=settings.OPENAI_TEMPERATURE,
+            messages=messages,
         )
+        if response.usage is not None:
+            call.usage = (response.usage.prompt_tokens, response.usage.completion_tokens)
 
+        try:
+            content = response.choices[0].message.content or ""
+        except (IndexError, AttributeError) as exc:
+            raise HTTPException(
+                status_code=502,
+                detail="LLM вернула неожиданную структуру ответа.",
+            ) from exc
+
+        content = content.strip()
+        if not content:
+            raise HTTPException(status_code=502, detail=empty_detail)
+    except asyncio.CancelledError:
+        call.cancel(0)
+        raise
+    except Exception as exc:
+        call.fail(exc)
+        raise
+
+    call.succeed(estimate_tokens(content))
     return content
 
 
-def _edit_news(news_text: str, user_request: str, action: str) -> str:
-    client = _get_openai_client()
-    response = client.chat.completions.create(
-        model=settings.OPENAI_MODEL,
-        temperature=settings.OPENAI_TEMPERATURE,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": _build_news_edit_prompt(news_text, user_request, action)},
-        ],
-    )
+def _news_messages(title: str) -> list[dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": _build_prompt(title)},
+    ]
 
-    try:
-        content = response.choices[0].message.content or ""
-    except (IndexError, AttributeError) as exc:
-        raise HTTPException(
-            status_code=502,
-            detail="LLM вернула неожиданную структуру ответа.",
-        ) from exc
 
-    content = content.strip()
-    if not content:
-        raise HTTPException(
-            status_code=502,
-            detail="LLM не смогла отредактировать текст новости.",
-        )
+def _news_edit_messages(news_text: str, user_request: str, action: str) -> list[dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": _build_news_edit_prompt(news_text, user_request, action)},
+    ]
 
-    return content
+
+async def _generate_dialogue_answer(
+    dialogue: str,
+    client_key: str,
+    conversation_key: Optional[str] = None,
+) -> str:
+    return await _chat_completion(
+        await _dialogue_messages(dialogue, client_key, conversation_key),
+        "LLM не смогла сгенерировать ответ.",
+        "dialogue",
+        client_key,
+    )
 
 
-def _stream_dialogue_answer(dialogue: str) -> Iterable[str]:
+async def _open_stream(messages: list[dict[str, str]]):
     """
-    Стриминговая генерация ответа: по мере поступления токенов от LLM
-    возвращаем их вызывающей стороне.
+    Открывает стриминговый запрос к LLM. Ошибки подключения возникают здесь,
+    до начала HTTP-ответа, и превращаются в 502.
     """
     client = _get_openai_client()
+    extra = {"stream_options": {"include_usage": True}} if settings.OPENAI_STREAM_USAGE else {}
     try:
-        stream = client.chat.completions.create(
+        return await client.chat.completions.create(
             model=settings.OPENAI_MODEL,
             temperature=settings.OPENAI_TEMPERATURE,
-            messages=_build_dialogue_prompt(dialogue),
+            messages=messages,
             stream=True,
+            **extra,
         )
     except Exception as exc:  # pragma: no cover - сетевые ошибки
         raise HTTPException(
@@ -289,8 +433,18 @@ def _stream_dialogue_answer(dialogue: str) -> Iterable[str]:
             detail="Ошибка при обращении к сервису генерации текста (stream).",
         ) from exc
 
+
+async def _iter_stream_text(stream, call: Optional[LlmCall] = None) -> AsyncIterator[str]:
+    """
+    Стриминговая генерация ответа: по мере поступления токенов от LLM
+    возвращаем их вызывающей стороне. В `call` отмечаются первый токен
+    и `usage` из последнего chunk'а, если модель его присылает.
+    """
     # Поток chunk'ов от модели. Каждый chunk может содержать небольшой фрагмент текста.
-    for chunk in stream:
+    async for chunk in stream:
+        usage = getattr(chunk, "usage", None)
+        if call is not None and usage is not None:
+            call.usage = (usage.prompt_tokens, usage.completion_tokens)
         try:
             delta = chunk.choices[0].delta.content or ""
         except (IndexError, AttributeError):
@@ -298,22 +452,157 @@ def _stream_dialogue_answer(dialogue: str) -> Iterable[str]:
             continue
         if not delta:
             continue
+        if call is not None:
+            call.first_token()
         # Отдаём фрагмент текста как есть, без обёртки в SSE,
         # чтобы на фронтенде можно было просто читать текстовый поток.
         yield delta
 
 
-@router.post(
-    "/news",
-    response_model=NewsGenerationResponse,
-    summary="Сгенерировать содержание новости",
-)
-async def generate_news_description(payload: NewsGenerationRequest) -> NewsGenerationResponse:
+class DisconnectAwareStreamingResponse(StreamingResponse):
     """
-    Принимает заголовок новости и возвращает сгенерированное содержание.
+    StreamingResponse, который при отключении клиента сразу прекращает
+    отдачу, закрывает генератор тела и вызывает `on_close` — там
+    закрывается поток от LLM и освобождается место в очереди генерации.
+
+    Starlette следит за отключением только для ASGI-серверов со
+    spec_version < 2.4, а в новых версиях ждёт ошибки записи, которой
+    сервер может и не выдать. Здесь `http.disconnect` слушается всегда.
+    """
+
+    def __init__(self, *args, on_close: Optional[Callable[[], Awaitable[None]]] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            async with anyio.create_task_group() as task_group:
+
+                async def stream_and_stop() -> None:
+                    await self.stream_response(send)
+                    task_group.cancel_scope.cancel()
+
+                task_group.start_soon(stream_and_stop)
+                await self.listen_for_disconnect(receive)
+                task_group.cancel_scope.cancel()
+        finally:
+            with anyio.CancelScope(shield=True):
+                aclose = getattr(self.body_iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+                if self.on_close is not None:
+                    await self.on_close()
+
+
+@asynccontextmanager
+async def _generation_slot(request: Request, rate_limited: bool = True):
+    """
+    Место в очереди генерации на время запроса (429/503 при перегрузке).
+    `rate_limited=False` — лимит клиента уже учтён (элементы пакетного запроса).
+    Клиент, израсходовавший дневной бюджет токенов, получает 429.
+    """
+    llm_metrics.budgets.check(get_client_key(request))
+    if rate_limited:
+        await admission.acquire(get_client_key(request))
+    else:
+        await admission.acquire_slot()
+    try:
+        yield
+    finally:
+        admission.release()
+
+
+async def _streaming_answer(
+    request: Request,
+    build_messages: Callable[[], Awaitable[list[dict[str, str]]]],
+    on_complete: Callable[[str], Awaitable[None]],
+    endpoint: str,
+    on_finish: Optional[Callable[[], None]] = None,
+    headers: Optional[dict[str, str]] = None,
+) -> StreamingResponse:
+    """
+    Потоковый ответ LLM. Место в очереди занято до конца потока, а не только
+    до его открытия. Промпт собирает `build_messages` уже после проверки
+    лимитов и занятия места: отклонённый запрос не запускает поиск справок
+    и суммаризацию. `on_complete` получает ответ целиком, если поток
+    дочитан до конца; `on_finish` вызывается в любом случае.
+    """
+    client_key = get_client_key(request)
+    llm_metrics.budgets.check(client_key)
+    await admission.acquire(client_key)
+    try:
+        messages = await build_messages()
+    except BaseException:
+        admission.release()
+        raise
+    call = llm_metrics.start(endpoint, client_key, _prompt_tokens(messages))
+    try:
+        stream = await _open_stream(messages)
+    except BaseException as exc:
+        call.fail(exc)
+        admission.release()
+        raise
+
+    parts: list[str] = []
+
+    async def on_close() -> None:
+        # Поток закончился или клиент отключился: закрываем соединение
+        # с LLM, чтобы модель не генерировала впустую, и освобождаем место.
+        # Недочитанный поток учитывается как прерванный, с уже полученными токенами.
+        if not call.done:
+            call.cancel(estimate_tokens("".join(parts)))
+        try:
+            await stream.close()
+        finally:
+            admission.release()
+            if on_finish is not None:
+                on_finish()
+
+    async def iter_text() -> AsyncIterator[str]:
+        try:
+            async for delta in _iter_stream_text(stream, call):
+                parts.append(delta)
+                yield delta
+        except Exception as exc:
+            call.fail(exc)
+            raise
+        # Сюда доходим, только если поток дочитан до конца (клиент не отключился)
+        answer = "".join(parts).strip()
+        call.succeed(estimate_tokens(answer))
+        if answer:
+            await on_complete(answer)
+
+    return DisconnectAwareStreamingResponse(
+        iter_text(),
+        media_type="text/plain; charset=utf-8",
+        headers=headers,
+        on_close=on_close,
+    )
+
+
+async def _cached_completion(
+    request: Request,
+    messages: list[dict[str, str]],
+    empty_detail: str,
+    cache: Optional[str],
+    endpoint: str,
+    rate_limited: bool = True,
+) -> tuple[str, str]:
+    """
+    Генерация с кешем ответов. Попадание в кеш не занимает место в
+    очереди генерации и не расходует лимит клиента; `cache=bypass`
+    генерирует заново и обновляет запись. Возвращает текст и состояние
+    кеша для заголовка X-Cache: HIT, MISS или BYPASS.
     """
+    key = make_key(settings.OPENAI_MODEL, settings.OPENAI_TEMPERATURE, messages)
+    if cache != CACHE_BYPASS:
+        content = await generation_cache.get(key)
+        if content is not None:
+            return content, "HIT"
+
     try:
-        content = await run_in_threadpool(_generate_news_body, payload.title)
+        async with _generation_slot(request, rate_limited):
+            content = await _chat_completion(messages, empty_detail, endpoint, get_client_key(request))
     except HTTPException:
         raise
     except Exception as exc:  # pragma: no cover - сетевые ошибки
@@ -322,20 +611,121 @@ async def generate_news_description(payload: NewsGenerationRequest) -> NewsGener
             detail="Ошибка при обращении к сервису генерации текста.",
         ) from exc
 
+    await generation_cache.set(key, content)
+    return content, "BYPASS" if cache == CACHE_BYPASS else "MISS"
+
+
+@router.post(
+    "/news",
+    response_model=NewsGenerationResponse,
+    summary="Сгенерировать содержание новости",
+)
+async def generate_news_description(
+    payload: NewsGenerationRequest,
+    request: Request,
+    response: Response,
+    cache: Optional[str] = Query(None, pattern=f"^{CACHE_BYPASS}$", description="bypass — сгенерировать заново, не используя кеш"),
+) -> NewsGenerationResponse:
+    """
+    Принимает заголовок новости и возвращает сгенерированное содержание.
+    Повторный запрос с тем же заголовком отдаётся из кеша (заголовок X-Cache).
+    """
+    content, cache_status = await _cached_completion(
+        request,
+        _news_messages(payload.title),
+        "LLM не смогла сгенерировать текст новости.",
+        cache,
+        "news",
+    )
+    response.headers["X-Cache"] = cache_status
     return NewsGenerationResponse(title=payload.title, content=content)
 
 
+@router.post(
+    "/news/batch",
+    summary="Сгенерировать содержание нескольких новостей",
+    response_class=StreamingResponse,
+)
+async def generate_news_batch(
+    payload: NewsBatchGenerationRequest,
+    request: Request,
+    cache: Optional[str] = Query(None, pattern=f"^{CACHE_BYPASS}$", description="bypass — сгенерировать заново, не используя кеш"),
+) -> StreamingResponse:
+    """
+    Генерирует тексты по нескольким заголовкам одновременно (в пределах
+    общей очереди генерации) и отдаёт их в формате NDJSON — по строке на
+    заголовок в порядке готовности:
+    `{"index", "title", "content", "cache"}` или `{"index", "title", "error": {"status_code", "detail"}}`.
+    Ошибка одного заголовка не прерывает остальные. Пакет расходует один
+    запрос из лимита клиента.
+    """
+    llm_metrics.budgets.check(get_client_key(request))
+    admission.check_rate(get_client_key(request))
+
+    async def generate_item(index: int, title: str) -> dict[str, Any]:
+        item: dict[str, Any] = {"index": index, "title": title}
+        try:
+            item["content"], item["cache"] = await _cached_completion(
+                request,
+                _news_messages(title),
+                "LLM не смогла сгенерировать текст новости.",
+                cache,
+                "news_batch",
+                rate_limited=False,
+            )
+        except HTTPException as exc:
+            item["error"] = {"status_code": exc.status_code, "detail": exc.detail}
+        except Exception as exc:
+            # Непредвиденная ошибка (кеш, БД и т.п.) не должна обрывать весь поток;
+            # отмена (CancelledError) сюда не попадает и останавливает генерацию
+            print(f"⚠ Ошибка генерации элемента пакета: {exc!r}")
+            item["error"] = {"status_code": 500, "detail": "Внутренняя ошибка при генерации текста новости."}
+        return item
+
+    async def iter_results() -> AsyncIterator[bytes]:
+        tasks = [asyncio.create_task(generate_item(index, title)) for index, title in enumerate(payload.titles)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield dumps(await finished) + b"\n"
+        finally:
+            # Клиент отключился — отменяем недоделанные генерации
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    return DisconnectAwareStreamingResponse(iter_results(), media_type="application/x-ndjson")
+
+
 @router.post(
     "/dialogue",
     response_model=DialogueGenerationResponse,
     summary="Сгенерировать ответ на вопрос пользователя",
 )
-async def continue_dialogue(payload: DialogueGenerationRequest) -> DialogueGenerationResponse:
+async def continue_dialogue(
+    payload: DialogueGenerationRequest,
+    request: Request,
+    response: Response,
+    cache: Optional[str] = Query(None, pattern=f"^{CACHE_BYPASS}$", description="bypass — сгенерировать заново, не используя кеш"),
+) -> DialogueGenerationResponse:
     """
     Принимает диалог в текстовом виде и возвращает ответ ассистента.
+    Ответ на вопрос, близкий к уже заданному, отдаётся из кеша частых
+    вопросов (заголовок X-Cache).
     """
+    question = standalone_question(payload.dialogue)
+    if question is not None and cache != CACHE_BYPASS:
+        cached = await run_in_threadpool(faq_cache.get, question)
+        if cached is not None:
+            response.headers["X-Cache"] = "HIT"
+            return DialogueGenerationResponse(answer=cached)
+
     try:
-        content = await run_in_threadpool(_generate_dialogue_answer, payload.dialogue)
+        async with _generation_slot(request):
+            content = await _generate_dialogue_answer(
+                payload.dialogue,
+                get_client_key(request),
+                _conversation_key(request, payload.conversation_id),
+            )
     except HTTPException:
         raise
     except Exception as exc:  # pragma: no cover - сетевые ошибки
@@ -344,6 +734,9 @@ async def continue_dialogue(payload: DialogueGenerationRequest) -> DialogueGener
             detail="Ошибка при обращении к сервису генерации текста.",
         ) from exc
 
+    if question is not None:
+        await run_in_threadpool(faq_cache.add, question, content)
+        response.headers["X-Cache"] = "BYPASS" if cache == CACHE_BYPASS else "MISS"
     return DialogueGenerationResponse(answer=content)
 
 
@@ -351,21 +744,44 @@ async def continue_dialogue(payload: DialogueGenerationRequest) -> DialogueGener
     "/dialogue/stream",
     summary="Сгенерировать ответ на вопрос пользователя в потоковом режиме",
 )
-def continue_dialogue_stream(payload: DialogueGenerationRequest) -> StreamingResponse:
+async def continue_dialogue_stream(
+    payload: DialogueGenerationRequest,
+    request: Request,
+    cache: Optional[str] = Query(None, pattern=f"^{CACHE_BYPASS}$", description="bypass — сгенерировать заново, не используя кеш"),
+) -> StreamingResponse:
     """
     Стриминговая версия ассистента.
 
     Возвращает текстовый HTTP‑поток (chunked transfer), в котором содержимое ответа
     поступает по мере генерации LLM. Клиенту достаточно читать тело ответа как
-    обычный текстовый поток.
+    обычный текстовый поток. Если клиент отключается, генерация на стороне
+    LLM прерывается. Ответ на частый вопрос из кеша отдаётся одним фрагментом.
     """
+    question = standalone_question(payload.dialogue)
+    if question is not None and cache != CACHE_BYPASS:
+        cached = await run_in_threadpool(faq_cache.get, question)
+        if cached is not None:
+            return StreamingResponse(
+                iter([cached]),
+                media_type="text/plain; charset=utf-8",
+                headers={"X-Cache": "HIT"},
+            )
+
+    async def build_messages() -> list[dict[str, str]]:
+        return await _dialogue_messages(
+            payload.dialogue, get_client_key(request), _conversation_key(request, payload.conversation_id)
+        )
 
-    def token_generator() -> Iterable[str]:
-        yield from _stream_dialogue_answer(payload.dialogue)
+    async def on_complete(answer: str) -> None:
+        if question is not None:
+            await run_in_threadpool(faq_cache.add, question, answer)
 
-    return StreamingResponse(
-        token_generator(),
-        media_type="text/plain; charset=utf-8",
+    return await _streaming_answer(
+        request,
+        build_messages,
+        on_complete,
+        "dialogue_stream",
+        headers={"X-Cache": "BYPASS" if cache == CACHE_BYPASS else "MISS"} if question is not None else None,
     )
 
 
@@ -374,22 +790,212 @@ def continue_dialogue_stream(payload: DialogueGenerationRequest) -> StreamingRes
     response_model=NewsEditResponse,
     summary="Отредактировать текст новости",
 )
-async def edit_news(payload: NewsEditRequest) -> NewsEditResponse:
+async def edit_news(
+    payload: NewsEditRequest,
+    request: Request,
+    response: Response,
+    cache: Optional[str] = Query(None, pattern=f"^{CACHE_BYPASS}$", description="bypass — сгенерировать заново, не используя кеш"),
+) -> NewsEditResponse:
     """
     Принимает текст новости, запрос пользователя и действие (Длиннее/короче),
-    возвращает отредактированный текст новости.
+    возвращает отредактированный текст новости. Повторный запрос с теми же
+    параметрами отдаётся из кеша (заголовок X-Cache).
     """
+    content, cache_status = await _cached_completion(
+        request,
+        _news_edit_messages(payload.news_text, payload.user_request, payload.action),
+        "LLM не смогла отредактировать текст новости.",
+        cache,
+        "news_edit",
+    )
+    response.headers["X-Cache"] = cache_status
+    return NewsEditResponse(content=content)
+
+
+# ==================== СЕССИИ ИИ-ПОМОЩНИКА ====================
+
+async def _session_messages(session: ConversationSession, message: str) -> list[dict[str, str]]:
+    """
+    Промпт очередной реплики сессии. Порядок сообщений одинаков на всех
+    репликах: неизменная инструкция, краткое содержание ранней части,
+    история (окно сдвигается скачками, см. `advance_window`), справки и
+    новая реплика. Начало промпта совпадает с предыдущим запросом, и кеш
+    промптов на стороне LLM срабатывает.
+    """
+    messages = [{"role": "system", "content": SYSTEM_PROMPT + "\n\n" + DIALOGUE_INSTRUCTIONS}]
+    summary = dialogue_summaries.summary_for(
+        f"session:{session.key}",
+        session.turns[:session.window_start],
+        partial(_summarize_dialogue, client_key=session.owner),
+    )
+    if summary:
+        messages.append({"role": "system", "content": "Краткое содержание начала разговора:\n" + summary})
+    messages.extend({"role": role, "content": text} for role, text in session.turns[session.window_start:])
+
     try:
-        content = await run_in_threadpool(
-            _edit_news, payload.news_text, payload.user_request, payload.action
-        )
-    except HTTPException:
+        passages = await run_in_threadpool(knowledge_index.retrieve, message)
+    except Exception as e:  # без справок ответ хуже, но генерация работает
+        print(f"⚠ Ошибка поиска по базе знаний: {e}")
+        passages = []
+    if passages:
+        messages.append({
+            "role": "system",
+            "content": "Справочные материалы портала «Добрые дела Росатома», относящиеся к вопросу:\n"
+            + _format_context(passages),
+        })
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+async def _get_session(request: Request, session_id: str) -> ConversationSession:
+    session = await generation_sessions.get(session_id, get_client_key(request))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Сессия не найдена или истекла")
+    return session
+
+
+def _begin_turn(session: ConversationSession) -> None:
+    """Занимает сессию на время реплики: реплики одной сессии идут по очереди."""
+    if session.busy:
+        raise HTTPException(status_code=409, detail="Предыдущая реплика сессии ещё обрабатывается")
+    if len(session.turns) + 2 > settings.GENERATION_SESSION_MAX_TURNS:
+        raise HTTPException(status_code=409, detail="Сессия слишком длинная. Начните новую.")
+    session.busy = True
+
+
+async def _append_turn(session: ConversationSession, message: str, answer: str) -> None:
+    session.turns.extend([(ROLE_USER, message.strip()), (ROLE_ASSISTANT, answer)])
+    session.window_start = advance_window(session.turns, session.window_start, settings.DIALOGUE_HISTORY_TOKENS)
+    await generation_sessions.save(session)
+
+
+@router.post(
+    "/sessions",
+    response_model=SessionCreateResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Начать сессию ИИ-помощника",
+)
+async def create_session(request: Request) -> SessionCreateResponse:
+    """
+    Создаёт разговор, хранящийся на сервере: дальше клиент отправляет
+    только новые реплики. Сессия доступна только создавшему её клиенту.
+    """
+    session = await generation_sessions.create(get_client_key(request))
+    return SessionCreateResponse(session_id=session.key, expires_in=int(settings.GENERATION_SESSION_TTL_SECONDS))
+
+
+@router.get(
+    "/sessions/{session_id}",
+    response_model=SessionResponse,
+    summary="История сессии ИИ-помощника",
+)
+async def get_session(session_id: str, request: Request) -> SessionResponse:
+    session = await _get_session(request, session_id)
+    return SessionResponse(
+        session_id=session.key,
+        turns=[SessionTurn(role=role, content=text) for role, text in session.turns],
+    )
+
+
+@router.delete(
+    "/sessions/{session_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Завершить сессию ИИ-помощника",
+)
+async def delete_session(session_id: str, request: Request) -> Response:
+    session = await _get_session(request, session_id)
+    await generation_sessions.delete(session)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post(
+    "/sessions/{session_id}/messages",
+    response_model=SessionMessageResponse,
+    summary="Отправить реплику в сессию ИИ-помощника",
+)
+async def send_session_message(
+    session_id: str,
+    payload: SessionMessageRequest,
+    request: Request,
+) -> SessionMessageResponse:
+    """Принимает новую реплику пользователя и возвращает ответ ассистента."""
+    session = await _get_session(request, session_id)
+    _begin_turn(session)
+    try:
+        try:
+            async with _generation_slot(request):
+                messages = await _session_messages(session, payload.message)
+                content = await _chat_completion(
+                    messages,
+                    "LLM не смогла сгенерировать ответ.",
+                    "session",
+                    get_client_key(request),
+                )
+        except HTTPException:
+            raise
+        except Exception as exc:  # pragma: no cover - сетевые ошибки
+            raise HTTPException(
+                status_code=502,
+                detail="Ошибка при обращении к сервису генерации текста.",
+            ) from exc
+        await _append_turn(session, payload.message, content)
+    finally:
+        session.busy = False
+
+    return SessionMessageResponse(session_id=session.key, answer=content)
+
+
+@router.post(
+    "/sessions/{session_id}/messages/stream",
+    summary="Отправить реплику в сессию ИИ-помощника (потоковый ответ)",
+)
+async def send_session_message_stream(
+    session_id: str,
+    payload: SessionMessageRequest,
+    request: Request,
+) -> StreamingResponse:
+    """
+    Потоковая версия реплики сессии. Реплика и ответ сохраняются в сессии,
+    только если ответ получен целиком.
+    """
+    session = await _get_session(request, session_id)
+    _begin_turn(session)
+
+    async def on_complete(answer: str) -> None:
+        await _append_turn(session, payload.message, answer)
+
+    def on_finish() -> None:
+        session.busy = False
+
+    async def build_messages() -> list[dict[str, str]]:
+        return await _session_messages(session, payload.message)
+
+    try:
+        return await _streaming_answer(request, build_messages, on_complete, "session_stream", on_finish)
+    except BaseException:
+        on_finish()
         raise
-    except Exception as exc:  # pragma: no cover - сетевые ошибки
-        raise HTTPException(
-            status_code=502,
-            detail="Ошибка при обращении к сервису генерации текста.",
-        ) from exc
 
-    return NewsEditResponse(content=content)
 
+@router.get(
+    "/metrics",
+    summary="Состояние очереди генерации",
+    dependencies=[Depends(get_current_admin)],
+)
+async def get_generation_metrics() -> dict:
+    """
+    Текущая нагрузка на генерацию: активные запросы, глубина очереди,
+    время ожидания и количество отказов по причинам; состояние кешей ответов;
+    по эндпоинтам — токены, время до первого токена, задержки и ошибки
+    обращений к LLM; дневной расход токенов клиентами. Только для администраторов.
+    """
+    return {
+        "admission": admission.snapshot(),
+        "cache": generation_cache.snapshot(),
+        "faq_cache": faq_cache.snapshot(),
+        "knowledge_index": knowledge_index.snapshot(),
+        "dialogue_summaries": dialogue_summaries.snapshot(),
+        "sessions": generation_sessions.snapshot(),
+        "llm": llm_metrics.snapshot(),
+        "budgets": llm_metrics.budgets.snapshot(),
+    }
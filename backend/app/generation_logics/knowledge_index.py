@@ -0,0 +1,371 @@
+"""
+Поиск справочного контекста для ИИ-помощника (BM25 в памяти процесса).
+
+Вместо всего `instructions.txt` в каждом запросе в промпт попадают
+только фрагменты, относящиеся к вопросу: описание портала, материалы
+базы знаний, новости и одобренные НКО. Тексты режутся на фрагменты
+по `PASSAGE_TOKENS` токенов и индексируются BM25 с простым стеммингом
+(усечение слов), поэтому разные формы слова находят друг друга.
+
+Индекс строится при старте приложения. Дальше он обновляется точечно:
+обработчик after_flush запоминает изменённые материалы, новости и
+организации, после commit они помечаются устаревшими и перечитываются
+из БД перед ближайшим поиском — только они, а не весь индекс.
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .. import db_models, db_operations
+from ..config import settings
+from ..db_session import SessionLocal
+from .tokens import estimate_tokens
+
+ENTITY_PORTAL = "portal"
+ENTITY_KNOWLEDGE_BASE = "knowledge_base"
+ENTITY_NEWS = "news"
+ENTITY_ORGANIZATION = "organization"
+
+ENTITY_LABELS = {
+    ENTITY_PORTAL: "О портале",
+    ENTITY_KNOWLEDGE_BASE: "База знаний",
+    ENTITY_NEWS: "Новость",
+    ENTITY_ORGANIZATION: "НКО",
+}
+
+# Модель -> сущность индекса
+_INDEXED_MODELS = {
+    db_models.KnowledgeBaseData: ENTITY_KNOWLEDGE_BASE,
+    db_models.News: ENTITY_NEWS,
+    db_models.Organization: ENTITY_ORGANIZATION,
+}
+
+ORGANIZATION_STATUS_APPROVED = "Одобрена"
+
+# Размер фрагмента текста в токенах
+PASSAGE_TOKENS = 150
+# Длина основы слова при стемминге усечением
+STEM_LENGTH = 6
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_STALE_KEY = "knowledge_index_stale"
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_STOP_WORDS = frozenset(
+    "и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по "
+    "только ее мне было вот от меня еще нет о из ему теперь когда даже ну вдруг ли если "
+    "уже или ни быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей "
+    "может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего раз "
+    "тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь этом "
+    "один почти мой тем чтобы нее сейчас были куда зачем всех никогда можно при наконец "
+    "два об другой хоть после над больше тот через эти нас про всего них какая много разве "
+    "три эту моя впрочем хорошо свою этой перед иногда лучше чуть том нельзя такой им более "
+    "всегда конечно всю между".split()
+)
+
+DocumentKey = Tuple[str, int]
+PassageKey = Tuple[str, int, int]
+
+
+@dataclass(frozen=True)
+class Passage:
+    """Фрагмент документа, который может попасть в промпт."""
+
+    entity: str
+    entity_id: int
+    title: str
+    text: str
+    tokens: int
+
+
+def tokenize(text: str) -> List[str]:
+    """Термы для BM25: нижний регистр, «ё» -> «е», без стоп-слов, усечённые до основы."""
+    terms = []
+    for word in _WORD_RE.findall(text.lower().replace("ё", "е")):
+        if len(word) < 2 or word in _STOP_WORDS:
+            continue
+        terms.append(word[:STEM_LENGTH])
+    return terms
+
+
+def split_passages(text: str, max_tokens: int = PASSAGE_TOKENS) -> List[str]:
+    """Режет текст на фрагменты не длиннее `max_tokens`, по возможности по строкам."""
+    passages: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for line in (line.strip() for line in text.splitlines()):
+        if not line:
+            continue
+        # Слишком длинная строка режется по словам
+        pieces = [line]
+        if estimate_tokens(line) > max_tokens:
+            words, pieces, piece = line.split(), [], []
+            for word in words:
+                if piece and estimate_tokens(" ".join(piece + [word])) > max_tokens:
+                    pieces.append(" ".join(piece))
+                    piece = []
+                piece.append(word)
+            if piece:
+                pieces.append(" ".join(piece))
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                passages.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+class Bm25Index:
+    """Инвертированный индекс BM25 с добавлением и удалением документов."""
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Dict[PassageKey, int]] = defaultdict(dict)
+        self._lengths: Dict[PassageKey, int] = {}
+        self._terms: Dict[PassageKey, Counter] = {}
+        self._passages: Dict[PassageKey, Passage] = {}
+        self._documents: Dict[DocumentKey, List[PassageKey]] = {}
+        self._total_length = 0
+
+    def remove_document(self, entity: str, entity_id: int) -> None:
+        for key in self._documents.pop((entity, entity_id), ()):
+            for term in self._terms.pop(key):
+                postings = self._postings[term]
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._lengths.pop(key)
+            del self._passages[key]
+
+    def replace_document(self, entity: str, entity_id: int, title: str, text: str) -> None:
+        """Индексирует документ заново (пустой текст — удаление)."""
+        self.remove_document(entity, entity_id)
+        keys = []
+        for number, passage_text in enumerate(split_passages(text)):
+            terms = Counter(tokenize(f"{title}\n{passage_text}"))
+            if not terms:
+                continue
+            key = (entity, entity_id, number)
+            for term, count in terms.items():
+                self._postings[term][key] = count
+            length = sum(terms.values())
+            self._terms[key] = terms
+            self._lengths[key] = length
+            self._total_length += length
+            self._passages[key] = Passage(entity, entity_id, title, passage_text, estimate_tokens(passage_text))
+            keys.append(key)
+        if keys:
+            self._documents[(entity, entity_id)] = keys
+
+    def search(self, query: str, limit: int) -> List[Tuple[float, Passage]]:
+        """Лучшие фрагменты по BM25."""
+        count = len(self._lengths)
+        if not count:
+            return []
+        average_length = self._total_length / count
+        scores: Dict[PassageKey, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[key] / average_length)
+                scores[key] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(score, self._passages[key]) for key, score in best]
+
+    def stats(self) -> Dict[str, int]:
+        return {"documents": len(self._documents), "passages": len(self._passages), "terms": len(self._postings)}
+
+
+def _load_portal_instructions() -> str:
+    """Текстовое описание портала из instructions.txt (пустая строка, если файла нет)."""
+    try:
+        return Path(__file__).with_name("instructions.txt").read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+
+def _join(*parts: Optional[str]) -> str:
+    return "\n".join(part.strip() for part in parts if part and part.strip())
+
+
+def _load_documents(db: Session, entity: str, ids: Optional[Iterable[int]] = None) -> Dict[int, Tuple[str, str]]:
+    """Видимые на портале документы сущности: id -> (заголовок, текст)."""
+    model = next(model for model, name in _INDEXED_MODELS.items() if name == entity)
+    query = db.query(model).filter(model.date_delete.is_(None))
+    if ids is not None:
+        query = query.filter(model.id.in_(list(ids)))
+
+    if entity == ENTITY_ORGANIZATION:
+        approved = db_operations.get_status_organization_by_name(db, ORGANIZATION_STATUS_APPROVED)
+        if approved is None:
+            return {}
+        query = query.filter(model.status_organization_id == approved.id)
+        return {
+            org.id: (
+                org.name or org.short_name or "",
+                _join(
+                    org.short_name, org.description, org.full_description, org.volunteer_role,
+                    f"Адрес: {org.address}" if org.address else None,
+                    f"Сайт: {org.website}" if org.website else None,
+                    f"Телефон: {org.phone}" if org.phone else None,
+                    f"Email: {org.email}" if org.email else None,
+                ),
+            )
+            for org in query
+        }
+    return {item.id: (item.name or "", _join(item.description, item.full_description)) for item in query}
+
+
+class KnowledgeIndex:
+    """BM25-индекс контента портала с точечным обновлением изменённых документов."""
+
+    def __init__(self) -> None:
+        self._index = Bm25Index()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stale: Set[DocumentKey] = set()
+        self._listeners: List[Callable[[Set[DocumentKey]], None]] = []
+        self._loaded = False
+        self.last_rebuild_seconds = 0.0
+        self.documents_refreshed = 0
+
+    def add_listener(self, callback: Callable[[Set[DocumentKey]], None]) -> None:
+        """Подписывает callback на изменение документов (вызывается после commit)."""
+        self._listeners.append(callback)
+
+    def mark_stale(self, keys: Iterable[DocumentKey]) -> None:
+        """Помечает документы для перечитывания перед следующим поиском."""
+        keys = set(keys)
+        with self._lock:
+            self._stale.update(keys)
+        for listener in list(self._listeners):
+            listener(keys)
+
+    def rebuild(self, db: Session) -> None:
+        """Строит индекс заново по всем документам."""
+        started = time.monotonic()
+        with self._lock:
+            self._stale.clear()
+        index = Bm25Index()
+        instructions = _load_portal_instructions()
+        if instructions:
+            index.replace_document(ENTITY_PORTAL, 0, "Портал «Добрые дела Росатома»", instructions)
+        for entity in _INDEXED_MODELS.values():
+            for entity_id, (title, text) in _load_documents(db, entity).items():
+                index.replace_document(entity, entity_id, title, text)
+        with self._lock:
+            self._index = index
+            self._loaded = True
+        self.last_rebuild_seconds = time.monotonic() - started
+
+    def refresh(self, db: Session) -> None:
+        """Перечитывает устаревшие документы (или строит индекс, если его ещё нет)."""
+        with self._refresh_lock:
+            if not self._loaded:
+                self.rebuild(db)
+                return
+            with self._lock:
+                stale, self._stale = self._stale, set()
+            if not stale:
+                return
+            try:
+                by_entity: Dict[str, Set[int]] = defaultdict(set)
+                for entity, entity_id in stale:
+                    by_entity[entity].add(entity_id)
+                loaded = {
+                    entity: _load_documents(db, entity, ids)
+                    for entity, ids in by_entity.items()
+                }
+            except Exception:
+                self.mark_stale(stale)
+                raise
+            with self._lock:
+                for entity, entity_id in stale:
+                    document = loaded[entity].get(entity_id)
+                    if document is None:
+                        self._index.remove_document(entity, entity_id)
+                    else:
+                        self._index.replace_document(entity, entity_id, *document)
+            self.documents_refreshed += len(stale)
+
+    def search(self, query: str, top_k: int, token_budget: int) -> List[Passage]:
+        """Лучшие фрагменты, суммарно укладывающиеся в `token_budget` токенов."""
+        with self._lock:
+            found = self._index.search(query, top_k)
+        passages: List[Passage] = []
+        used = 0
+        for _, passage in found:
+            if used + passage.tokens > token_budget:
+                continue
+            passages.append(passage)
+            used += passage.tokens
+        return passages
+
+    def retrieve(self, query: str) -> List[Passage]:
+        """Поиск для промпта с настройками по умолчанию; при необходимости сначала обновляет индекс."""
+        if not self._loaded or self._stale:
+            db = SessionLocal()
+            try:
+                self.refresh(db)
+            finally:
+                db.close()
+        return self.search(query, settings.RAG_TOP_K, settings.RAG_CONTEXT_TOKENS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Показатели индекса для мониторинга."""
+        with self._lock:
+            stats = self._index.stats()
+            stale = len(self._stale)
+        return {
+            **stats,
+            "loaded": self._loaded,
+            "stale_documents": stale,
+            "documents_refreshed": self.documents_refreshed,
+            "last_rebuild_seconds": self.last_rebuild_seconds,
+        }
+
+
+knowledge_index = KnowledgeIndex()
+
+
+def rebuild_knowledge_index(db: Session) -> None:
+    """Построение индекса при старте приложения."""
+    knowledge_index.rebuild(db)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_indexed_changes(session: Session, flush_context) -> None:
+    """Запоминает материалы, новости и организации, записанные во время flush."""
+    changed = None
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        entity = _INDEXED_MODELS.get(type(obj))
+        if entity is not None and obj.id is not None:
+            if changed is None:
+                changed = session.info.setdefault(_STALE_KEY, set())
+            changed.add((entity, obj.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_indexed_changes(session: Session) -> None:
+    changed = session.info.pop(_STALE_KEY, None)
+    if changed:
+        knowledge_index.mark_stale(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_indexed_changes(session: Session) -> None:
+    session.info.pop(_STALE_KEY, None)
@@ -0,0 +1,244 @@
+"""
+Учёт токенов и задержек обращений к LLM.
+
+Каждое обращение к модели учитывается по эндпоинту: токены промпта и
+ответа (из `usage` ответа модели, а если его нет — оценкой), время до
+первого токена для потоковых ответов, полное время, ошибки, таймауты и
+прерванные клиентом потоки. Значения копятся в гистограммах с
+фиксированными границами и отдаются в `/generation/metrics`.
+
+Из тех же счётчиков ведётся дневной расход токенов по клиентам: при
+`GENERATION_DAILY_TOKEN_BUDGET > 0` клиент, израсходовавший бюджет за
+текущие сутки (UTC), получает 429 до их окончания.
+"""
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Sequence
+
+from fastapi import HTTPException, status
+
+from ..config import settings
+
+try:
+    import httpx
+    from openai import APITimeoutError
+except ImportError:  # pragma: no cover - защита от отсутствующей зависимости
+    httpx = None  # type: ignore
+    APITimeoutError = None  # type: ignore
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_ERROR = "error"
+OUTCOME_TIMEOUT = "timeout"
+OUTCOME_CANCELLED = "cancelled"
+
+
+class Histogram:
+    """Гистограмма с фиксированными верхними границами корзин."""
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля: верхняя граница корзины, в которую он попадает."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip((*self.bounds, "+Inf"), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": buckets,
+        }
+
+
+class EndpointMetrics:
+    """Показатели обращений к LLM одного эндпоинта."""
+
+    def __init__(self) -> None:
+        self.outcomes = {OUTCOME_SUCCESS: 0, OUTCOME_ERROR: 0, OUTCOME_TIMEOUT: 0, OUTCOME_CANCELLED: 0}
+        self.prompt_tokens_total = 0
+        self.completion_tokens_total = 0
+        self.estimated_usage = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.time_to_first_token = Histogram(LATENCY_BUCKETS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.completion_tokens = Histogram(TOKEN_BUCKETS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": sum(self.outcomes.values()),
+            "outcomes": dict(self.outcomes),
+            "prompt_tokens_total": self.prompt_tokens_total,
+            "completion_tokens_total": self.completion_tokens_total,
+            "estimated_usage_calls": self.estimated_usage,
+            "latency_seconds": self.latency.snapshot(),
+            "time_to_first_token_seconds": self.time_to_first_token.snapshot(),
+            "prompt_tokens": self.prompt_tokens.snapshot(),
+            "completion_tokens": self.completion_tokens.snapshot(),
+        }
+
+
+class DailyBudgets:
+    """Расход токенов клиентов за текущие сутки (UTC) и проверка дневного бюджета."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._day = datetime.utcnow().date()
+        self._used: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _roll(self) -> None:
+        today = datetime.utcnow().date()
+        if today != self._day:
+            self._day = today
+            self._used = {}
+
+    def used(self, client_key: str) -> int:
+        with self._lock:
+            self._roll()
+            return self._used.get(client_key, 0)
+
+    def add(self, client_key: str, tokens: int) -> None:
+        with self._lock:
+            self._roll()
+            self._used[client_key] = self._used.get(client_key, 0) + tokens
+
+    def exhausted(self, client_key: str) -> bool:
+        """Израсходовал ли клиент дневной бюджет."""
+        return self.limit > 0 and self.used(client_key) >= self.limit
+
+    def check(self, client_key: str) -> None:
+        """Поднимает 429, если клиент израсходовал дневной бюджет."""
+        if not self.exhausted(client_key):
+            return
+        self.rejected += 1
+        now = datetime.utcnow()
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Дневной лимит генерации исчерпан. Повторите завтра.",
+            headers={"Retry-After": str(max(1, int((tomorrow - now).total_seconds())))},
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._roll()
+            clients = len(self._used)
+            total = sum(self._used.values())
+        return {
+            "daily_token_budget": self.limit,
+            "clients_today": clients,
+            "tokens_today": total,
+            "rejected": self.rejected,
+        }
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    """Таймаут ли это; для HTTPException-обёртки проверяется исходная ошибка."""
+    timeout_types = tuple(
+        t for t in (asyncio.TimeoutError, APITimeoutError, httpx.TimeoutException if httpx else None) if t
+    )
+    return isinstance(exc, timeout_types) or isinstance(exc.__cause__, timeout_types)
+
+
+class LlmCall:
+    """Одно обращение к LLM; итог записывается в метрики ровно один раз."""
+
+    def __init__(self, metrics: "LlmMetrics", endpoint: str, client_key: Optional[str], prompt_estimate: int) -> None:
+        self._metrics = metrics
+        self.endpoint = endpoint
+        self.client_key = client_key
+        self.prompt_estimate = prompt_estimate
+        self.started = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.usage: Optional[tuple] = None
+        self.done = False
+
+    def first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+
+    def succeed(self, completion_estimate: int) -> None:
+        """Успешное завершение; без `usage` от модели токены берутся по оценке."""
+        self._metrics._record(self, OUTCOME_SUCCESS, completion_estimate)
+
+    def fail(self, exc: BaseException) -> None:
+        self._metrics._record(self, OUTCOME_TIMEOUT if _is_timeout(exc) else OUTCOME_ERROR, 0)
+
+    def cancel(self, completion_estimate: int) -> None:
+        """Клиент отключился до конца ответа: полученные токены всё равно потрачены."""
+        self._metrics._record(self, OUTCOME_CANCELLED, completion_estimate)
+
+
+class LlmMetrics:
+    """Метрики обращений к LLM по эндпоинтам."""
+
+    def __init__(self, budgets: DailyBudgets) -> None:
+        self.budgets = budgets
+        self._endpoints: Dict[str, EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def start(self, endpoint: str, client_key: Optional[str], prompt_estimate: int) -> LlmCall:
+        return LlmCall(self, endpoint, client_key, prompt_estimate)
+
+    def _record(self, call: LlmCall, outcome: str, completion_estimate: int) -> None:
+        if call.done:
+            return
+        call.done = True
+        finished = time.monotonic()
+        estimated = call.usage is None
+        prompt_tokens, completion_tokens = call.usage or (call.prompt_estimate, completion_estimate)
+
+        with self._lock:
+            metrics = self._endpoints.setdefault(call.endpoint, EndpointMetrics())
+            metrics.outcomes[outcome] += 1
+            if outcome == OUTCOME_SUCCESS:
+                metrics.latency.observe(finished - call.started)
+            if call.first_token_at is not None:
+                metrics.time_to_first_token.observe(call.first_token_at - call.started)
+            if outcome in (OUTCOME_SUCCESS, OUTCOME_CANCELLED):
+                metrics.prompt_tokens.observe(prompt_tokens)
+                metrics.completion_tokens.observe(completion_tokens)
+                metrics.prompt_tokens_total += prompt_tokens
+                metrics.completion_tokens_total += completion_tokens
+                metrics.estimated_usage += int(estimated)
+
+        if call.client_key is not None and outcome in (OUTCOME_SUCCESS, OUTCOME_CANCELLED):
+            self.budgets.add(call.client_key, prompt_tokens + completion_tokens)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {endpoint: metrics.snapshot() for endpoint, metrics in sorted(self._endpoints.items())}
+
+
+llm_metrics = LlmMetrics(DailyBudgets(settings.GENERATION_DAILY_TOKEN_BUDGET))
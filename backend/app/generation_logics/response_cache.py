@@ -0,0 +1,159 @@
+"""
+Кеш ответов генерации для повторяющихся запросов.
+
+Редакторы часто повторно нажимают «сгенерировать» для того же заголовка
+или той же правки. Ответ для запроса с теми же моделью, температурой и
+(нормализованными) сообщениями берётся из кеша — без обращения к LLM и
+без расхода токенов.
+
+Основной уровень — LRU в памяти процесса с TTL. При
+`GENERATION_CACHE_PERSIST=True` записи дополнительно сохраняются в
+таблицу `generation_cache`, переживают перезапуск и разделяются между
+процессами; промах в памяти проверяет БД.
+"""
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .. import db_operations
+from ..config import settings
+from ..db_session import SessionLocal
+
+CACHE_BYPASS = "bypass"
+
+
+def normalize_text(text: str) -> str:
+    """Нормализация текста для ключа: Unicode NFC и схлопывание пробелов."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_key(model: Optional[str], temperature: float, messages: List[Dict[str, str]]) -> str:
+    """Ключ кеша: sha256 от модели, температуры и нормализованных сообщений."""
+    payload = json.dumps(
+        {
+            "model": model,
+            "temperature": round(float(temperature), 4),
+            "messages": [[m["role"], normalize_text(m["content"])] for m in messages],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Потокобезопасный LRU-кеш ответов LLM с TTL и необязательным хранением в БД."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, persist: bool) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+
+    def _get_local(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            content, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return content
+
+    def _set_local(self, key: str, content: str, ttl_seconds: float) -> None:
+        with self._lock:
+            self._entries[key] = (content, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load_persistent(self, key: str) -> Optional[Tuple[str, float]]:
+        db = SessionLocal()
+        try:
+            entry = db_operations.get_generation_cache_entry(db, key)
+            if entry is None:
+                return None
+            return entry.content, (entry.date_expire - datetime.utcnow()).total_seconds()
+        finally:
+            db.close()
+
+    def _save_persistent(self, key: str, content: str) -> None:
+        db = SessionLocal()
+        try:
+            db_operations.save_generation_cache_entry(
+                db,
+                key,
+                content,
+                date_expire=datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+                model=settings.OPENAI_MODEL,
+            )
+        finally:
+            db.close()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Ответ из кеша или None."""
+        content = self._get_local(key)
+        if content is None and self.persist:
+            try:
+                stored = await run_in_threadpool(self._load_persistent, key)
+            except Exception as e:  # кеш не должен ломать генерацию
+                print(f"⚠ Ошибка чтения кеша генерации: {e}")
+                stored = None
+            if stored is not None:
+                content, ttl_left = stored
+                self._set_local(key, content, ttl_left)
+                self.persistent_hits += 1
+
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+
+    async def set(self, key: str, content: str) -> None:
+        """Сохраняет ответ в кеш."""
+        self._set_local(key, content, self.ttl_seconds)
+        if self.persist:
+            try:
+                await run_in_threadpool(self._save_persistent, key, content)
+            except Exception as e:  # кеш не должен ломать генерацию
+                print(f"⚠ Ошибка записи кеша генерации: {e}")
+
+    def clear(self) -> None:
+        """Очищает кеш в памяти."""
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Показатели кеша для мониторинга."""
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "persistent_hits": self.persistent_hits,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+generation_cache = GenerationCache(
+    max_entries=settings.GENERATION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.GENERATION_CACHE_TTL_SECONDS,
+    persist=settings.GENERATION_CACHE_PERSIST,
+)
@@ -0,0 +1,195 @@
+"""
+Хранилище разговоров ИИ-помощника на стороне сервера.
+
+С сессией клиент отправляет только новую реплику, а не весь диалог:
+реплики хранятся здесь. Основной уровень — LRU в памяти процесса,
+сессия живёт `GENERATION_SESSION_TTL_SECONDS` с последнего обращения.
+У одного клиента в памяти не больше `GENERATION_SESSIONS_PER_CLIENT`
+сессий: новая вытесняет его же самую давнюю, а не чужие.
+При `GENERATION_SESSIONS_PERSIST=True` сессии дополнительно сохраняются
+в таблицу `generation_session`: переживают перезапуск и доступны из
+любого процесса (промах в памяти проверяет БД).
+"""
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from .. import db_operations
+from ..config import settings
+from ..db_session import SessionLocal
+from .turns import Turn
+
+
+@dataclass
+class ConversationSession:
+    """Разговор с ИИ-помощником."""
+
+    key: str
+    owner: str
+    turns: List[Turn] = field(default_factory=list)
+    # Реплики до window_start представлены в промпте кратким содержанием
+    window_start: int = 0
+    expires_at: float = 0.0
+    busy: bool = False
+
+
+class SessionStore:
+    """LRU-хранилище сессий с TTL и необязательным хранением в БД."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, persist: bool, max_per_owner: int) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self.max_per_owner = max_per_owner
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        # Ключи сессий каждого клиента в порядке последнего обращения
+        self._owners: Dict[str, "OrderedDict[str, None]"] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.restored = 0
+        self.evicted = 0
+        self.evicted_per_owner = 0
+
+    def _remove(self, key: str) -> Optional[ConversationSession]:
+        # Вызывается под self._lock
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            keys = self._owners.get(session.owner)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del self._owners[session.owner]
+        return session
+
+    def _touch(self, session: ConversationSession) -> None:
+        # Вызывается под self._lock
+        self._sessions.move_to_end(session.key)
+        self._owners[session.owner].move_to_end(session.key)
+
+    def _put(self, session: ConversationSession) -> None:
+        with self._lock:
+            self._sessions[session.key] = session
+            self._owners.setdefault(session.owner, OrderedDict())[session.key] = None
+            self._touch(session)
+            owner_keys = self._owners[session.owner]
+            while len(owner_keys) > self.max_per_owner:
+                self._remove(next(iter(owner_keys)))
+                self.evicted_per_owner += 1
+            while len(self._sessions) > self.max_entries:
+                self._remove(next(iter(self._sessions)))
+                self.evicted += 1
+
+    def _load_persistent(self, key: str) -> Optional[ConversationSession]:
+        db = SessionLocal()
+        try:
+            entry = db_operations.get_generation_session(db, key)
+            if entry is None:
+                return None
+            ttl_left = (entry.date_expire - datetime.utcnow()).total_seconds()
+            return ConversationSession(
+                key=entry.key,
+                owner=entry.owner,
+                turns=[(role, text) for role, text in json.loads(entry.turns)],
+                window_start=entry.window_start,
+                expires_at=time.monotonic() + ttl_left,
+            )
+        finally:
+            db.close()
+
+    def _save_persistent(self, session: ConversationSession) -> None:
+        db = SessionLocal()
+        try:
+            db_operations.save_generation_session(
+                db,
+                session.key,
+                session.owner,
+                json.dumps(session.turns, ensure_ascii=False),
+                session.window_start,
+                date_expire=datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+            )
+        finally:
+            db.close()
+
+    def _delete_persistent(self, key: str) -> None:
+        db = SessionLocal()
+        try:
+            db_operations.delete_generation_session(db, key)
+        finally:
+            db.close()
+
+    async def create(self, owner: str) -> ConversationSession:
+        """Создаёт пустую сессию клиента."""
+        session = ConversationSession(
+            key=uuid.uuid4().hex,
+            owner=owner,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        self._put(session)
+        self.created += 1
+        if self.persist:
+            await run_in_threadpool(self._save_persistent, session)
+        return session
+
+    async def get(self, key: str, owner: str) -> Optional[ConversationSession]:
+        """Сессия клиента или None (нет, истекла или принадлежит другому клиенту)."""
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                if session.expires_at <= time.monotonic():
+                    self._remove(key)
+                    session = None
+                else:
+                    self._touch(session)
+
+        if session is None and self.persist:
+            session = await run_in_threadpool(self._load_persistent, key)
+            if session is not None:
+                self._put(session)
+                self.restored += 1
+
+        if session is None or session.owner != owner:
+            return None
+        return session
+
+    async def save(self, session: ConversationSession) -> None:
+        """Сохраняет изменения сессии и продлевает её срок жизни."""
+        session.expires_at = time.monotonic() + self.ttl_seconds
+        self._put(session)
+        if self.persist:
+            await run_in_threadpool(self._save_persistent, session)
+
+    async def delete(self, session: ConversationSession) -> None:
+        """Удаляет сессию."""
+        with self._lock:
+            self._remove(session.key)
+        if self.persist:
+            await run_in_threadpool(self._delete_persistent, session.key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Показатели хранилища для мониторинга."""
+        with self._lock:
+            size = len(self._sessions)
+        return {
+            "sessions": size,
+            "max_sessions": self.max_entries,
+            "created": self.created,
+            "restored": self.restored,
+            "evicted": self.evicted,
+            "evicted_per_owner": self.evicted_per_owner,
+            "persist": self.persist,
+        }
+
+
+generation_sessions = SessionStore(
+    max_entries=settings.GENERATION_SESSIONS_MAX,
+    ttl_seconds=settings.GENERATION_SESSION_TTL_SECONDS,
+    persist=settings.GENERATION_SESSIONS_PERSIST,
+    max_per_owner=settings.GENERATION_SESSIONS_PER_CLIENT,
+)
@@ -0,0 +1,17 @@
+"""
+Оценка числа токенов текста без токенизатора модели.
+
+Точный подсчёт зависит от модели; для бюджетов промпта достаточно
+осторожной оценки. Русский текст в токенизаторах GPT занимает примерно
+токен на 2–3 символа, поэтому берём 3 символа на токен и округляем вверх.
+"""
+import math
+
+CHARS_PER_TOKEN = 3.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка количества токенов в тексте."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
@@ -0,0 +1,57 @@
+"""
+Разбор диалога ИИ-помощника.
+
+Фронтенд передаёт диалог одной строкой, по реплике на строку:
+«Пользователь: ...» и «ИИ: ...». Реплика может занимать несколько
+строк — продолжение относится к последнему префиксу. Текст без
+префиксов считается одной репликой пользователя.
+"""
+import re
+from typing import List, Optional, Tuple
+
+USER_PREFIX = "Пользователь:"
+ASSISTANT_PREFIX = "ИИ:"
+
+ROLE_USER = "user"
+ROLE_ASSISTANT = "assistant"
+
+_TURN_RE = re.compile(rf"^[ \t]*({re.escape(USER_PREFIX)}|{re.escape(ASSISTANT_PREFIX)})", re.MULTILINE)
+
+Turn = Tuple[str, str]
+
+
+def split_turns(dialogue: str) -> List[Turn]:
+    """Реплики диалога в виде пар (роль, текст) по порядку."""
+    matches = list(_TURN_RE.finditer(dialogue))
+    if not matches:
+        text = dialogue.strip()
+        return [(ROLE_USER, text)] if text else []
+
+    turns: List[Turn] = []
+    # Текст до первого префикса — тоже реплика пользователя
+    head = dialogue[:matches[0].start()].strip()
+    if head:
+        turns.append((ROLE_USER, head))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(dialogue)
+        text = dialogue[match.end():end].strip()
+        if text:
+            role = ROLE_USER if match.group(1) == USER_PREFIX else ROLE_ASSISTANT
+            turns.append((role, text))
+    return turns
+
+
+def standalone_question(dialogue: str) -> Optional[str]:
+    """Текст вопроса, если диалог состоит из одной реплики пользователя, иначе None."""
+    turns = split_turns(dialogue)
+    if len(turns) == 1 and turns[0][0] == ROLE_USER:
+        return turns[0][1]
+    return None
+
+
+def last_user_turn(dialogue: str) -> Optional[str]:
+    """Последняя реплика пользователя или None."""
+    for role, text in reversed(split_turns(dialogue)):
+        if role == ROLE_USER:
+            return text
+    return None
@@ -0,0 +1,231 @@
+"""
+HTTP-кеширование: in-memory кеш сериализованных ответов и условные запросы.
+
+Запись кеша хранит тело ответа в JSON и его сжатые варианты (br/gzip),
+поэтому горячие ответы сжимаются один раз, а не на каждый запрос.
+Записи привязаны к версиям таблиц из `data_versions` и к валидатору
+(ETag) из БД, поэтому не переживают изменений данных; TTL ограничивает
+размер кеша по времени.
+
+Валидаторы строятся из количества записей и максимальной `date_update`.
+Запросы с совпадающим If-None-Match / If-Modified-Since получают 304
+без загрузки и сериализации тела.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from . import data_versions
+from .compression import compress, negotiate_encoding
+from .config import settings
+from .responses import dumps, json_response
+
+
+@dataclass(frozen=True)
+class Validator:
+    """Валидатор представления ресурса: ETag и Last-Modified."""
+
+    etag: str
+    last_modified: Optional[datetime] = None
+
+    def headers(self) -> Dict[str, str]:
+        """Заголовки, которые нужно вернуть вместе с ответом."""
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+
+def make_validator(
+    resource: str,
+    count: int,
+    last_update: Optional[datetime],
+) -> Optional[Validator]:
+    """
+    Строит слабый ETag из количества записей и времени последнего изменения.
+    Возвращает None для пустого результата (например, несуществующей сущности).
+    """
+    if not count:
+        return None
+    stamp = last_update.isoformat() if last_update else ""
+    digest = hashlib.sha1(f"{resource}:{count}:{stamp}".encode("utf-8")).hexdigest()[:20]
+    last_modified = None
+    if last_update is not None:
+        # В БД хранится naive UTC (datetime.utcnow); HTTP-даты имеют секундную точность.
+        last_modified = last_update.replace(tzinfo=timezone.utc, microsecond=0)
+    return Validator(etag=f'W/"{digest}"', last_modified=last_modified)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение ETag из If-None-Match (RFC 7232)."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, validator: Optional[Validator]) -> bool:
+    """Проверяет условные заголовки запроса против валидатора."""
+    if validator is None:
+        return False
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match имеет приоритет над If-Modified-Since.
+        return _etag_matches(if_none_match, validator.etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validator.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return validator.last_modified <= since
+    return False
+
+
+def not_modified_response(validator: Validator) -> Response:
+    """Ответ 304 без тела."""
+    return Response(status_code=304, headers=validator.headers())
+
+
+def conditional_json_response(
+    request: Request,
+    validator: Optional[Validator],
+    build: Callable[[], Any],
+) -> Response:
+    """
+    Отдаёт 304, если клиент уже имеет актуальное представление,
+    иначе сериализует результат `build()` и проставляет валидатор.
+    """
+    if is_not_modified(request, validator):
+        return not_modified_response(validator)
+    response = json_response(build())
+    if validator is not None:
+        response.headers.update(validator.headers())
+    return response
+
+
+@dataclass
+class CachedResponse:
+    """Сериализованный ответ и его сжатые варианты."""
+
+    body: bytes
+    fingerprint: Tuple[Any, ...]
+    expires_at: float
+    validator: Optional[Validator] = None
+    media_type: str = "application/json"
+    variants: Dict[str, bytes] = field(default_factory=dict)
+
+    def encoded_body(self, encoding: str) -> bytes:
+        """Возвращает тело в нужной кодировке, сжимая его не более одного раза."""
+        compressed = self.variants.get(encoding)
+        if compressed is None:
+            compressed = compress(self.body, encoding)
+            self.variants[encoding] = compressed
+        return compressed
+
+    def to_response(self, accept_encoding: Optional[str]) -> Response:
+        """Формирует HTTP-ответ с учётом Accept-Encoding клиента."""
+        body = self.body
+        headers = self.validator.headers() if self.validator is not None else {}
+        if len(body) >= settings.COMPRESSION_MINIMUM_SIZE:
+            headers["Vary"] = "Accept-Encoding"
+            encoding = negotiate_encoding(accept_encoding)
+            if encoding is not None:
+                body = self.encoded_body(encoding)
+                headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=self.media_type, headers=headers)
+
+
+class ResponseCache:
+    """Потокобезопасный LRU-кеш ответов с TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, fingerprint: Tuple[Any, ...]) -> Optional[CachedResponse]:
+        """Возвращает актуальную запись или None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.fingerprint != fingerprint or entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        """Сохраняет запись, вытесняя самые старые при переполнении."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Очищает кеш."""
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
+
+
+def _cache_key(request: Request) -> str:
+    """Ключ кеша: путь и отсортированные query-параметры."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+def cached_json_response(
+    request: Request,
+    tables: Iterable[str],
+    build: Callable[[], Any],
+    validator: Optional[Validator] = None,
+) -> Response:
+    """
+    Отдаёт JSON-ответ из кеша или строит его через `build()`.
+
+    `tables` — таблицы, от которых зависит содержимое ответа; их изменение
+    делает запись неактуальной. Если передан `validator`, запрос с
+    совпадающим If-None-Match / If-Modified-Since получает 304.
+    """
+    if is_not_modified(request, validator):
+        return not_modified_response(validator)
+
+    key = _cache_key(request)
+    fingerprint = data_versions.get_versions(tables) + ((validator.etag,) if validator else ())
+    entry = response_cache.get(key, fingerprint)
+    if entry is None:
+        entry = CachedResponse(
+            body=dumps(build()),
+            fingerprint=fingerprint,
+            expires_at=time.monotonic() + response_cache.ttl_seconds,
+            validator=validator,
+        )
+        response_cache.set(key, entry)
+    return entry.to_response(request.headers.get("accept-encoding"))
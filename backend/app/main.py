@@ -7,8 +7,55 @@ from contextlib import asynccontextmanager
 
 from . import auth, users, nko, admin, admin_nko, public, admin_news, favorites, admin_event, admin_knowledge_base
 from .generation_logics import generation_router
+from .generation_logics.generation_router import close_openai_client
+from .generation_logics.knowledge_index import rebuild_knowledge_index
+from .generation_logics.dialogue_context import dialogue_summaries
 from .db_session import init_db, SessionLocal
-from .db_operations import init_default_roles, init_default_categories
+from .db_operations import (
+    init_default_roles,
+    init_default_categories,
+    delete_expired_generation_cache,
+    delete_expired_generation_sessions,
+)
+from .reference_data import registry as reference_registry
+from .statistics_rollup import ensure_backfilled as ensure_statistics_backfilled, flush_statistics_rollup
+from .counters import reconcile as reconcile_counters
+from .periodic import jobs as periodic_jobs
+from .view_counter import flush_knowledge_base_views
+from .popularity import refresh as refresh_popularity
+from .responses import FastJSONResponse
+from .compression import CompressionMiddleware
+from .config import settings
+
+
+# --- Фоновые задачи ---
+periodic_jobs.add("counters", settings.COUNTERS_RECONCILE_INTERVAL_SECONDS, reconcile_counters)
+# Просмотры базы знаний сбрасываются и при завершении, чтобы не потерять накопленное
+periodic_jobs.add(
+    "knowledge_base_views",
+    settings.KB_VIEWS_FLUSH_INTERVAL_SECONDS,
+    flush_knowledge_base_views,
+    run_on_shutdown=True,
+)
+periodic_jobs.add(
+    "statistics_rollup",
+    settings.STATISTICS_ROLLUP_FLUSH_INTERVAL_SECONDS,
+    flush_statistics_rollup,
+    run_on_shutdown=True,
+)
+periodic_jobs.add("popularity", settings.POPULARITY_REFRESH_INTERVAL_SECONDS, refresh_popularity)
+if settings.GENERATION_CACHE_PERSIST:
+    periodic_jobs.add(
+        "generation_cache_cleanup",
+        settings.GENERATION_CACHE_CLEANUP_INTERVAL_SECONDS,
+        delete_expired_generation_cache,
+    )
+if settings.GENERATION_SESSIONS_PERSIST:
+    periodic_jobs.add(
+        "generation_sessions_cleanup",
+        settings.GENERATION_CACHE_CLEANUP_INTERVAL_SECONDS,
+        delete_expired_generation_sessions,
+    )
 
 
 @asynccontextmanager
@@ -23,18 +70,39 @@ async def lifespan(app: FastAPI):
         try:
             init_default_roles(db)
             init_default_categories(db)
+            # Загружаем справочники в память
+            reference_registry.load_all(db)
+            # Заполняем агрегаты статистики по истории при первом запуске
+            ensure_statistics_backfilled(db)
+            # Сверяем счётчики (в том числе только что добавленные колонки)
+            reconcile_counters(db)
+            # Рейтинг популярности для sort=popular
+            refresh_popularity(db)
+            # Поисковый индекс справок для ИИ-помощника
+            rebuild_knowledge_index(db)
         finally:
             db.close()
         print("✓ Приложение готово к работе!")
     except Exception as e:
         print(f"⚠ Ошибка при инициализации БД: {e}")
+
+    # Фоновые задачи
+    periodic_jobs.start()
     
     yield
     
     print("👋 Завершение работы приложения...")
+    await periodic_jobs.stop()
+    # Фоновые суммаризации диалогов используют клиент LLM — дожидаемся их
+    await dialogue_summaries.drain()
+    await close_openai_client()
 
 
-app = FastAPI(title="Volunteer Service API", lifespan=lifespan)
+app = FastAPI(
+    title="Volunteer Service API",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 # --- CORS Middleware ---
 origins = [
@@ -49,6 +117,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Сжатие ответов (brotli/gzip) ---
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
 # --- Подключение роутеров ---
 # Авторизация и регистрация
 app.include_router(auth.router)
@@ -0,0 +1,80 @@
+"""
+Периодические фоновые задачи процесса.
+
+Задачи регистрируются при старте приложения и запускаются в lifespan:
+каждая выполняется в отдельном потоке (функции работы с БД синхронные)
+с собственной сессией. Ошибка задачи логируется и не останавливает
+расписание. Задачи с `run_on_shutdown=True` выполняются ещё раз при
+завершении приложения — например, чтобы сбросить накопленные данные.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Callable, List
+
+from sqlalchemy.orm import Session
+
+from .db_session import SessionLocal
+
+
+@dataclass
+class PeriodicJob:
+    """Описание периодической задачи."""
+
+    name: str
+    interval_seconds: float
+    func: Callable[[Session], None]
+    run_on_shutdown: bool = False
+
+
+def run_job(job: PeriodicJob) -> None:
+    """Выполняет задачу синхронно в новой сессии БД."""
+    db = SessionLocal()
+    try:
+        job.func(db)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠ Ошибка фоновой задачи {job.name}: {e}")
+    finally:
+        db.close()
+
+
+class PeriodicJobs:
+    """Реестр периодических задач и их asyncio-таски."""
+
+    def __init__(self) -> None:
+        self._jobs: List[PeriodicJob] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add(
+        self,
+        name: str,
+        interval_seconds: float,
+        func: Callable[[Session], None],
+        run_on_shutdown: bool = False,
+    ) -> None:
+        """Регистрирует задачу; интервал <= 0 отключает периодический запуск."""
+        self._jobs.append(PeriodicJob(name, interval_seconds, func, run_on_shutdown))
+
+    async def _loop(self, job: PeriodicJob) -> None:
+        while True:
+            await asyncio.sleep(job.interval_seconds)
+            await asyncio.to_thread(run_job, job)
+
+    def start(self) -> None:
+        """Запускает зарегистрированные задачи в текущем event loop."""
+        for job in self._jobs:
+            if job.interval_seconds > 0:
+                self._tasks.append(asyncio.create_task(self._loop(job), name=f"periodic:{job.name}"))
+
+    async def stop(self) -> None:
+        """Останавливает задачи и выполняет завершающие запуски."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        for job in self._jobs:
+            if job.run_on_shutdown:
+                await asyncio.to_thread(run_job, job)
+
+
+jobs = PeriodicJobs()
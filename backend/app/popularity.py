@@ -0,0 +1,134 @@
+"""
+Рейтинг популярности мероприятий, новостей, материалов базы знаний и НКО.
+
+Фоновая задача периодически оценивает сущности по активности
+пользователей и сохраняет оценки в `popularity_rank`; списки с
+`sort=popular` только сортируют по индексу (entity, score), ничего не
+вычисляя на запрос.
+
+Оценка — сумма взвешенных действий с экспоненциальным затуханием по
+возрасту (период полураспада `POPULARITY_HALF_LIFE_DAYS`):
+
+* записи на мероприятие — мероприятию и его организации;
+* добавления в избранное — самой сущности;
+* просмотры материалов базы знаний — материалу; у просмотров нет дат,
+  поэтому они затухают по возрасту самого материала.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+from . import data_versions, db_models
+from .config import settings
+from .dates import to_date
+
+ENTITY_EVENT = "event"
+ENTITY_NEWS = "news"
+ENTITY_KNOWLEDGE_BASE = "knowledge_base"
+ENTITY_ORGANIZATION = "organization"
+
+# Сущность рейтинга -> модель
+ENTITY_MODELS = {
+    ENTITY_EVENT: db_models.Event,
+    ENTITY_NEWS: db_models.News,
+    ENTITY_KNOWLEDGE_BASE: db_models.KnowledgeBaseData,
+    ENTITY_ORGANIZATION: db_models.Organization,
+}
+
+WEIGHT_REGISTRATION = 5.0
+WEIGHT_FAVORITE = 3.0
+WEIGHT_VIEW = 0.1
+
+Scores = Dict[int, float]
+
+# Ключ advisory-блокировки PostgreSQL на время пересчёта рейтинга
+_REFRESH_LOCK_KEY = 40_001
+
+
+def _decay(day, today: date) -> float:
+    """Множитель затухания для действия, совершённого в указанный день."""
+    if day is None:
+        return 0.0
+    age = max((today - to_date(day)).days, 0)
+    return 0.5 ** (age / settings.POPULARITY_HALF_LIFE_DAYS)
+
+
+def _activity_by_day(db: Session, model, entity_column, target, onclause, *criteria) -> Iterable[Tuple[int, object, int]]:
+    """Количество актуальных записей `model` по сущности и дню создания."""
+    day = func.date(model.date_create)
+    return db.execute(
+        select(entity_column, day, func.count(model.id))
+        .join(target, onclause)
+        .where(model.date_delete.is_(None), target.date_delete.is_(None), *criteria)
+        .group_by(entity_column, day)
+    )
+
+
+def _add_activity(scores: Scores, rows, weight: float, today: date) -> None:
+    for entity_id, day, count in rows:
+        scores[entity_id] += weight * count * _decay(day, today)
+
+
+def compute_scores(db: Session) -> Dict[str, Scores]:
+    """Вычисляет оценки всех сущностей по текущим данным."""
+    today = datetime.utcnow().date()
+    scores: Dict[str, Scores] = {entity: defaultdict(float) for entity in ENTITY_MODELS}
+    Participant = db_models.ParticipantEvent
+    Event = db_models.Event
+
+    _add_activity(scores[ENTITY_EVENT], _activity_by_day(
+        db, Participant, Participant.event_id, Event, Participant.event_id == Event.id,
+    ), WEIGHT_REGISTRATION, today)
+    _add_activity(scores[ENTITY_ORGANIZATION], _activity_by_day(
+        db, Participant, Event.organization_id, Event, Participant.event_id == Event.id,
+        Event.organization_id.is_not(None),
+    ), WEIGHT_REGISTRATION, today)
+
+    for entity, selected, fk_name in (
+        (ENTITY_EVENT, db_models.SelectedEvent, "event_id"),
+        (ENTITY_NEWS, db_models.SelectedNews, "news_id"),
+        (ENTITY_KNOWLEDGE_BASE, db_models.SelectedKnowledgeBaseData, "knowledge_base_data_id"),
+        (ENTITY_ORGANIZATION, db_models.SelectedOrganization, "organization_id"),
+    ):
+        target = ENTITY_MODELS[entity]
+        fk_column = getattr(selected, fk_name)
+        _add_activity(scores[entity], _activity_by_day(
+            db, selected, fk_column, target, fk_column == target.id,
+        ), WEIGHT_FAVORITE, today)
+
+    KnowledgeBase = db_models.KnowledgeBaseData
+    _add_activity(scores[ENTITY_KNOWLEDGE_BASE], db.execute(
+        select(KnowledgeBase.id, func.date(KnowledgeBase.date_create), KnowledgeBase.quantity_views)
+        .where(KnowledgeBase.date_delete.is_(None), KnowledgeBase.quantity_views > 0)
+    ), WEIGHT_VIEW, today)
+
+    return scores
+
+
+def refresh(db: Session) -> None:
+    """
+    Пересчитывает рейтинг и заменяет содержимое `popularity_rank` в одной
+    транзакции. Пересчёты из разных процессов (старт приложения, фоновая
+    задача, несколько воркеров) идут по очереди: иначе вставки параллельных
+    транзакций конфликтовали бы по уникальному индексу (entity, entity_id).
+    """
+    if db.bind.dialect.name == "postgresql":
+        # Снимается при commit/rollback; в SQLite запись и так сериализована
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _REFRESH_LOCK_KEY})
+    scores = compute_scores(db)
+    now = datetime.utcnow()
+    rows = [
+        {"entity": entity, "entity_id": entity_id, "score": score, "date_create": now, "date_update": now}
+        for entity, entity_scores in scores.items()
+        for entity_id, score in entity_scores.items()
+        if score > 0
+    ]
+
+    db.query(db_models.PopularityRank).delete()
+    if rows:
+        db.execute(insert(db_models.PopularityRank), rows)
+    data_versions.mark_changed(db, db_models.PopularityRank.__tablename__)
+    db.commit()
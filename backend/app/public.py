@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Query, HTTPException, Depends
+from fastapi import APIRouter, Query, HTTPException, Depends, Request
 from fastapi.responses import Response
 from typing import Optional, List
 from pydantic import BaseModel
@@ -7,9 +7,12 @@ from sqlalchemy.orm import Session
 import os
 from pathlib import Path
 
-from . import db_operations
+from . import db_models, db_operations, popularity
 from .db_session import get_db
 from .minio_client import get_minio_client
+from .responses import json_response
+from .http_cache import cached_json_response, conditional_json_response, make_validator
+from .view_counter import knowledge_base_views
 
 router = APIRouter(
     prefix="/public",
@@ -28,6 +31,7 @@ class NewsResponse(BaseModel):
     city: str
     category: str
     tags: List[str]
+    favoritesCount: int = 0
 
 class EventResponse(BaseModel):
     id: int
@@ -49,6 +53,8 @@ class EventResponse(BaseModel):
     phone: Optional[str] = ""
     email: Optional[str] = ""
     maxParticipants: Optional[int] = 0
+    participantsCount: int = 0
+    favoritesCount: int = 0
     registrationRequired: Optional[bool] = False
     isFree: bool
     images: Optional[List[str]] = []
@@ -70,6 +76,8 @@ class NkoResponse(BaseModel):
     social_links: Optional[List[str]] = []
     logo_url: Optional[str] = None
     rejection_reason: Optional[str] = None
+    members_count: int = 0
+    favorites_count: int = 0
 
 class MaterialResponse(BaseModel):
     id: int
@@ -84,6 +92,7 @@ class KnowledgeBaseResponse(BaseModel):
     category: str
     type: str
     views: int
+    favoritesCount: int = 0
     publishDate: str
     videoUrl: Optional[str] = None
     externalLink: Optional[str] = None
@@ -95,171 +104,348 @@ class CityResponse(BaseModel):
     lat: Optional[float] = None
     long: Optional[float] = None
 
+class HomeResponse(BaseModel):
+    news: List[NewsResponse]
+    events: List[EventResponse]
+    nkos: List[NkoResponse]
+    cities: List[CityResponse]
+
 class OrganizationMembersCountResponse(BaseModel):
     organization_id: int
     members_count: int
 
 
-# --- Эндпоинты для новостей ---
-@router.get("/news", response_model=List[NewsResponse])
-def get_all_news(
-    limit: Optional[int] = Query(None, description="Количество новостей"),
-    db: Session = Depends(get_db)
-):
-    """Получить список всех новостей, отсортированных по дате (новые первыми)."""
-    # Получаем новости из БД
-    news_list = db_operations.get_all_news(db)
+def nko_response_dict(org_dict: dict) -> dict:
+    """Приводит результат `organization_to_dict` к формату NkoResponse."""
+    return {
+        "id": org_dict.get("id"),
+        "email": org_dict.get("email", ""),
+        "organization_name": org_dict.get("organization_name", ""),
+        "city_name": org_dict.get("city_name", "Не указан"),
+        "city_lat": org_dict.get("city_lat"),
+        "city_long": org_dict.get("city_long"),
+        "moderation_status": org_dict.get("moderation_status", ""),
+        "category": org_dict.get("category"),
+        "description": org_dict.get("description", ""),
+        "address": org_dict.get("address", ""),
+        "website_url": org_dict.get("website_url", ""),
+        "phone": org_dict.get("phone", ""),
+        "founded_year": org_dict.get("founded_year"),
+        "social_links": org_dict.get("social_links", []),
+        "logo_url": org_dict.get("logo_url"),
+        "rejection_reason": org_dict.get("reason_rejection"),
+        "members_count": org_dict.get("members_count", 0),
+        "favorites_count": org_dict.get("favorites_count", 0),
+    }
+
+def found_or_404(entity, detail: str):
+    """
+    Возвращает объект или поднимает 404. Нужна при сборке ответа после
+    проверки валидатора: запись могли удалить между двумя запросами.
+    """
+    if entity is None:
+        raise HTTPException(status_code=404, detail=detail)
+    return entity
+
+
+# --- Таблицы, от которых зависят кешируемые списки ---
+NEWS_TABLES = ("news", "photo_news", "file_news", "hashtags_news", "city", "category_news")
+EVENT_TABLES = ("event", "photo_event", "organization", "city", "category_event", "status_event")
+NKO_TABLES = ("organization", "city", "category", "status_organization")
+KNOWLEDGE_BASE_TABLES = (
+    "knowledge_base_data",
+    "material_knowledge_base_data",
+    "category_knowledge_base_data",
+    "type_material_category_knowledge_base_data",
+)
+CITY_TABLES = ("city",)
+HOME_TABLES = tuple(dict.fromkeys(NEWS_TABLES + EVENT_TABLES + NKO_TABLES + CITY_TABLES))
+POPULARITY_TABLES = ("popularity_rank",)
+
+# Сортировка списков по рейтингу популярности (?sort=popular)
+SORT_POPULAR = "popular"
+
+
+def sort_query():
+    return Query(None, pattern=f"^{SORT_POPULAR}$", description="popular — по рейтингу популярности")
+
+
+def combined_validator(resource: str, parts):
+    """Общий валидатор для нескольких пар (количество, последнее изменение)."""
+    count = sum(part_count for part_count, _ in parts)
+    last_update = max((ts for _, ts in parts if ts is not None), default=None)
+    return make_validator(resource, count, last_update)
+
+
+def list_validator(db: Session, resource: str, part, sort: Optional[str], entity: str):
+    """Валидатор списка; для sort=popular учитывает и пересчёт рейтинга."""
+    if sort != SORT_POPULAR:
+        return make_validator(resource, *part)
+    if not part[0]:
+        return None
+    return combined_validator(
+        f"{resource}:{SORT_POPULAR}", [part, db_operations.get_popularity_validator(db, entity)]
+    )
+
+
+def list_tables(tables, sort: Optional[str]) -> tuple:
+    """Таблицы, от которых зависит список с учётом сортировки."""
+    return tuple(tables) + POPULARITY_TABLES if sort == SORT_POPULAR else tuple(tables)
+
+
+# --- Построение списков ---
+def build_news_list(db: Session, limit: Optional[int] = None, sort: Optional[str] = None) -> List[dict]:
+    """Список новостей в формате NewsResponse (новые первыми или по популярности)."""
+    # Ограниченная выборка сразу в нужном порядке
+    if sort == SORT_POPULAR:
+        news_list = db_operations.get_popular(
+            db, popularity.ENTITY_NEWS, options=db_operations.NEWS_LOAD_OPTIONS, limit=limit
+        )
+    else:
+        news_list = db_operations.get_latest_news(db, limit)
+    
+    # Преобразуем в словари
+    return [db_operations.news_to_dict(n) for n in news_list]
+
+
+def build_events_list(db: Session, limit: Optional[int] = None, sort: Optional[str] = None) -> List[dict]:
+    """Список событий в формате EventResponse (по дате проведения или по популярности)."""
+    # Ограниченная выборка сразу в нужном порядке
+    if sort == SORT_POPULAR:
+        events_list = db_operations.get_popular(
+            db, popularity.ENTITY_EVENT, options=db_operations.EVENT_LOAD_OPTIONS, limit=limit
+        )
+    else:
+        events_list = db_operations.get_events_by_date(db, limit)
+    
+    # Преобразуем в словари
+    return [db_operations.event_to_dict(e) for e in events_list]
+
+
+def build_nkos_list(db: Session, limit: Optional[int] = None, sort: Optional[str] = None) -> List[dict]:
+    """Список одобренных НКО в формате NkoResponse (по названию или по популярности)."""
+    # Получаем ID статуса "Одобрена"
+    status_approved = db_operations.get_status_organization_by_name(db, "Одобрена")
+    if not status_approved:
+        return []
+    
+    # Организации с этим статусом в нужном порядке
+    if sort == SORT_POPULAR:
+        organizations = db_operations.get_popular(
+            db,
+            popularity.ENTITY_ORGANIZATION,
+            db_models.Organization.status_organization_id == status_approved.id,
+            options=db_operations.ORGANIZATION_LOAD_OPTIONS,
+            limit=limit,
+        )
+    else:
+        organizations = db_operations.get_organizations_by_name(db, status_id=status_approved.id, limit=limit)
+
+    # Преобразуем в словари и адаптируем под модель NkoResponse
+    return [nko_response_dict(db_operations.organization_to_dict(org)) for org in organizations]
+
+
+def build_knowledge_base_list(db: Session, limit: Optional[int] = None, sort: Optional[str] = None) -> List[dict]:
+    """Список материалов базы знаний в формате KnowledgeBaseResponse (новые первыми или по популярности)."""
+    if sort == SORT_POPULAR:
+        kb_list = db_operations.get_popular(
+            db,
+            popularity.ENTITY_KNOWLEDGE_BASE,
+            options=db_operations.KNOWLEDGE_BASE_LOAD_OPTIONS,
+            limit=limit,
+        )
+        return [db_operations.knowledge_base_data_to_dict(kb) for kb in kb_list]
+
+    # Получаем записи базы знаний из БД
+    kb_list = db_operations.get_all_knowledge_base_data(db)
     
     # Преобразуем в словари
-    news = [db_operations.news_to_dict(n) for n in news_list]
+    knowledge_base = [db_operations.knowledge_base_data_to_dict(kb) for kb in kb_list]
     
-    # Сортировка по дате (новые первыми)
-    news = sorted(news, key=lambda x: x.get('publishDate', ''), reverse=True)
+    # Сортировка по дате создания (новые первыми)
+    knowledge_base = sorted(knowledge_base, key=lambda x: x.get('publishDate', ''), reverse=True)
     
     # Лимит
     if limit:
-        news = news[:limit]
-   
-    return news
+        knowledge_base = knowledge_base[:limit]
+    return knowledge_base
+
+
+def build_cities_list(db: Session) -> List[dict]:
+    """Список городов в формате CityResponse (по названию)."""
+    # Получаем города из БД
+    cities_list = db_operations.get_all_cities(db)
+    
+    # Преобразуем в словари
+    cities = [db_operations.city_to_dict(city) for city in cities_list]
+    
+    # Сортировка по названию
+    return sorted(cities, key=lambda x: x.get('name', ''))
+
+
+def build_home(db: Session, news_limit: int, events_limit: int, nkos_limit: int) -> dict:
+    """Данные главной страницы одним документом в формате HomeResponse."""
+    return {
+        "news": build_news_list(db, news_limit),
+        "events": build_events_list(db, events_limit),
+        "nkos": build_nkos_list(db, nkos_limit),
+        "cities": build_cities_list(db),
+    }
+
+
+# --- Главная страница ---
+@router.get("/home", response_model=HomeResponse)
+def get_home(
+    request: Request,
+    news_limit: int = Query(10, ge=1, le=100, description="Количество новостей"),
+    events_limit: int = Query(10, ge=1, le=100, description="Количество событий"),
+    nkos_limit: int = Query(100, ge=1, le=500, description="Количество НКО"),
+    db: Session = Depends(get_db)
+):
+    """
+    Получить данные главной страницы одним запросом: последние новости,
+    ближайшие события, одобренные НКО (для карты и счётчиков, по названию)
+    и города.
+    """
+    parts = [
+        db_operations.get_news_validator(db),
+        db_operations.get_event_validator(db),
+        db_operations.get_city_validator(db),
+    ]
+    status_approved = db_operations.get_status_organization_by_name(db, "Одобрена")
+    if status_approved:
+        parts.append(db_operations.get_organization_validator(db, status_id=status_approved.id))
+
+    # Общий валидатор: суммарное количество записей и самое позднее изменение
+    validator = combined_validator("home", parts)
+
+    return cached_json_response(
+        request,
+        HOME_TABLES,
+        lambda: build_home(db, news_limit, events_limit, nkos_limit),
+        validator=validator,
+    )
+
+
+# --- Эндпоинты для новостей ---
+@router.get("/news", response_model=List[NewsResponse])
+def get_all_news(
+    request: Request,
+    limit: Optional[int] = Query(None, description="Количество новостей"),
+    sort: Optional[str] = sort_query(),
+    db: Session = Depends(get_db)
+):
+    """Получить список всех новостей, отсортированных по дате (новые первыми) или по популярности."""
+    validator = list_validator(db, "news", db_operations.get_news_validator(db), sort, popularity.ENTITY_NEWS)
+    return cached_json_response(
+        request, list_tables(NEWS_TABLES, sort), lambda: build_news_list(db, limit, sort), validator=validator
+    )
 
 
 @router.get("/news/{news_id}", response_model=NewsResponse)
 def get_news_by_id(
     news_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Получить новость по ID."""
-    # Получаем новость из БД
-    news = db_operations.get_news_by_id(db, news_id)
-    
-    if not news:
+    # Дешёвая проверка актуальности до загрузки новости
+    validator = make_validator(f"news:{news_id}", *db_operations.get_news_validator(db, news_id))
+    if validator is None:
         raise HTTPException(status_code=404, detail="News not found")
-    
-    # Преобразуем в словарь
-    return db_operations.news_to_dict(news)
+
+    return conditional_json_response(
+        request,
+        validator,
+        lambda: db_operations.news_to_dict(
+            found_or_404(db_operations.get_news_by_id(db, news_id), "News not found")
+        ),
+    )
 
 
 # --- Эндпоинты для событий ---
 @router.get("/events", response_model=List[EventResponse])
 def get_all_events(
+    request: Request,
     limit: Optional[int] = Query(None, description="Количество событий"),
+    sort: Optional[str] = sort_query(),
     db: Session = Depends(get_db)
 ):
     """Получить список всех событий."""
-    # Получаем события из БД
-    events_list = db_operations.get_all_events(db)
-    
-    # Преобразуем в словари
-    events = [db_operations.event_to_dict(e) for e in events_list]
-    
-    # Сортировка по дате
-    events = sorted(events, key=lambda x: x.get('date', ''))
-    
-    # Лимит
-    if limit:
-        events = events[:limit]
-    
-    return events
+    validator = list_validator(db, "events", db_operations.get_event_validator(db), sort, popularity.ENTITY_EVENT)
+    return cached_json_response(
+        request, list_tables(EVENT_TABLES, sort), lambda: build_events_list(db, limit, sort), validator=validator
+    )
 
 
 @router.get("/events/{event_id}", response_model=EventResponse)
 def get_event_by_id(
     event_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Получить событие по ID."""
-    # Получаем событие из БД
-    event = db_operations.get_event_by_id(db, event_id)
-    
-    if not event:
+    # Дешёвая проверка актуальности до загрузки события
+    validator = make_validator(f"event:{event_id}", *db_operations.get_event_validator(db, event_id))
+    if validator is None:
         raise HTTPException(status_code=404, detail="Event not found")
-    
-    # Преобразуем в словарь
-    return db_operations.event_to_dict(event)
+
+    return conditional_json_response(
+        request,
+        validator,
+        lambda: db_operations.event_to_dict(
+            found_or_404(db_operations.get_event_by_id(db, event_id), "Event not found")
+        ),
+    )
 
 
 # --- Эндпоинты для НКО ---
 @router.get("/nkos", response_model=List[NkoResponse])
 def get_all_nkos(
+    request: Request,
     limit: Optional[int] = Query(None, description="Количество НКО"),
+    sort: Optional[str] = sort_query(),
     db: Session = Depends(get_db)
 ):
     """Получить список всех НКО со статусом 'Одобрена'."""
-    # Получаем ID статуса "Одобрена"
     status_approved = db_operations.get_status_organization_by_name(db, "Одобрена")
     if not status_approved:
-        return []
-    
-    # Получаем все организации с этим статусом
-    organizations = db_operations.get_all_organizations(db, status_id=status_approved.id)
-
-    # Преобразуем в словари и адаптируем под модель NkoResponse
-    nkos = []
-    for org in organizations:
-        org_dict = db_operations.organization_to_dict(org)
-        # Приводим к формату NkoResponse
-        nko_data = {
-            "id": org_dict.get("id"),
-            "email": org_dict.get("email", ""),
-            "organization_name": org_dict.get("organization_name", ""),
-            "city_name": org_dict.get("city_name", "Не указан"),
-            "city_lat": org_dict.get("city_lat"),
-            "city_long": org_dict.get("city_long"),
-            "moderation_status": org_dict.get("moderation_status", ""),
-            "category": org_dict.get("category"),
-            "description": org_dict.get("description", ""),
-            "address": org_dict.get("address", ""),
-            "website_url": org_dict.get("website_url", ""),
-            "phone": org_dict.get("phone", ""),
-            "founded_year": org_dict.get("founded_year"),
-            "social_links": org_dict.get("social_links", []),
-            "logo_url": org_dict.get("logo_url"),
-            "rejection_reason": org_dict.get("reason_rejection"),
-        }
-        nkos.append(nko_data)
-    
-    # Сортировка по названию организации
-    nkos = sorted(nkos, key=lambda x: x.get('organization_name', ''))
-    
-    # Лимит
-    if limit:
-        nkos = nkos[:limit]
-    
-    return nkos
+        return json_response([])
+
+    validator = list_validator(
+        db,
+        "nkos",
+        db_operations.get_organization_validator(db, status_id=status_approved.id),
+        sort,
+        popularity.ENTITY_ORGANIZATION,
+    )
+    return cached_json_response(
+        request, list_tables(NKO_TABLES, sort), lambda: build_nkos_list(db, limit, sort), validator=validator
+    )
 
 
 @router.get("/nkos/{nko_id}", response_model=NkoResponse)
 def get_nko_by_id(
     nko_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Получить организацию по ID (с любым статусом)."""
-    # Получаем организацию по ID
-    organization = db_operations.get_organization_by_id(db, nko_id)
-    
-    if not organization:
+    # Дешёвая проверка актуальности до загрузки организации
+    validator = make_validator(f"nko:{nko_id}", *db_operations.get_organization_validator(db, org_id=nko_id))
+    if validator is None:
         raise HTTPException(status_code=404, detail="Organization not found")
-    
+
     # Преобразуем в словарь и адаптируем под модель NkoResponse
-    org_dict = db_operations.organization_to_dict(organization)
-    nko_data = {
-        "id": org_dict.get("id"),
-        "email": org_dict.get("email", ""),
-        "organization_name": org_dict.get("organization_name", ""),
-        "city_name": org_dict.get("city_name", "Не указан"),
-        "moderation_status": org_dict.get("moderation_status", ""),
-        "category": org_dict.get("category"),
-        "description": org_dict.get("description", ""),
-        "address": org_dict.get("address", ""),
-        "website_url": org_dict.get("website_url", ""),
-        "phone": org_dict.get("phone", ""),
-        "founded_year": org_dict.get("founded_year"),
-        "social_links": org_dict.get("social_links", []),
-        "logo_url": org_dict.get("logo_url"),
-        "rejection_reason": org_dict.get("reason_rejection"),
-    }
-    
-    return nko_data
+    return conditional_json_response(
+        request,
+        validator,
+        lambda: nko_response_dict(
+            db_operations.organization_to_dict(
+                found_or_404(db_operations.get_organization_by_id(db, nko_id), "Organization not found")
+            )
+        ),
+    )
 
 
 @router.get("/nkos/{nko_id}/members-count", response_model=OrganizationMembersCountResponse)
@@ -273,120 +459,139 @@ def get_organization_members_count(
     if not organization:
         raise HTTPException(status_code=404, detail="Organization not found")
     
-    # Подсчитываем количество пользователей, привязанных к организации
-    members_count = db_operations.count_users_by_organization_id(db, nko_id)
-    
+    # Количество пользователей хранится в счётчике организации
     return OrganizationMembersCountResponse(
         organization_id=nko_id,
-        members_count=members_count
+        members_count=organization.members_count or 0
     )
 
 
 # --- Эндпоинты для базы знаний ---
 @router.get("/knowledge-base", response_model=List[KnowledgeBaseResponse])
 def get_all_knowledge_base(
+    request: Request,
     limit: Optional[int] = Query(None, description="Количество записей"),
+    sort: Optional[str] = sort_query(),
     db: Session = Depends(get_db)
 ):
     """Получить список всех записей базы знаний с материалами."""
-    # Получаем записи базы знаний из БД
-    kb_list = db_operations.get_all_knowledge_base_data(db)
-    
-    # Преобразуем в словари
-    knowledge_base = [db_operations.knowledge_base_data_to_dict(kb) for kb in kb_list]
-    
-    # Сортировка по дате создания (новые первыми)
-    knowledge_base = sorted(knowledge_base, key=lambda x: x.get('publishDate', ''), reverse=True)
-    
-    # Лимит
-    if limit:
-        knowledge_base = knowledge_base[:limit]
-    
-    return knowledge_base
+    validator = list_validator(
+        db,
+        "knowledge-base",
+        db_operations.get_knowledge_base_validator(db),
+        sort,
+        popularity.ENTITY_KNOWLEDGE_BASE,
+    )
+    return cached_json_response(
+        request,
+        list_tables(KNOWLEDGE_BASE_TABLES, sort),
+        lambda: build_knowledge_base_list(db, limit, sort),
+        validator=validator,
+    )
 
 
 @router.get("/knowledge-base/{kb_id}", response_model=KnowledgeBaseResponse)
 def get_knowledge_base_by_id(
     kb_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Получить запись базы знаний по ID с материалами."""
-    # Получаем запись из БД
-    kb = db_operations.get_knowledge_base_data_by_id(db, kb_id)
-    
-    if not kb:
+    # Дешёвая проверка актуальности до загрузки записи
+    validator = make_validator(
+        f"knowledge-base:{kb_id}", *db_operations.get_knowledge_base_validator(db, kb_id)
+    )
+    if validator is None:
         raise HTTPException(status_code=404, detail="Knowledge base entry not found")
-    
-    # Преобразуем в словарь
-    return db_operations.knowledge_base_data_to_dict(kb)
+
+    # Просмотр учитывается в памяти и попадёт в БД при следующем сбросе
+    knowledge_base_views.record(kb_id)
+    return conditional_json_response(
+        request,
+        validator,
+        lambda: db_operations.knowledge_base_data_to_dict(
+            found_or_404(db_operations.get_knowledge_base_data_by_id(db, kb_id), "Knowledge base entry not found")
+        ),
+    )
 
 
 # --- Эндпоинты для категорий ---
+def build_categories_list(rows, with_counts: bool) -> list:
+    """Список названий категорий или пар {name, count}, отсортированный по названию."""
+    if with_counts:
+        return [{"name": name, "count": count} for name, count in rows]
+    return [name for name, _ in rows]
+
+
 @router.get("/categories/news")
-def get_news_categories(db: Session = Depends(get_db)):
+def get_news_categories(
+    request: Request,
+    with_counts: bool = Query(False, description="Вернуть количество новостей в каждой категории"),
+    db: Session = Depends(get_db)
+):
     """Получить список всех категорий новостей."""
-    # Получаем новости из БД
-    news_list = db_operations.get_all_news(db)
-    
-    # Преобразуем в словари и извлекаем категории
-    news = [db_operations.news_to_dict(n) for n in news_list]
-    categories = list(set(n.get('category', '') for n in news if n.get('category')))
-    return sorted(categories)
+    return cached_json_response(
+        request,
+        ("category_news", "news"),
+        lambda: build_categories_list(db_operations.get_used_news_categories(db), with_counts),
+    )
 
 
 @router.get("/categories/events")
-def get_event_categories(db: Session = Depends(get_db)):
+def get_event_categories(
+    request: Request,
+    with_counts: bool = Query(False, description="Вернуть количество событий в каждой категории"),
+    db: Session = Depends(get_db)
+):
     """Получить список всех категорий событий."""
-    # Получаем события из БД
-    events_list = db_operations.get_all_events(db)
-    
-    # Преобразуем в словари и извлекаем категории
-    events = [db_operations.event_to_dict(e) for e in events_list]
-    categories = list(set(e.get('category', '') for e in events if e.get('category')))
-    return sorted(categories)
+    return cached_json_response(
+        request,
+        ("category_event", "event"),
+        lambda: build_categories_list(db_operations.get_used_event_categories(db), with_counts),
+    )
 
 
 @router.get("/categories/nkos")
-def get_nko_categories(db: Session = Depends(get_db)):
+def get_nko_categories(
+    request: Request,
+    with_counts: bool = Query(False, description="Вернуть количество НКО в каждой категории"),
+    db: Session = Depends(get_db)
+):
     """Получить список всех категорий НКО."""
-    nkos = db_operations.get_approved_nkos(db)
-    categories = list(set(n.get('category', '') for n in nkos if n.get('category')))
-    return sorted(categories)
+    return cached_json_response(
+        request,
+        ("category", "organization"),
+        lambda: build_categories_list(db_operations.get_used_organization_categories(db), with_counts),
+    )
 
 
 # --- Эндпоинты для городов ---
 @router.get("/cities", response_model=List[CityResponse])
 def get_all_cities(
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Получить список всех городов из базы данных."""
-    # Получаем города из БД
-    cities_list = db_operations.get_all_cities(db)
-    
-    # Преобразуем в словари
-    cities = [db_operations.city_to_dict(city) for city in cities_list]
-    
-    # Сортировка по названию
-    cities = sorted(cities, key=lambda x: x.get('name', ''))
-    
-    return cities
+    validator = make_validator("cities", *db_operations.get_city_validator(db))
+    return cached_json_response(
+        request, CITY_TABLES, lambda: build_cities_list(db), validator=validator
+    )
 
 
 @router.get("/cities/with-organizations", response_model=List[CityResponse])
 def get_cities_with_organizations(
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Получить список городов, в которых есть хотя бы одна организация."""
-    # Получаем города с организациями из БД
-    cities_list = db_operations.get_cities_with_organizations(db)
-    
-    # Преобразуем в словари
-    cities = [db_operations.city_to_dict(city) for city in cities_list]
-    
-    # Сортировка по названию
-    cities = sorted(cities, key=lambda x: x.get('name', ''))
-    
-    return cities
+    def build():
+        # Получаем города с организациями из БД
+        cities_list = db_operations.get_cities_with_organizations(db)
+        cities = [db_operations.city_to_dict(city) for city in cities_list]
+        # Сортировка по названию
+        return sorted(cities, key=lambda x: x.get('name', ''))
+
+    return cached_json_response(request, CITY_TABLES + ("organization",), build)
 
 
 # --- Эндпоинт для отдачи файлов ---
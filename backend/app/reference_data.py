@@ -0,0 +1,147 @@
+"""
+Справочники (роли, города, категории, статусы, типы) в памяти процесса.
+
+Справочные таблицы маленькие и почти не меняются, но на каждом запросе
+их записи ищутся по названию. Реестр загружает каждую таблицу целиком
+одним запросом и отдаёт записи из словарей по id и по названию.
+
+Записи реестра — неизменяемые namedtuple с полями `id`, `name` (и
+координатами для городов), а не ORM-объекты: они не привязаны к сессии
+и безопасно разделяются между потоками. Таблица перезагружается после
+commit, изменившего её (через `data_versions`), и по истечении TTL —
+на случай изменений из других процессов. Промах поиска перечитывает
+таблицу не чаще раза в `REFERENCE_DATA_MISS_RELOAD_SECONDS`: запросы с
+несуществующими id и названиями не превращаются в полную загрузку
+таблицы на каждый запрос.
+"""
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from . import data_versions, db_models
+from .config import settings
+
+
+class _ReferenceTable:
+    """Загруженное содержимое одной справочной таблицы."""
+
+    def __init__(self, model, fields: Iterable[str]) -> None:
+        self.model = model
+        self.record = namedtuple(f"{model.__name__}Ref", ("id", "name") + tuple(fields))
+        self.by_id: Dict[int, Any] = {}
+        self.by_name: Dict[str, Any] = {}
+        self.loaded_at: Optional[float] = None
+
+    def is_fresh(self) -> bool:
+        if self.loaded_at is None:
+            return False
+        return time.monotonic() - self.loaded_at < settings.REFERENCE_DATA_TTL_SECONDS
+
+    def can_reload_on_miss(self) -> bool:
+        if self.loaded_at is None:
+            return True
+        return time.monotonic() - self.loaded_at >= settings.REFERENCE_DATA_MISS_RELOAD_SECONDS
+
+    def load(self, db: Session) -> None:
+        rows = db.query(self.model).filter(
+            self.model.date_delete.is_(None)
+        ).order_by(self.model.id).all()
+
+        by_id, by_name = {}, {}
+        for row in rows:
+            item = self.record(*(getattr(row, name) for name in self.record._fields))
+            by_id[item.id] = item
+            # При дублях названия побеждает запись с меньшим id
+            by_name.setdefault(item.name, item)
+
+        self.by_id, self.by_name = by_id, by_name
+        self.loaded_at = time.monotonic()
+
+
+class ReferenceRegistry:
+    """Потокобезопасный реестр справочников с поиском по id и названию за O(1)."""
+
+    def __init__(self) -> None:
+        self._tables: Dict[str, _ReferenceTable] = {}
+        self._lock = threading.RLock()
+
+    def register(self, model, *fields: str) -> None:
+        """Регистрирует справочную модель; `fields` — дополнительные колонки записи."""
+        self._tables[model.__tablename__] = _ReferenceTable(model, fields)
+
+    def _table(self, db: Session, model) -> _ReferenceTable:
+        table = self._tables[model.__tablename__]
+        if not table.is_fresh():
+            with self._lock:
+                if not table.is_fresh():
+                    table.load(db)
+        return table
+
+    def get_by_id(self, db: Session, model, item_id: Optional[int]):
+        """Запись справочника по id или None."""
+        if item_id is None:
+            return None
+        table = self._table(db, model)
+        item = table.by_id.get(item_id)
+        if item is None and self._reload_on_miss(db, table):
+            # Запись могла появиться в другом процессе — перечитываем таблицу
+            item = table.by_id.get(item_id)
+        return item
+
+    def get_by_name(self, db: Session, model, name: Optional[str]):
+        """Запись справочника по названию или None."""
+        if name is None:
+            return None
+        table = self._table(db, model)
+        item = table.by_name.get(name)
+        if item is None and self._reload_on_miss(db, table):
+            item = table.by_name.get(name)
+        return item
+
+    def all(self, db: Session, model) -> List[Any]:
+        """Все записи справочника в порядке id."""
+        return list(self._table(db, model).by_id.values())
+
+    def _reload_on_miss(self, db: Session, table: _ReferenceTable) -> bool:
+        """Перечитывает таблицу после промаха, если она загружена не слишком недавно."""
+        if not table.can_reload_on_miss():
+            return False
+        with self._lock:
+            if not table.can_reload_on_miss():
+                # Таблицу уже перечитал другой поток, пока мы ждали блокировку
+                return True
+            table.load(db)
+        return True
+
+    def load_all(self, db: Session) -> None:
+        """Загружает все справочники (при старте приложения)."""
+        with self._lock:
+            for table in self._tables.values():
+                table.load(db)
+
+    def invalidate(self, tables: Optional[Set[str]] = None) -> None:
+        """Помечает справочники устаревшими; без аргумента — все."""
+        with self._lock:
+            for name, table in self._tables.items():
+                if tables is None or name in tables:
+                    table.loaded_at = None
+
+
+registry = ReferenceRegistry()
+registry.register(db_models.Role)
+registry.register(db_models.City, "lat", "long")
+registry.register(db_models.Category)
+registry.register(db_models.CategoryEvent)
+registry.register(db_models.CategoryNews)
+registry.register(db_models.CategoryKnowledgeBaseData)
+registry.register(db_models.StatusOrganization)
+registry.register(db_models.StatusEvent)
+registry.register(db_models.StatusParticipantEvent)
+registry.register(db_models.TypeEvent)
+registry.register(db_models.TypeMaterialCategoryKnowledgeBaseData)
+registry.register(db_models.TypeSocialMedia)
+
+data_versions.add_listener(registry.invalidate)
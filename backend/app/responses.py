@@ -0,0 +1,50 @@
+"""
+Быстрая сериализация JSON-ответов.
+
+Эндпоинты, которые уже формируют данные через `*_to_dict`, могут отдавать
+их напрямую через `json_response`, минуя повторную валидацию по
+`response_model` (модель при этом остаётся в декораторе для OpenAPI-схемы).
+"""
+import json
+from typing import Any, Optional, Mapping
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - защита от отсутствующей зависимости
+    orjson = None  # type: ignore
+
+
+def dumps(content: Any) -> bytes:
+    """Сериализует данные в JSON (UTF-8), используя orjson при наличии."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=str,
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ, сериализуемый через orjson (или stdlib json как запасной вариант)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(
+    content: Any,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> FastJSONResponse:
+    """
+    Возвращает готовый ответ для доверенных внутренних данных.
+
+    FastAPI не валидирует и не перекодирует объект Response, поэтому данные
+    должны уже соответствовать схеме `response_model` эндпоинта.
+    """
+    return FastJSONResponse(content=content, status_code=status_code, headers=headers)
@@ -0,0 +1,323 @@
+"""
+Ежедневные агрегаты статистики (таблица `statistics_daily`).
+
+Для графиков админки нужны количества регистраций, записей на мероприятия,
+добавлений в избранное и нового контента по дням. Вместо GROUP BY по
+`date_create` исходных таблиц счётчики поддерживаются инкрементально:
+после flush сессии новые (или восстановленные из мягкого удаления)
+записи запоминаются, после commit попадают в накопитель в памяти
+процесса, а периодическая задача записывает их пачкой — по одному
+upsert на строку (метрика, город, день).
+
+Строка дня в городе «горячая»: обновлять её в транзакции каждого
+избранного или записи на мероприятие значило бы выстраивать в очередь
+всех пишущих в этом городе до их commit. Графики отстают от данных не
+больше чем на `STATISTICS_ROLLUP_FLUSH_INTERVAL_SECONDS`.
+
+Город берётся у пользователя для пользовательских действий, у новости —
+её собственный, у мероприятия — город организации. Города пользователей
+и организаций определяются при сбросе, одним запросом на пачку.
+"""
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from . import data_versions, db_models
+from .dates import to_date
+
+METRIC_REGISTRATIONS = "registrations"
+METRIC_EVENT_REGISTRATIONS = "event_registrations"
+METRIC_FAVORITES = "favorites"
+METRIC_NEWS = "news"
+METRIC_EVENTS = "events"
+
+METRICS = (
+    METRIC_REGISTRATIONS,
+    METRIC_EVENT_REGISTRATIONS,
+    METRIC_FAVORITES,
+    METRIC_NEWS,
+    METRIC_EVENTS,
+)
+GRANULARITIES = ("day", "week", "month")
+
+# Модель -> метрика, которую увеличивает появление записи
+_METRIC_BY_MODEL = {
+    db_models.User: METRIC_REGISTRATIONS,
+    db_models.ParticipantEvent: METRIC_EVENT_REGISTRATIONS,
+    db_models.SelectedEvent: METRIC_FAVORITES,
+    db_models.SelectedNews: METRIC_FAVORITES,
+    db_models.SelectedKnowledgeBaseData: METRIC_FAVORITES,
+    db_models.SelectedOrganization: METRIC_FAVORITES,
+    db_models.News: METRIC_NEWS,
+    db_models.Event: METRIC_EVENTS,
+}
+
+RollupKey = Tuple[str, Optional[int], date]
+
+# Откуда берётся город события статистики: сам город, пользователь или организация
+_SOURCE_CITY = "city"
+_SOURCE_USER = "user"
+_SOURCE_ORGANIZATION = "organization"
+
+# (метрика, источник города, id источника, день)
+PendingKey = Tuple[str, str, Optional[int], date]
+
+_PENDING_KEY = "statistics_rollup_pending"
+
+
+def _is_restored(obj) -> bool:
+    """Запись восстановлена из мягкого удаления в текущем flush."""
+    history = inspect(obj).attrs.date_delete.history
+    return bool(history.deleted) and history.deleted[0] is not None and obj.date_delete is None
+
+
+def _city_source(obj) -> Tuple[str, Optional[int]]:
+    """Источник города события статистики (без обращения к БД)."""
+    if isinstance(obj, (db_models.User, db_models.News)):
+        return _SOURCE_CITY, obj.city_id
+    if isinstance(obj, db_models.Event):
+        return _SOURCE_ORGANIZATION, obj.organization_id
+    # Избранное и участие: город пользователя
+    return _SOURCE_USER, obj.user_id
+
+
+class RollupBuffer:
+    """Потокобезопасный накопитель закоммиченных приращений статистики."""
+
+    def __init__(self) -> None:
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, increments: Counter) -> None:
+        with self._lock:
+            self._pending.update(increments)
+
+    def pending(self) -> Dict[PendingKey, int]:
+        """Ещё не записанные в БД приращения."""
+        with self._lock:
+            return dict(self._pending)
+
+    def _take(self) -> Counter:
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        return pending
+
+    def _restore(self, pending: Counter) -> None:
+        with self._lock:
+            self._pending.update(pending)
+
+    def flush(self, db: Session) -> int:
+        """
+        Записывает накопленные приращения в `statistics_daily`. Возвращает
+        количество затронутых строк; при ошибке приращения возвращаются в
+        накопитель до следующего сброса.
+        """
+        pending = self._take()
+        if not pending:
+            return 0
+        try:
+            increments = _resolve_cities(db, pending)
+            apply_increments(db.connection(), increments)
+            data_versions.mark_changed(db, db_models.StatisticsDaily.__tablename__)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._restore(pending)
+            raise
+        return len(increments)
+
+
+rollup_buffer = RollupBuffer()
+
+
+def _resolve_cities(db: Session, pending: Counter) -> Counter:
+    """Переводит источники городов в id городов: по запросу на пользователей и организации."""
+    ids: Dict[str, set] = {_SOURCE_USER: set(), _SOURCE_ORGANIZATION: set()}
+    for _, source, source_id, _ in pending:
+        if source in ids and source_id is not None:
+            ids[source].add(source_id)
+
+    cities: Dict[str, Dict[int, Optional[int]]] = {_SOURCE_USER: {}, _SOURCE_ORGANIZATION: {}}
+    for source, model in ((_SOURCE_USER, db_models.User), (_SOURCE_ORGANIZATION, db_models.Organization)):
+        if ids[source]:
+            cities[source] = dict(
+                db.execute(select(model.id, model.city_id).where(model.id.in_(ids[source]))).all()
+            )
+
+    increments: Counter = Counter()
+    for (metric, source, source_id, day), delta in pending.items():
+        city_id = source_id if source == _SOURCE_CITY else cities[source].get(source_id)
+        increments[(metric, city_id, day)] += delta
+    return increments
+
+
+def apply_increments(connection, increments: Dict[RollupKey, int]) -> None:
+    """Добавляет приращения к строкам `statistics_daily`, создавая недостающие."""
+    table = db_models.StatisticsDaily.__table__
+    now = datetime.utcnow()
+    if connection.dialect.name == "postgresql":
+        # Уникальный индекс (metric, city_id, day) с NULLS NOT DISTINCT — одна строка на ключ
+        for (metric, city_id, day), delta in sorted(increments.items(), key=_sort_key):
+            statement = pg_insert(table).values(
+                metric=metric, city_id=city_id, day=day, count=delta,
+                date_create=now, date_update=now,
+            )
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.metric, table.c.city_id, table.c.day],
+                set_={"count": table.c.count + statement.excluded.count, "date_update": now},
+            ))
+        return
+
+    # SQLite и др.: NULL в уникальном индексе не совпадают — UPDATE, затем INSERT
+    for (metric, city_id, day), delta in increments.items():
+        city_clause = table.c.city_id.is_(None) if city_id is None else table.c.city_id == city_id
+        result = connection.execute(
+            update(table)
+            .where(table.c.metric == metric, city_clause, table.c.day == day)
+            .values(count=table.c.count + delta, date_update=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(
+                insert(table).values(
+                    metric=metric, city_id=city_id, day=day, count=delta,
+                    date_create=now, date_update=now,
+                )
+            )
+
+
+def _sort_key(item) -> tuple:
+    # Одинаковый порядок строк у всех процессов — без взаимных блокировок
+    (metric, city_id, day), _ = item
+    return metric, city_id is not None, city_id or 0, day
+
+
+def flush_statistics_rollup(db: Session) -> None:
+    """Периодическая задача: запись накопленных приращений статистики."""
+    rollup_buffer.flush(db)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_rollup_increments(session: Session, flush_context) -> None:
+    """Запоминает приращения дневных счётчиков для записей, появившихся в этом flush."""
+    candidates = [
+        obj for obj in session.new
+        if type(obj) in _METRIC_BY_MODEL and obj.date_delete is None
+    ]
+    candidates += [
+        obj for obj in session.dirty
+        if type(obj) in _METRIC_BY_MODEL and _is_restored(obj)
+    ]
+    if not candidates:
+        return
+
+    pending = session.info.setdefault(_PENDING_KEY, Counter())
+    today = datetime.utcnow().date()
+    for obj in candidates:
+        pending[(_METRIC_BY_MODEL[type(obj)], *_city_source(obj), today)] += 1
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_rollup_increments(session: Session) -> None:
+    """Передаёт приращения закоммиченной транзакции в накопитель."""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        rollup_buffer.add(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rollup_increments(session: Session) -> None:
+    """Отбрасывает приращения откатанной транзакции."""
+    session.info.pop(_PENDING_KEY, None)
+
+
+# ==================== ПЕРЕСЧЁТ И ЧТЕНИЕ ====================
+
+def rebuild(db: Session) -> None:
+    """Полностью пересчитывает `statistics_daily` по исходным таблицам."""
+    User = db_models.User
+    day_expr = lambda model: func.date(model.date_create)  # noqa: E731
+
+    queries = [
+        (METRIC_REGISTRATIONS, select(User.city_id, day_expr(User), func.count(User.id))
+            .group_by(User.city_id, day_expr(User))),
+        (METRIC_NEWS, select(db_models.News.city_id, day_expr(db_models.News), func.count(db_models.News.id))
+            .group_by(db_models.News.city_id, day_expr(db_models.News))),
+        (METRIC_EVENTS, select(db_models.Organization.city_id, day_expr(db_models.Event), func.count(db_models.Event.id))
+            .select_from(db_models.Event)
+            .outerjoin(db_models.Organization, db_models.Event.organization_id == db_models.Organization.id)
+            .group_by(db_models.Organization.city_id, day_expr(db_models.Event))),
+    ]
+    for model in (
+        db_models.ParticipantEvent,
+        db_models.SelectedEvent,
+        db_models.SelectedNews,
+        db_models.SelectedKnowledgeBaseData,
+        db_models.SelectedOrganization,
+    ):
+        queries.append((
+            _METRIC_BY_MODEL[model],
+            select(User.city_id, day_expr(model), func.count(model.id))
+            .select_from(model)
+            .outerjoin(User, model.user_id == User.id)
+            .group_by(User.city_id, day_expr(model)),
+        ))
+
+    # Ещё не записанные приращения относятся к уже закоммиченным записям,
+    # которые пересчёт учтёт сам
+    rollup_buffer._take()
+    increments: Counter = Counter()
+    for metric, query in queries:
+        for city_id, day, count in db.execute(query):
+            if day is not None:
+                increments[(metric, city_id, to_date(day))] += count
+
+    db.query(db_models.StatisticsDaily).delete()
+    apply_increments(db.connection(), increments)
+    db.commit()
+    data_versions.bump(db_models.StatisticsDaily.__tablename__)
+
+
+def ensure_backfilled(db: Session) -> None:
+    """Заполняет агрегаты по истории, если таблица ещё пуста."""
+    if db.query(db_models.StatisticsDaily.id).first() is None:
+        rebuild(db)
+
+
+def _bucket_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def build_timeseries(
+    daily: List[Tuple[date, int]],
+    date_from: date,
+    date_to: date,
+    granularity: str,
+) -> List[Dict[str, object]]:
+    """Группирует дневные значения по периодам, заполняя пропуски нулями."""
+    totals: Counter = Counter()
+    for day, count in daily:
+        totals[_bucket_start(to_date(day), granularity)] += int(count or 0)
+
+    points = []
+    bucket = _bucket_start(date_from, granularity)
+    while bucket <= date_to:
+        points.append({"date": bucket.isoformat(), "count": totals.get(bucket, 0)})
+        bucket = _next_bucket(bucket, granularity)
+    return points
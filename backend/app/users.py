@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from . import models, dependencies, db_operations
 from .db_session import get_db
+from .favorites import parse_id_list
 
 
 router = APIRouter(
@@ -85,28 +88,31 @@ def register_for_event(
             detail="Event not found"
         )
     
-    # Проверяем, не записан ли уже пользователь на это событие
-    existing_participation = db_operations.get_participant_event_by_user_and_event(
-        db, current_user["id"], registration.event_id
+    # Место занимается атомарно; повторную запись отсекает уникальный индекс
+    participant = db_operations.register_participant_event(
+        db,
+        event_id=registration.event_id,
+        user_id=current_user["id"]
     )
-    if existing_participation:
+    if participant is None:
+        # Мероприятие могло быть удалено, пока шла запись
+        if db_operations.get_event_by_id(db, registration.event_id) is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Event not found"
+            )
         raise HTTPException(
             status_code=400,
             detail="User is already registered for this event"
         )
-    
-    # Создаем запись об участии
-    participant = db_operations.create_participant_event(
-        db,
-        event_id=registration.event_id,
-        user_id=current_user["id"]
-    )
-    
+
+    waitlisted = db_operations.is_waitlisted(db, participant)
     return {
         "success": True,
-        "message": "Successfully registered for event",
+        "message": "Added to the waitlist" if waitlisted else "Successfully registered for event",
         "participant_id": participant.id,
-        "event_id": registration.event_id
+        "event_id": registration.event_id,
+        "waitlisted": waitlisted
     }
 
 
@@ -115,11 +121,18 @@ def get_user_registered_events(
     current_user: dict = Depends(dependencies.get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Получить все мероприятия, на которые зарегистрирован пользователь."""
+    """
+    Получить все мероприятия, на которые записан пользователь.
+    Записи из листа ожидания отмечены полем `waitlisted: true`.
+    """
     events_list = db_operations.get_user_registered_events(db, current_user["id"])
+    waitlisted = set(db_operations.get_waitlisted_event_ids(db, current_user["id"], [e.id for e in events_list]))
     
     # Преобразуем в словари
-    events = [db_operations.event_to_dict(e) for e in events_list]
+    events = [
+        {**db_operations.event_to_dict(e), "waitlisted": e.id in waitlisted}
+        for e in events_list
+    ]
     
     # Сортировка по дате
     events = sorted(events, key=lambda x: x.get('date', ''))
@@ -127,6 +140,23 @@ def get_user_registered_events(
     return events
 
 
+@router.get("/me/events/flags")
+def get_user_registered_event_flags(
+    events: Optional[str] = Query(None, description="ID мероприятий через запятую"),
+    current_user: dict = Depends(dependencies.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Получить ID мероприятий из запроса, на которые зарегистрирован пользователь
+    (`events`) и в листе ожидания которых он находится (`waitlisted`).
+    """
+    event_ids = parse_id_list(events, "events")
+    return {
+        "events": db_operations.get_registered_event_ids(db, current_user["id"], event_ids),
+        "waitlisted": db_operations.get_waitlisted_event_ids(db, current_user["id"], event_ids),
+    }
+
+
 @router.delete("/me/events/{event_id}", status_code=status.HTTP_200_OK)
 def unregister_from_event(
     event_id: int,
@@ -0,0 +1,103 @@
+"""
+Счётчик просмотров материалов базы знаний с отложенной записью.
+
+UPDATE на каждый просмотр блокировал бы строку популярного материала на
+каждом запросе. Вместо этого просмотры копятся в памяти процесса и
+сбрасываются в `knowledge_base_data.quantity_views` пачкой — одним
+`UPDATE ... FROM (VALUES ...)` — периодической задачей и при завершении
+приложения. Значение `views` в ответах становится согласованным с
+задержкой не больше интервала сброса.
+
+Сброс обновляет и `date_update` записей: по ней считаются ETag и
+Last-Modified материалов, списка базы знаний и избранного, и без этого
+клиенты с условными запросами получали бы 304 с устаревшим `views`.
+"""
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import Integer, bindparam, column, func, update, values
+from sqlalchemy.orm import Session
+
+from . import data_versions, db_models
+
+
+class ViewCounter:
+    """Потокобезопасный накопитель просмотров по id записи."""
+
+    def __init__(self, model) -> None:
+        self.model = model
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, item_id: int, count: int = 1) -> None:
+        """Учитывает просмотр; запись в БД произойдёт при следующем сбросе."""
+        with self._lock:
+            self._pending[item_id] += count
+
+    def pending(self) -> Dict[int, int]:
+        """Ещё не записанные в БД просмотры."""
+        with self._lock:
+            return dict(self._pending)
+
+    def _take(self) -> Counter:
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        return pending
+
+    def _restore(self, pending: Counter) -> None:
+        with self._lock:
+            self._pending.update(pending)
+
+    def flush(self, db: Session) -> int:
+        """
+        Записывает накопленные просмотры в БД одним запросом.
+        Возвращает количество обновлённых записей; при ошибке просмотры
+        возвращаются в накопитель до следующего сброса.
+        """
+        pending = self._take()
+        if not pending:
+            return 0
+
+        table = self.model.__table__
+        now = datetime.utcnow()
+        try:
+            if db.bind.dialect.name == "postgresql":
+                deltas = values(
+                    column("id", Integer), column("delta", Integer), name="view_deltas"
+                ).data(sorted(pending.items()))
+                db.execute(
+                    update(table)
+                    .where(table.c.id == deltas.c.id)
+                    .values(
+                        quantity_views=func.coalesce(table.c.quantity_views, 0) + deltas.c.delta,
+                        date_update=now,
+                    )
+                )
+            else:
+                # SQLite и др.: без UPDATE ... FROM (VALUES ...) — executemany одним вызовом
+                db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("item_id"))
+                    .values(
+                        quantity_views=func.coalesce(table.c.quantity_views, 0) + bindparam("delta"),
+                        date_update=now,
+                    ),
+                    [{"item_id": item_id, "delta": delta} for item_id, delta in sorted(pending.items())],
+                )
+            data_versions.mark_changed(db, table.name)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._restore(pending)
+            raise
+        return len(pending)
+
+
+knowledge_base_views = ViewCounter(db_models.KnowledgeBaseData)
+
+
+def flush_knowledge_base_views(db: Session) -> None:
+    """Периодическая задача: сброс просмотров базы знаний."""
+    knowledge_base_views.flush(db)
@@ -0,0 +1,138 @@
+"""
+Бенчмарк процессорного времени на запрос к /public/events и /public/news.
+
+Скрипт заполняет SQLite в памяти одинаковыми тестовыми данными и выполняет
+запросы к приложению через TestClient, замеряя `time.process_time()` на
+каждый запрос (сборка ответа, сериализация, middleware). Кеш готовых
+ответов отключается, сжатие не запрашивается: измеряется построение ответа.
+
+Сравнение «до» и «после» — запуск того же скрипта на двух версиях кода:
+
+    git worktree add /tmp/gooddeeds-before <commit>
+    python benchmarks/public_lists_cpu.py --app-dir /tmp/gooddeeds-before/backend
+    python benchmarks/public_lists_cpu.py
+
+Версия кода выбирается через `--app-dir` (по умолчанию — текущая).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ENDPOINTS = ("/public/events", "/public/news")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--app-dir",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+        help="каталог backend проверяемой версии (с пакетом app)",
+    )
+    parser.add_argument("--items", type=int, default=500, help="мероприятий и новостей в базе")
+    parser.add_argument("--requests", type=int, default=50, help="замеряемых запросов на эндпоинт")
+    parser.add_argument("--warmup", type=int, default=5, help="прогревочных запросов на эндпоинт")
+    return parser.parse_args()
+
+
+def setup_app(app_dir: str):
+    """Импортирует приложение из `app_dir` и переключает его на SQLite в памяти."""
+    # Кеш готовых ответов спрятал бы стоимость построения ответа
+    os.environ["RESPONSE_CACHE_TTL_SECONDS"] = "0"
+    sys.path.insert(0, os.path.abspath(app_dir))
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+
+    from app import db_session
+    from app.db_models import Base
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    db_session.engine = engine
+    db_session.SessionLocal.configure(bind=engine)
+    Base.metadata.create_all(engine)
+
+    from app.main import app
+    return app, db_session.SessionLocal
+
+
+def seed(session_factory, items: int) -> None:
+    """Мероприятия и новости с фото, хештегами, городом и категориями."""
+    from app import db_operations
+
+    db = session_factory()
+    try:
+        db_operations.init_default_roles(db)
+        db_operations.init_default_categories(db)
+        db_operations.init_default_statuses(db)
+        city = db_operations.create_city(db, "Москва", 55.75, 37.62)
+        approved = db_operations.get_status_organization_by_name(db, "Одобрена")
+        category = db_operations.get_category_by_name(db, "Экология")
+        organizations = [
+            db_operations.create_organization(
+                db, f"НКО {i}", email=f"nko{i}@example.com", city_id=city.id,
+                status_organization_id=approved.id, id_category=category.id, description="Описание " * 10,
+            )
+            for i in range(10)
+        ]
+        news_category = db_operations.get_category_news_by_name(db, "Важное")
+        event_category = db_operations.get_category_event_by_name(db, "Экология")
+        start = datetime(2025, 1, 1)
+        for i in range(items):
+            news = db_operations.create_news(
+                db, f"Новость {i}", category_news_id=news_category.id, city_id=city.id,
+                description="Короткое описание", full_description="Волонтёры " * 50,
+                date_event=start + timedelta(days=i),
+            )
+            db_operations.create_photo_news(db, news.id, f"news/{i}.jpg")
+            db_operations.create_hashtag_news(db, news.id, "добро")
+            event = db_operations.create_event(
+                db, f"Мероприятие {i}", organization_id=organizations[i % len(organizations)].id,
+                category_event_id=event_category.id, date_time_event=start + timedelta(days=i),
+                quantity_participant=20, description="Описание мероприятия " * 5,
+            )
+            db_operations.create_photo_event(db, event.id, f"events/{i}.jpg")
+    finally:
+        db.close()
+
+
+def measure(client, path: str, requests: int, warmup: int):
+    """CPU-время на запрос (мс) и число элементов в ответе."""
+    headers = {"Accept-Encoding": "identity"}
+    for _ in range(warmup):
+        client.get(path, headers=headers)
+    samples = []
+    items = 0
+    for _ in range(requests):
+        started = time.process_time()
+        response = client.get(path, headers=headers)
+        samples.append((time.process_time() - started) * 1000)
+        response.raise_for_status()
+        items = len(response.json())
+    return samples, items
+
+
+def main() -> None:
+    args = parse_args()
+    app, session_factory = setup_app(args.app_dir)
+    seed(session_factory, args.items)
+
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    print(f"app: {os.path.abspath(args.app_dir)}")
+    for path in ENDPOINTS:
+        samples, items = measure(client, path, args.requests, args.warmup)
+        samples.sort()
+        print(
+            f"{path}: {items} элементов, CPU на запрос: "
+            f"медиана {statistics.median(samples):.1f} мс, "
+            f"p90 {samples[int(len(samples) * 0.9) - 1]:.1f} мс, "
+            f"мин {samples[0]:.1f} мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Общие фикстуры тестов: приложение работает на SQLite в памяти вместо PostgreSQL.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import db_session  # noqa: E402
+from app.db_models import Base  # noqa: E402
+from app.reference_data import registry as reference_registry  # noqa: E402
+
+# Одно соединение на все сессии: иначе каждая получит свою пустую базу
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+db_session.engine = engine
+db_session.SessionLocal.configure(bind=engine)
+
+
+@pytest.fixture
+def db():
+    """Сессия чистой базы; таблицы пересоздаются для каждого теста."""
+    Base.metadata.create_all(engine)
+    reference_registry.invalidate()
+    session = db_session.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
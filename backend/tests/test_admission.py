@@ -0,0 +1,101 @@
+"""
+Допуск к генерации: лимит клиента, очередь и определение IP клиента за прокси.
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app import dependencies
+from app.generation_logics.admission import AdmissionController
+
+
+def _controller(**overrides) -> AdmissionController:
+    options = dict(max_concurrency=1, max_queue=0, queue_timeout_seconds=0.05, rate_per_minute=60, burst=2)
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_check_rate_rejects_after_burst():
+    admission = _controller()
+    admission.check_rate("ip:1.1.1.1")
+    admission.check_rate("ip:1.1.1.1")
+
+    with pytest.raises(HTTPException) as exc_info:
+        admission.check_rate("ip:1.1.1.1")
+    assert exc_info.value.status_code == 429
+    assert int(exc_info.value.headers["Retry-After"]) >= 1
+    # Лимит считается отдельно для каждого клиента
+    admission.check_rate("ip:2.2.2.2")
+    assert admission.rejected_rate_limited == 1
+
+
+def test_acquire_slot_rejects_when_queue_full():
+    admission = _controller()
+
+    async def scenario():
+        await admission.acquire_slot()
+        with pytest.raises(HTTPException) as exc_info:
+            await admission.acquire_slot()
+        assert exc_info.value.status_code == 503
+        admission.release()
+        await admission.acquire_slot()
+        admission.release()
+
+    asyncio.run(scenario())
+    assert admission.rejected_queue_full == 1
+    assert admission.active == 0
+
+
+def test_acquire_slot_times_out_in_queue():
+    admission = _controller(max_queue=1)
+
+    async def scenario():
+        await admission.acquire_slot()
+        with pytest.raises(HTTPException) as exc_info:
+            await admission.acquire_slot()
+        assert exc_info.value.status_code == 503
+        admission.release()
+
+    asyncio.run(scenario())
+    assert admission.rejected_timeout == 1
+    assert admission.waiting == 0
+
+
+def _request(peer: str, forwarded: str = "") -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 50000)})
+
+
+@pytest.mark.parametrize(
+    ("trusted", "peer", "forwarded", "expected"),
+    [
+        # Без доверенных прокси заголовок игнорируется
+        ("", "10.0.0.5", "203.0.113.7", "10.0.0.5"),
+        # От доверенного прокси берётся самый правый недоверенный адрес
+        ("10.0.0.0/8", "10.0.0.5", "1.2.3.4, 203.0.113.7", "203.0.113.7"),
+        ("10.0.0.0/8", "10.0.0.5", "203.0.113.7, 10.0.0.9", "203.0.113.7"),
+        # Запрос не от прокси: подставленный клиентом заголовок не учитывается
+        ("10.0.0.0/8", "198.51.100.1", "203.0.113.7", "198.51.100.1"),
+        ("10.0.0.0/8", "10.0.0.5", "", "10.0.0.5"),
+    ],
+)
+def test_get_client_ip_respects_trusted_proxies(monkeypatch, trusted, peer, forwarded, expected):
+    monkeypatch.setattr(dependencies.settings, "TRUSTED_PROXIES", trusted)
+    assert dependencies.get_client_ip(_request(peer, forwarded)) == expected
+
+
+def test_try_acquire_slot_does_not_queue():
+    admission = _controller(max_queue=5)
+
+    async def scenario():
+        assert await admission.try_acquire_slot()
+        assert not await admission.try_acquire_slot()
+        admission.release()
+        assert await admission.try_acquire_slot()
+        admission.release()
+
+    asyncio.run(scenario())
+    assert admission.active == 0
+    assert admission.waiting == 0
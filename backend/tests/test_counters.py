@@ -0,0 +1,30 @@
+"""
+Сверка денормализованных счётчиков.
+"""
+from datetime import datetime
+
+from app import counters, db_models, db_operations
+
+
+def test_reconcile_counts_legacy_registrations_without_status(db):
+    db_operations.init_default_roles(db)
+    role = db_operations.get_role_by_name(db, "user")
+    event = db_operations.create_event(db, "Субботник", quantity_participant=2)
+    legacy, waiting = (
+        db_operations.create_user(db, f"u{i}@example.com", "hash", f"User {i}", role.id).id
+        for i in range(2)
+    )
+    waitlist = db_operations.get_or_create_status_participant_event(db, db_operations.PARTICIPANT_STATUS_WAITLIST)
+    now = datetime.utcnow()
+    # Запись, сделанная до появления статусов участия: статус NULL
+    db.add(db_models.ParticipantEvent(event_id=event.id, user_id=legacy, date_create=now, date_update=now))
+    db.add(db_models.ParticipantEvent(
+        event_id=event.id, user_id=waiting, status_participant_event_id=waitlist.id,
+        date_create=now, date_update=now,
+    ))
+    db.commit()
+
+    counters.reconcile(db)
+
+    db.expire_all()
+    assert db_operations.get_event_by_id(db, event.id).quantity_registered == 1
@@ -0,0 +1,58 @@
+"""
+Фоновые сводки диалога учитываются в бюджете клиента и очереди генерации.
+"""
+import asyncio
+
+from app.generation_logics import generation_router
+from app.generation_logics.admission import AdmissionController
+from app.generation_logics.llm_metrics import DailyBudgets
+
+
+def _patch(monkeypatch, *, budget: int, concurrency: int = 1):
+    calls = []
+
+    async def fake_completion(messages, empty_detail, endpoint, client_key=None):
+        calls.append((endpoint, client_key))
+        return "Сводка"
+
+    admission = AdmissionController(
+        max_concurrency=concurrency, max_queue=10, queue_timeout_seconds=1, rate_per_minute=0, burst=1,
+    )
+    monkeypatch.setattr(generation_router, "_chat_completion", fake_completion)
+    monkeypatch.setattr(generation_router, "admission", admission)
+    monkeypatch.setattr(generation_router.llm_metrics, "budgets", DailyBudgets(budget))
+    return calls, admission
+
+
+def test_summary_is_billed_to_requesting_client(monkeypatch):
+    calls, admission = _patch(monkeypatch, budget=0)
+
+    result = asyncio.run(generation_router._summarize_dialogue("", "Пользователь: вопрос", "ip:1.1.1.1"))
+
+    assert result == "Сводка"
+    assert calls == [("dialogue_summary", "ip:1.1.1.1")]
+    assert admission.active == 0
+
+
+def test_summary_skipped_when_budget_exhausted(monkeypatch):
+    calls, _ = _patch(monkeypatch, budget=10)
+    generation_router.llm_metrics.budgets.add("ip:1.1.1.1", 10)
+
+    result = asyncio.run(generation_router._summarize_dialogue("", "Пользователь: вопрос", "ip:1.1.1.1"))
+
+    assert result is None
+    assert calls == []
+
+
+def test_summary_skipped_when_no_free_slot(monkeypatch):
+    calls, admission = _patch(monkeypatch, budget=0)
+
+    async def scenario():
+        await admission.acquire_slot()
+        try:
+            return await generation_router._summarize_dialogue("", "Пользователь: вопрос", "ip:1.1.1.1")
+        finally:
+            admission.release()
+
+    assert asyncio.run(scenario()) is None
+    assert calls == []
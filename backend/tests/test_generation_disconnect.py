@@ -0,0 +1,152 @@
+"""
+Потоковая генерация: отключение клиента закрывает поток от LLM и освобождает
+место в очереди генерации. LLM подменяется локальным OpenAI-совместимым сервером.
+"""
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from app.main import app
+from app.generation_logics import generation_router
+from app.generation_logics.admission import admission
+from app.generation_logics.llm_metrics import llm_metrics
+
+CHUNKS = 200
+CHUNK_DELAY_SECONDS = 0.02
+# Сколько chunk'ов LLM может успеть отдать сверх полученных клиентом:
+# один уже в пути и один, отправленный до того, как сервер заметил закрытие
+CHUNK_MARGIN = 2
+
+
+class FakeLlm:
+    """Состояние фейкового LLM: сколько chunk'ов отдано и закрыт ли поток."""
+
+    def __init__(self) -> None:
+        self.chunks_sent = 0
+        self.closed = threading.Event()
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        assert body["stream"] is True
+
+        async def chunks():
+            try:
+                for i in range(CHUNKS):
+                    chunk = {
+                        "id": "chatcmpl-test",
+                        "object": "chat.completion.chunk",
+                        "created": 0,
+                        "model": body["model"],
+                        "choices": [{"index": 0, "delta": {"content": f"t{i} "}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    self.chunks_sent += 1
+                    await asyncio.sleep(CHUNK_DELAY_SECONDS)
+                yield "data: [DONE]\n\n"
+            finally:
+                self.closed.set()
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Запускает фейковый LLM в отдельном потоке и направляет на него клиент OpenAI."""
+    llm = FakeLlm()
+    server = uvicorn.Server(uvicorn.Config(
+        Starlette(routes=[Route("/v1/chat/completions", llm.chat_completions, methods=["POST"])]),
+        log_level="warning",
+    ))
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    settings = generation_router.settings
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "OPENAI_MODEL", "test-model")
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", f"http://127.0.0.1:{sock.getsockname()[1]}/v1")
+    monkeypatch.setattr(settings, "OPENAI_MAX_RETRIES", 0)
+    try:
+        yield llm
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+async def _stream_dialogue(disconnect_after_chunks: int) -> tuple[int, list[bytes]]:
+    """
+    Отправляет запрос к /generation/dialogue/stream напрямую через ASGI и
+    сообщает об отключении клиента после `disconnect_after_chunks` фрагментов.
+    """
+    payload = json.dumps({"dialogue": "Пользователь: Как стать волонтёром?"}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/generation/dialogue/stream",
+        "raw_path": b"/generation/dialogue/stream",
+        "query_string": b"cache=bypass",
+        "root_path": "",
+        "headers": [(b"host", b"test"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+    }
+    status_code = 0
+    chunks: list[bytes] = []
+    request_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message.get("body"):
+            chunks.append(message["body"])
+            if len(chunks) >= disconnect_after_chunks:
+                disconnected.set()
+
+    try:
+        await asyncio.wait_for(app(scope, receive, send), timeout=CHUNKS * CHUNK_DELAY_SECONDS)
+    finally:
+        await generation_router.close_openai_client()
+    return status_code, chunks
+
+
+def _cancelled_calls() -> int:
+    return llm_metrics.snapshot().get("dialogue_stream", {}).get("outcomes", {}).get("cancelled", 0)
+
+
+def test_disconnect_closes_llm_stream_and_releases_slot(db, fake_llm):
+    active_before = admission.active
+    cancelled_before = _cancelled_calls()
+
+    status_code, chunks = asyncio.run(_stream_dialogue(disconnect_after_chunks=3))
+
+    assert status_code == 200
+    assert len(chunks) == 3
+    # Поток к LLM закрыт в пределах chunk'а после отключения клиента
+    assert fake_llm.closed.wait(timeout=2)
+    assert fake_llm.chunks_sent <= len(chunks) + CHUNK_MARGIN
+    assert admission.active == active_before
+    assert _cancelled_calls() == cancelled_before + 1
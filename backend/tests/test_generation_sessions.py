@@ -0,0 +1,53 @@
+"""
+Хранилище сессий ИИ-помощника.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db_models, db_operations
+from app.generation_logics.sessions import SessionStore
+
+
+def test_client_sessions_do_not_evict_other_clients():
+    store = SessionStore(max_entries=10, ttl_seconds=60, persist=False, max_per_owner=3)
+
+    async def scenario():
+        other = await store.create("ip:2.2.2.2")
+        created = [await store.create("ip:1.1.1.1") for _ in range(20)]
+        return other, created
+
+    other, created = asyncio.run(scenario())
+
+    assert asyncio.run(store.get(other.key, "ip:2.2.2.2")) is other
+    alive = [s for s in created if asyncio.run(store.get(s.key, "ip:1.1.1.1")) is not None]
+    assert alive == created[-3:]
+    assert store.snapshot()["evicted"] == 0
+
+
+def test_save_session_retries_update_after_concurrent_insert(db, monkeypatch):
+    expire = datetime.utcnow() + timedelta(hours=1)
+    commit = db.commit
+    raced = []
+
+    def racing_commit():
+        # Первый commit проигрывает гонку: ту же сессию успел создать другой запрос
+        if not raced:
+            raced.append(True)
+            db.rollback()
+            db.add(db_models.GenerationSession(
+                key="s1", owner="ip:1.1.1.1", turns="[]", window_start=0,
+                date_expire=expire, date_create=datetime.utcnow(),
+            ))
+            commit()
+            raise IntegrityError("INSERT", {}, Exception("UNIQUE constraint failed: generation_session.key"))
+        commit()
+
+    monkeypatch.setattr(db, "commit", racing_commit)
+
+    entry = db_operations.save_generation_session(db, "s1", "ip:1.1.1.1", '[["user", "привет"]]', 0, expire)
+
+    assert entry.turns == '[["user", "привет"]]'
+    db.expire_all()
+    assert db_operations.get_generation_session(db, "s1").turns == '[["user", "привет"]]'
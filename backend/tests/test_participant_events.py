@@ -0,0 +1,89 @@
+"""
+Запись на мероприятие: лимит мест, лист ожидания и флаги записи.
+"""
+from datetime import datetime
+
+from app import db_operations, users
+
+
+def _event_with_users(db, seats: int, users: int):
+    db_operations.init_default_roles(db)
+    role = db_operations.get_role_by_name(db, "user")
+    event = db_operations.create_event(db, "Субботник", quantity_participant=seats)
+    user_ids = [
+        db_operations.create_user(db, f"u{i}@example.com", "hash", f"User {i}", role.id).id
+        for i in range(users)
+    ]
+    return event.id, user_ids
+
+
+def _quantity_registered(db, event_id: int) -> int:
+    db.expire_all()
+    return db_operations.get_event_by_id(db, event_id).quantity_registered
+
+
+def test_register_puts_overflow_on_waitlist(db):
+    event_id, (first, second) = _event_with_users(db, seats=1, users=2)
+
+    registered = db_operations.register_participant_event(db, event_id, first)
+    waitlisted = db_operations.register_participant_event(db, event_id, second)
+
+    assert not db_operations.is_waitlisted(db, registered)
+    assert db_operations.is_waitlisted(db, waitlisted)
+    assert _quantity_registered(db, event_id) == 1
+
+
+def test_register_twice_returns_none_and_keeps_seat(db):
+    event_id, (user,) = _event_with_users(db, seats=2, users=1)
+
+    assert db_operations.register_participant_event(db, event_id, user) is not None
+    assert db_operations.register_participant_event(db, event_id, user) is None
+    assert _quantity_registered(db, event_id) == 1
+
+
+def test_cancel_promotes_first_in_waitlist(db):
+    event_id, (first, second, third) = _event_with_users(db, seats=1, users=3)
+    for user_id in (first, second, third):
+        db_operations.register_participant_event(db, event_id, user_id)
+
+    assert db_operations.delete_participant_event(db, first, event_id)
+
+    promoted = db_operations.get_participant_event_by_user_and_event(db, second, event_id)
+    still_waiting = db_operations.get_participant_event_by_user_and_event(db, third, event_id)
+    assert not db_operations.is_waitlisted(db, promoted)
+    assert db_operations.is_waitlisted(db, still_waiting)
+    assert _quantity_registered(db, event_id) == 1
+
+
+def test_event_flags_separate_waitlist(db):
+    event_id, (first, second) = _event_with_users(db, seats=1, users=2)
+    other_event = db_operations.create_event(db, "Лекция", quantity_participant=0).id
+    db_operations.register_participant_event(db, event_id, first)
+    db_operations.register_participant_event(db, event_id, second)
+    db_operations.register_participant_event(db, other_event, second)
+
+    ids = [event_id, other_event]
+    assert db_operations.get_registered_event_ids(db, first, ids) == [event_id]
+    assert db_operations.get_waitlisted_event_ids(db, first, ids) == []
+    assert db_operations.get_registered_event_ids(db, second, ids) == [other_event]
+    assert db_operations.get_waitlisted_event_ids(db, second, ids) == [event_id]
+
+
+def test_my_events_marks_waitlisted_entries(db):
+    event_id, (first, second) = _event_with_users(db, seats=1, users=2)
+    db_operations.register_participant_event(db, event_id, first)
+    db_operations.register_participant_event(db, event_id, second)
+
+    assert [e["waitlisted"] for e in users.get_user_registered_events({"id": first}, db)] == [False]
+    assert [e["waitlisted"] for e in users.get_user_registered_events({"id": second}, db)] == [True]
+
+
+def test_register_for_deleted_event_returns_none_without_waitlist_row(db):
+    event_id, (first, second) = _event_with_users(db, seats=1, users=2)
+    db_operations.register_participant_event(db, event_id, first)
+    event = db_operations.get_event_by_id(db, event_id)
+    event.date_delete = datetime.utcnow()
+    db.commit()
+
+    assert db_operations.register_participant_event(db, event_id, second) is None
+    assert db_operations.get_participant_event_by_user_and_event(db, second, event_id) is None
@@ -0,0 +1,19 @@
+"""
+Главная страница: размер документа ограничен параметрами запроса.
+"""
+from fastapi.testclient import TestClient
+
+from app import db_operations
+from app.main import app
+
+
+def test_home_limits_nkos(db):
+    db_operations.init_default_statuses(db)
+    approved = db_operations.get_status_organization_by_name(db, "Одобрена")
+    for i in range(5):
+        db_operations.create_organization(db, f"НКО {i}", status_organization_id=approved.id)
+
+    client = TestClient(app)
+    assert len(client.get("/public/home").json()["nkos"]) == 5
+    assert len(client.get("/public/home?nkos_limit=2").json()["nkos"]) == 2
+    assert client.get("/public/home?nkos_limit=0").status_code == 422
@@ -117,6 +117,8 @@ export const FavoritesProvider = ({ children }) => {
 
   // --- ATTENDING EVENTS ---
   const isAttendingEvent = (id) => attendingEvents.some(e => e.id === id);
+  // Запись есть, но мест не было — пользователь в листе ожидания
+  const isWaitlistedEvent = (id) => attendingEvents.some(e => e.id === id && e.waitlisted);
 
   const toggleAttendingEvent = async (eventId) => {
     const isAttending = isAttendingEvent(eventId);
@@ -164,7 +166,8 @@ export const FavoritesProvider = ({ children }) => {
       // Методы Attending
       attendingEvents, // Теперь это массив объектов!
       toggleAttendingEvent,
-      isAttendingEvent
+      isAttendingEvent,
+      isWaitlistedEvent
       
     }}>
       {children}
@@ -11,6 +11,14 @@ const AiHelperPage = () => {
   // Ref для авто-скролла
   const messagesEndRef = useRef(null);
 
+  // Идентификатор разговора: сервер по нему хранит краткое содержание ранних реплик
+  const conversationIdRef = useRef(`${Date.now()}-${Math.random().toString(36).slice(2)}`);
+
+  // Текущий потоковый запрос; прерывается при уходе со страницы
+  const abortControllerRef = useRef(null);
+
+  useEffect(() => () => abortControllerRef.current?.abort(), []);
+
   // Функция скролла вниз
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -53,7 +61,12 @@ const AiHelperPage = () => {
       },
     ]);
 
+    const controller = new AbortController();
+    abortControllerRef.current = controller;
+
     await streamDialogueAnswer(dialogueText, {
+      conversationId: conversationIdRef.current,
+      signal: controller.signal,
       onChunk: (_chunk, fullText) => {
         setMessages((prev) =>
           prev.map((m) =>
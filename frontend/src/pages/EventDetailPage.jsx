@@ -21,7 +21,7 @@ const EventDetailPage = () => {
   
   const { 
     isEventFavorite, toggleEventFavorite, 
-    isAttendingEvent, toggleAttendingEvent 
+    isAttendingEvent, isWaitlistedEvent, toggleAttendingEvent 
   } = useFavorites();
   
   const [event, setEvent] = useState(null);
@@ -71,6 +71,7 @@ const EventDetailPage = () => {
 
   const isFavorite = isEventFavorite(event.id);
   const attending = isAttendingEvent(event.id);
+  const waitlisted = isWaitlistedEvent(event.id);
 
   // --- ЛОГИКА ДАТЫ И АКТУАЛЬНОСТИ ---
   const dateString = event.date || event.event_date || event.event_datetime;
@@ -366,6 +367,8 @@ const EventDetailPage = () => {
                   >
                     {isEventPassed ? (
                       'Событие завершено'
+                    ) : waitlisted ? (
+                      <><FiCheck className="text-2xl" /> Вы в листе ожидания</>
                     ) : attending ? (
                       <><FiCheck className="text-2xl" /> Вы участвуете</>
                     ) : (
@@ -70,15 +70,18 @@ export const generateDialogueAnswer = async (dialogue) => {
  * @param {(chunk: string, fullText: string) => void} [callbacks.onChunk] - вызывается на каждый chunk
  * @param {(fullText: string) => void} [callbacks.onComplete] - вызывается по завершении стрима
  * @param {(message: string) => void} [callbacks.onError] - вызывается при ошибке
+ * @param {string} [callbacks.conversationId] - идентификатор разговора (для краткого содержания ранних реплик)
  */
 export const streamDialogueAnswer = async (
   dialogue,
-  { onChunk, onComplete, onError } = {},
+  { onChunk, onComplete, onError, conversationId, signal } = {},
 ) => {
   try {
+    // signal позволяет прервать запрос: сервер увидит отключение и остановит генерацию
     const response = await authFetch(`${API_BASE_URL}/generation/dialogue/stream`, {
       method: 'POST',
-      body: JSON.stringify({ dialogue }),
+      body: JSON.stringify({ dialogue, conversation_id: conversationId }),
+      signal,
     });
 
     if (!response.ok) {
@@ -117,6 +120,8 @@ export const streamDialogueAnswer = async (
 
     if (onComplete) onComplete(fullText);
   } catch (error) {
+    // Запрос прерван вызывающей стороной (например, пользователь ушёл со страницы)
+    if (error.name === 'AbortError') return;
     console.error('Dialogue streaming API error:', error);
     if (onError) onError(error.message || 'Ошибка стриминговой генерации ответа');
   }